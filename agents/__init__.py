@@ -1,9 +1,34 @@
 # Makes "agents" a Python package.
 # Centralizes common exports if needed.
+#
+# Exports resolve on first access (PEP 562), so `import agents.metrics` and
+# friends do not drag in the agent modules and everything they import.
+import importlib
 
-from .adk_agent import teacher_explain, doubt_solver
-from .crewai_agent import create_study_plan, generate_quiz_for_module
-from .shared_tools import (
-    create_connection, logger, monitor_event,
-    search_notes, add_note, web_search,
-)
+_EXPORTS = {
+    "agents.adk_agent": (
+        "teacher_explain", "doubt_solver", "get_topic_brief",
+        "teacher_explain_async", "doubt_solver_async", "get_topic_brief_async",
+        "teacher_explain_stream", "get_topic_brief_stream",
+    ),
+    "agents.crewai_agent": (
+        "create_study_plan", "generate_quiz_for_module",
+        "create_study_plan_async", "generate_quiz_for_module_async", "generate_quizzes_async",
+    ),
+    "agents.shared_tools": (
+        "create_connection", "logger", "monitor_event",
+        "search_notes", "search_notes_ranked", "add_note", "web_search",
+    ),
+}
+_LOCATIONS = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_LOCATIONS)
+
+
+def __getattr__(name):
+    module = _LOCATIONS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-import os
 import asyncio
-from typing import Dict, List, Optional, Tuple
+import os
+import threading
+import time
+import hashlib
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -10,19 +13,38 @@ from dotenv import load_dotenv
 env_path = Path(__file__).resolve().parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-from crewai import Agent, Crew, Task, LLM
 from agents.callbacks import with_callbacks
 from agents.mcp_tools import call_mcp_tool
+from agents.response_cache import response_cache
+from agents.similarity_cache import doubt_cache
+from agents.single_flight import flight_key, single_flight
 from agents.shared_tools import Explanation, add_note, search_notes
-from state.context_store import load_study_plan
+from state.context_store import get_study_plan
+
+# crewai (and litellm under it) takes seconds to import, so the LLM and the
+# agents below are built on first use, or by warm_up_async at app startup.
+if TYPE_CHECKING:
+    from crewai import Agent, LLM
 
 # --- 2. CONFIG: THE GROQ BRAIN ---
-# Using Llama 3.3 70B for expert-level explanations without hashtags
-groq_llm = LLM(
-    model="groq/llama-3.3-70b-versatile",
-    api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.3
-)
+# Using Llama 3.3 70B for expert-level explanations without hashtags.
+# Built on first use by _llm(); scripts may assign a StubLLM here beforehand.
+groq_llm: Optional["LLM"] = None
+_build_lock = threading.Lock()
+
+def _llm() -> "LLM":
+    global groq_llm
+    if groq_llm is None:
+        with _build_lock:
+            if groq_llm is None:
+                from crewai import LLM
+                from agents.llm_cassette import wrap
+                groq_llm = wrap(LLM(
+                    model="groq/llama-3.3-70b-versatile",
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    temperature=0.3
+                ))
+    return groq_llm
 
 # --- 3. THE NO-HASHTAG PERSONAS ---
 # We strictly forbid '#' to keep the new UI clean.
@@ -39,84 +61,109 @@ STRICT RULE: Never use the '#' character.
 Resolve student doubts quickly with analogies and clean code snippets.
 """.strip()
 
-# Initialize standard CrewAI agents (replacing the old ADK ones)
-teacher_agent = Agent(
-    role="Senior Instructor",
-    goal="Explain complex topics deeply without using hashtags.",
-    backstory=TEACHER_INSTRUCTION,
-    llm=groq_llm,
-    verbose=False
-)
-
-doubt_agent = Agent(
-    role="Technical Support",
-    goal="Answer questions clearly and concisely without hashtags.",
-    backstory=DOUBT_INSTRUCTION,
-    llm=groq_llm,
-    verbose=False
-)
+# Bump when the lesson / brief prompt templates change so cached answers roll over.
+PROMPT_VERSION = "v1"
+TEACHER_CACHE_VERSION = f"{PROMPT_VERSION}:{hashlib.sha1(TEACHER_INSTRUCTION.encode()).hexdigest()[:8]}"
+
+# Standard CrewAI agents (replacing the old ADK ones), built on first use
+_PERSONAS = {
+    "teacher_agent": dict(
+        role="Senior Instructor",
+        goal="Explain complex topics deeply without using hashtags.",
+        backstory=TEACHER_INSTRUCTION,
+    ),
+    "doubt_agent": dict(
+        role="Technical Support",
+        goal="Answer questions clearly and concisely without hashtags.",
+        backstory=DOUBT_INSTRUCTION,
+    ),
+}
+_agents: Dict[str, "Agent"] = {}
+
+def _agent(name: str) -> "Agent":
+    agent = _agents.get(name)
+    if agent is None:
+        llm = _llm()
+        with _build_lock:
+            agent = _agents.get(name)
+            if agent is None:
+                from crewai import Agent
+                agent = _agents[name] = Agent(**_PERSONAS[name], llm=llm, verbose=False)
+    return agent
+
+async def _agent_async(name: str) -> "Agent":
+    """_agent for async callers: a first build (which imports crewai) runs off the event loop."""
+    agent = _agents.get(name)
+    if agent is None:
+        agent = await asyncio.to_thread(_agent, name)
+    return agent
+
+def __getattr__(name: str):
+    # adk_agent.teacher_agent / adk_agent.doubt_agent still work (scripts swap their .llm)
+    if name in _PERSONAS:
+        return _agent(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- 4. CORE LOGIC HELPERS ---
 
+def _agent_messages(agent: Agent, message: str) -> List[Dict[str, str]]:
+    # Same persona framing CrewAI builds for a single-task crew, minus the crew machinery.
+    system = f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"
+    return [{"role": "system", "content": system}, {"role": "user", "content": message}]
+
 async def _invoke_agent_async(agent: Agent, message: str) -> str:
-    task = Task(description=message, agent=agent, expected_output="A clean, helpful response.")
-    crew = Crew(agents=[agent], tasks=[task], verbose=False)
-    result = await crew.kickoff_async()
-    return result.raw
+    """
+    Awaits the agent's LLM directly: no Crew, thread pool or nested event loop per call.
+    Identical concurrent prompts to the same agent share one LLM call.
+    """
+    return await single_flight.run_async(
+        flight_key(agent.role, message),
+        lambda: agent.llm.acall(_agent_messages(agent, message)),
+    )
+
+async def _stream_agent_async(agent: Agent, message: str) -> AsyncIterator[str]:
+    """Yields completion text as it arrives. LLMs with a native astream() (e.g. StubLLM) use it."""
+    from agents.llm_cassette import astream_completion
+    async for chunk in astream_completion(agent.llm, _agent_messages(agent, message)):
+        yield chunk
 
 def _invoke_agent(agent: Agent, message: str) -> str:
+    """Blocking twin of _invoke_agent_async for scripts and other sync callers."""
+    return single_flight.run(
+        flight_key(agent.role, message),
+        lambda: agent.llm.call(_agent_messages(agent, message)),
+    )
+
+async def warm_up_async() -> Dict[str, str]:
+    """Startup hook: one tiny completion on the app's event loop opens the async LLM client's connection."""
     try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            from concurrent.futures import ThreadPoolExecutor
-            with ThreadPoolExecutor() as executor:
-                return executor.submit(asyncio.run, _invoke_agent_async(agent, message)).result()
-    except RuntimeError:
-        pass
-    return asyncio.run(_invoke_agent_async(agent, message))
-
-def _resolve_module_alignment(module_id: int) -> Tuple[Optional[object], Optional[object]]:
-    plan = load_study_plan()
+        teacher = await _agent_async("teacher_agent")
+        await _agent_async("doubt_agent")
+        await teacher.llm.acall([{"role": "user", "content": "Reply with the single word OK."}])
+        return {"llm": "ok"}
+    except Exception as e:
+        return {"llm": f"error: {e}"}
+
+def _resolve_module_alignment(module_id: int, session_id: Optional[str] = None) -> Tuple[Optional[object], Optional[object]]:
+    plan = get_study_plan(session_id)
     if not plan: return None, None
     modules = plan.modules or []
     module = next((m for m in modules if m.id == module_id), modules[0] if modules else None)
     return plan, module
 
-# --- 5. EXPORTED FUNCTIONS (Called by main.py) ---
-
-@with_callbacks("TeacherAgent(Groq)")
-def teacher_explain(module_id: int | None, topic: str) -> Explanation:
-    """Provides deep dive lessons."""
-    mid = module_id or 0
-    plan, module = _resolve_module_alignment(mid)
-    
-    prompt = f"""
+def _lesson_prompt(topic: str, level: str) -> str:
+    return f"""
     TOPIC: {topic}
-    LEARNER LEVEL: {plan.level if plan else 'beginner'}
+    LEARNER LEVEL: {level}
     TASK: Provide a comprehensive markdown lesson. 
     REMEMBER: No hashtags (#). Use **BOLD** for headings.
     """
-    
-    explanation_md = _invoke_agent(teacher_agent, prompt)
-    
-    if module: add_note(module.id, explanation_md[:1500])
-    return Explanation(module_id=mid, topic=topic, explanation_md=explanation_md)
 
-@with_callbacks("DoubtSolver(Groq)")
-def doubt_solver(module_id: int | None, question: str) -> Dict:
-    """Resolves student questions."""
-    mid = module_id or 0
-    plan, _ = _resolve_module_alignment(mid)
-    
-    prompt = f"Question: {question}. Context: {plan.subject if plan else 'General'}. No hashtags."
-    answer = _invoke_agent(doubt_agent, prompt)
-    
-    return {"source": "groq", "answer": answer}
+def _doubt_prompt(question: str, subject: str) -> str:
+    return f"Question: {question}. Context: {subject}. No hashtags."
 
-@with_callbacks("TeacherAgent(Groq)")
-def get_topic_brief(topic: str) -> str:
-    """The 'Modern Learning Card' with diagrams and analogies."""
-    prompt = f"""
+def _brief_prompt(topic: str) -> str:
+    return f"""
     Create a Modern Learning Card for: {topic}
     Include:
     1. **ANALOGY**: A real-world mental model.
@@ -126,4 +173,141 @@ def get_topic_brief(topic: str) -> str:
     
     STRICT RULE: NO '#' CHARACTERS.
     """
-    return _invoke_agent(teacher_agent, prompt)
\ No newline at end of file
+
+# --- 5. SHARED STEPS ---
+# Every exported function below is start -> LLM call -> finish, and its sync,
+# async and streaming variants differ only in how the LLM is called. The
+# start/finish steps read and write SQLite (plan, response cache, notes) and
+# the doubt index, so the async variants run them with asyncio.to_thread to
+# keep disk I/O off the event loop.
+
+def _explain_start(module_id: int | None, topic: str, session_id: Optional[str]):
+    """(module id, module, learner level, cached lesson or None)."""
+    mid = module_id or 0
+    plan, module = _resolve_module_alignment(mid, session_id)
+    level = plan.level if plan else 'beginner'
+    return mid, module, level, response_cache.lookup("explain", topic, level, TEACHER_CACHE_VERSION)
+
+def _explain_finish(mid: int, module, topic: str, level: str, explanation_md: str,
+                    llm_seconds: Optional[float] = None) -> Explanation:
+    """Caches a freshly generated lesson (llm_seconds set) and notes it on the module."""
+    if llm_seconds is not None:
+        response_cache.store("explain", topic, level, TEACHER_CACHE_VERSION, explanation_md,
+                             llm_seconds=llm_seconds)
+    if module: add_note(module.id, explanation_md[:1500])
+    return Explanation(module_id=mid, topic=topic, explanation_md=explanation_md)
+
+def _doubt_start(module_id: int | None, question: str, session_id: Optional[str]) -> Tuple[str, Optional[Dict]]:
+    """(plan subject, cached answer or None)."""
+    plan, _ = _resolve_module_alignment(module_id or 0, session_id)
+    subject = plan.subject if plan else 'General'
+    return subject, doubt_cache.lookup(subject, question)
+
+def _doubt_finish(subject: str, question: str, answer: str) -> Dict:
+    doubt_cache.insert(subject, question, answer)
+    return {"source": "groq", "answer": answer}
+
+def _brief_start(topic: str) -> Optional[str]:
+    return response_cache.lookup("brief", topic, "any", TEACHER_CACHE_VERSION)
+
+def _brief_finish(topic: str, brief_md: str, llm_seconds: float) -> str:
+    response_cache.store("brief", topic, "any", TEACHER_CACHE_VERSION, brief_md, llm_seconds=llm_seconds)
+    return brief_md
+
+# --- 6. EXPORTED FUNCTIONS (Called by main.py) ---
+# Each agent function has an `_async` twin; the coordinator's async routes
+# await those so an in-flight LLM call never pins a worker thread.
+
+@with_callbacks("TeacherAgent(Groq)")
+def teacher_explain(module_id: int | None, topic: str, session_id: Optional[str] = None) -> Explanation:
+    """Provides deep dive lessons."""
+    mid, module, level, cached = _explain_start(module_id, topic, session_id)
+    if cached is not None:
+        return _explain_finish(mid, module, topic, level, cached)
+    started = time.perf_counter()
+    explanation_md = _invoke_agent(_agent("teacher_agent"), _lesson_prompt(topic, level))
+    return _explain_finish(mid, module, topic, level, explanation_md, time.perf_counter() - started)
+
+@with_callbacks("TeacherAgent(Groq)")
+async def teacher_explain_async(module_id: int | None, topic: str, session_id: Optional[str] = None) -> Explanation:
+    """Async twin of teacher_explain."""
+    mid, module, level, cached = await asyncio.to_thread(_explain_start, module_id, topic, session_id)
+    if cached is not None:
+        return await asyncio.to_thread(_explain_finish, mid, module, topic, level, cached)
+    started = time.perf_counter()
+    explanation_md = await _invoke_agent_async(await _agent_async("teacher_agent"), _lesson_prompt(topic, level))
+    return await asyncio.to_thread(_explain_finish, mid, module, topic, level, explanation_md,
+                                   time.perf_counter() - started)
+
+@with_callbacks("DoubtSolver(Groq)")
+def doubt_solver(module_id: int | None, question: str, session_id: Optional[str] = None) -> Dict:
+    """Resolves student questions."""
+    subject, cached = _doubt_start(module_id, question, session_id)
+    if cached is not None:
+        return {"source": "cache", **cached}
+    answer = _invoke_agent(_agent("doubt_agent"), _doubt_prompt(question, subject))
+    return _doubt_finish(subject, question, answer)
+
+@with_callbacks("DoubtSolver(Groq)")
+async def doubt_solver_async(module_id: int | None, question: str, session_id: Optional[str] = None) -> Dict:
+    """Async twin of doubt_solver."""
+    subject, cached = await asyncio.to_thread(_doubt_start, module_id, question, session_id)
+    if cached is not None:
+        return {"source": "cache", **cached}
+    answer = await _invoke_agent_async(await _agent_async("doubt_agent"), _doubt_prompt(question, subject))
+    return await asyncio.to_thread(_doubt_finish, subject, question, answer)
+
+@with_callbacks("TeacherAgent(Groq)")
+def get_topic_brief(topic: str) -> str:
+    """The 'Modern Learning Card' with diagrams and analogies."""
+    cached = _brief_start(topic)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    brief_md = _invoke_agent(_agent("teacher_agent"), _brief_prompt(topic))
+    return _brief_finish(topic, brief_md, time.perf_counter() - started)
+
+@with_callbacks("TeacherAgent(Groq)")
+async def get_topic_brief_async(topic: str) -> str:
+    """Async twin of get_topic_brief."""
+    cached = await asyncio.to_thread(_brief_start, topic)
+    if cached is not None:
+        return cached
+    started = time.perf_counter()
+    brief_md = await _invoke_agent_async(await _agent_async("teacher_agent"), _brief_prompt(topic))
+    return await asyncio.to_thread(_brief_finish, topic, brief_md, time.perf_counter() - started)
+
+# --- 7. STREAMING VARIANTS (Server-Sent Events in main.py) ---
+# Chunks are yielded as they arrive; the assembled text still goes to the
+# response cache and add_note once the stream finishes. A stream abandoned
+# by the client is never cached.
+
+@with_callbacks("TeacherAgent(Groq)")
+async def teacher_explain_stream(module_id: int | None, topic: str, session_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Streaming twin of teacher_explain."""
+    mid, module, level, cached = await asyncio.to_thread(_explain_start, module_id, topic, session_id)
+    if cached is not None:
+        yield cached
+        await asyncio.to_thread(_explain_finish, mid, module, topic, level, cached)
+        return
+    parts: List[str] = []
+    started = time.perf_counter()
+    async for chunk in _stream_agent_async(await _agent_async("teacher_agent"), _lesson_prompt(topic, level)):
+        parts.append(chunk)
+        yield chunk
+    await asyncio.to_thread(_explain_finish, mid, module, topic, level, "".join(parts),
+                            time.perf_counter() - started)
+
+@with_callbacks("TeacherAgent(Groq)")
+async def get_topic_brief_stream(topic: str) -> AsyncIterator[str]:
+    """Streaming twin of get_topic_brief."""
+    cached = await asyncio.to_thread(_brief_start, topic)
+    if cached is not None:
+        yield cached
+        return
+    parts: List[str] = []
+    started = time.perf_counter()
+    async for chunk in _stream_agent_async(await _agent_async("teacher_agent"), _brief_prompt(topic)):
+        parts.append(chunk)
+        yield chunk
+    await asyncio.to_thread(_brief_finish, topic, "".join(parts), time.perf_counter() - started)
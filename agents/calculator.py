@@ -0,0 +1,315 @@
+"""
+Expression Compiler for the Calculator Tool
+Parses arithmetic once with `ast`, checks every node against a small allow-list
+and turns the tree into nested closures. Compiled expressions live in an LRU,
+so a repeated formula costs one dict lookup plus the closure calls. Numeric
+quiz answers can be checked in bulk: one expression over whole arrays of
+variable bindings is evaluated with NumPy in a single pass.
+"""
+from __future__ import annotations
+
+import ast
+import inspect
+import math
+import operator
+import os
+from functools import lru_cache, reduce
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+CALCULATOR_CACHE_SIZE = int(os.getenv("CALCULATOR_CACHE_SIZE", "1024"))
+CALCULATOR_MAX_EXPRESSION_CHARS = int(os.getenv("CALCULATOR_MAX_EXPRESSION_CHARS", "500"))
+# Integer powers are bounded by the size of the result, not the exponent:
+# 10 ** 10000 is instant, (10 ** 10000) ** 10000 would pin a worker for minutes
+MAX_INTEGER_BITS = 100_000
+MAX_FACTORIAL = 1000
+# round(5, -10 ** 7) builds 10 ** 10 ** 7 internally; a double has ~308 decimal digits
+MAX_ROUND_DIGITS = 308
+
+Env = Mapping[str, Any]
+Node = Callable[[Env], Any]
+
+
+class ExpressionError(ValueError):
+    """The expression uses syntax, names or functions the calculator does not allow."""
+
+
+# ---------------------------------------------------
+# Allowed Names
+# ---------------------------------------------------
+def _pow(base, exponent, modulus=None):
+    if modulus is not None:
+        # Modular exponentiation stays as small as the modulus, so no size check
+        if not all(isinstance(x, int) for x in (base, exponent, modulus)):
+            raise ExpressionError("pow() with a modulus takes integers only")
+        return pow(base, exponent, modulus)
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if exponent * math.log2(abs(base)) > MAX_INTEGER_BITS:
+            raise ExpressionError(f"Power with exponent {exponent} is too large")
+    return base ** exponent
+
+
+def _np_pow(base, exponent, modulus=None):
+    return np.power(base, exponent) if modulus is None else np.mod(np.power(base, exponent), modulus)
+
+
+def _check_round_digits(ndigits):
+    if ndigits is not None and abs(ndigits) > MAX_ROUND_DIGITS:
+        raise ExpressionError(f"round() takes at most {MAX_ROUND_DIGITS} digits either way")
+
+
+def _round(x, ndigits=None):
+    _check_round_digits(ndigits)
+    return round(x) if ndigits is None else round(x, ndigits)
+
+
+def _np_round(x, ndigits=None):
+    _check_round_digits(ndigits)
+    return np.round(x) if ndigits is None else np.round(x, int(ndigits))
+
+
+def _factorial(n):
+    if n > MAX_FACTORIAL:
+        raise ExpressionError(f"factorial({n}) is too large")
+    return math.factorial(n)
+
+
+def _factorial_float(n):
+    if n < 0 or n != int(n):
+        return math.nan
+    return float(math.factorial(int(n))) if n <= 170 else math.inf  # 171! overflows a float
+
+
+def _log(x, base=None):
+    return math.log(x) if base is None else math.log(x, base)
+
+
+def _np_log(x, base=None):
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf}
+
+# name -> (scalar implementation, NumPy implementation)
+FUNCTIONS: Dict[str, tuple] = {
+    "abs": (abs, np.abs),
+    "round": (_round, _np_round),
+    "min": (min, lambda *xs: reduce(np.minimum, xs)),
+    "max": (max, lambda *xs: reduce(np.maximum, xs)),
+    "pow": (_pow, _np_pow),
+    "sqrt": (math.sqrt, np.sqrt),
+    "exp": (math.exp, np.exp),
+    "log": (_log, _np_log),
+    "log10": (math.log10, np.log10),
+    "log2": (math.log2, np.log2),
+    "sin": (math.sin, np.sin),
+    "cos": (math.cos, np.cos),
+    "tan": (math.tan, np.tan),
+    "asin": (math.asin, np.arcsin),
+    "acos": (math.acos, np.arccos),
+    "atan": (math.atan, np.arctan),
+    "atan2": (math.atan2, np.arctan2),
+    "sinh": (math.sinh, np.sinh),
+    "cosh": (math.cosh, np.cosh),
+    "tanh": (math.tanh, np.tanh),
+    "hypot": (math.hypot, np.hypot),
+    "degrees": (math.degrees, np.degrees),
+    "radians": (math.radians, np.radians),
+    "floor": (math.floor, np.floor),
+    "ceil": (math.ceil, np.ceil),
+    "fabs": (math.fabs, np.fabs),
+    "factorial": (_factorial, np.vectorize(_factorial_float, otypes=[float])),
+}
+
+_BINARY = {
+    ast.Add: (operator.add, operator.add),
+    ast.Sub: (operator.sub, operator.sub),
+    ast.Mult: (operator.mul, operator.mul),
+    ast.Div: (operator.truediv, operator.truediv),
+    ast.FloorDiv: (operator.floordiv, operator.floordiv),
+    ast.Mod: (operator.mod, operator.mod),
+    ast.Pow: (_pow, np.power),
+}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+
+# ---------------------------------------------------
+# AST -> Closure Tree
+# ---------------------------------------------------
+@lru_cache(maxsize=None)
+def _accepts(name: str, count: int) -> bool:
+    """Whether FUNCTIONS[name] takes `count` positional arguments; checked at compile
+    time so a wrong count is reported under the calculator's name, not the helper's."""
+    try:
+        inspect.signature(FUNCTIONS[name][0]).bind(*range(count))
+    except ValueError:
+        return True  # no introspectable signature (min, max): let the call decide
+    except TypeError:
+        return False
+    return True
+
+
+def _compile_node(node: ast.AST, vector: bool, names: set) -> Node:
+    side = 1 if vector else 0
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"Unsupported literal: {node.value!r}")
+        value = node.value
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in CONSTANTS:
+            value = CONSTANTS[name]
+            return lambda env: value
+        if name in FUNCTIONS:
+            raise ExpressionError(f"'{name}' is a function; call it as {name}(...)")
+        names.add(name)
+        return lambda env: env[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op = _BINARY[type(node.op)][side]
+        left, right = _compile_node(node.left, vector, names), _compile_node(node.right, vector, names)
+        return lambda env: op(left(env), right(env))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        op = _UNARY[type(node.op)]
+        operand = _compile_node(node.operand, vector, names)
+        return lambda env: op(operand(env))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+        if node.keywords:
+            raise ExpressionError(f"{node.func.id}() takes positional arguments only")
+        scalar_fn, vector_fn = FUNCTIONS[node.func.id]
+        if not _accepts(node.func.id, len(node.args)):
+            raise ExpressionError(f"{node.func.id}() cannot take {len(node.args)} argument(s)")
+        fn = vector_fn if vector else scalar_fn
+        args = [_compile_node(a, vector, names) for a in node.args]
+        if len(args) == 1:
+            only = args[0]
+            return lambda env: fn(only(env))
+        return lambda env: fn(*[a(env) for a in args])
+
+    if isinstance(node, ast.Call):
+        raise ExpressionError(f"Unknown function: {ast.unparse(node.func)}")
+    raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+
+
+class CompiledExpression:
+    """A parsed expression with a scalar closure tree and a lazily built NumPy one."""
+
+    __slots__ = ("text", "variables", "_tree", "_scalar", "_vector")
+
+    def __init__(self, text: str, tree: ast.Expression):
+        names: set = set()
+        self.text = text
+        self._tree = tree
+        self._scalar = _compile_node(tree.body, False, names)
+        self._vector: Optional[Node] = None
+        self.variables: FrozenSet[str] = frozenset(names)
+
+    def _check(self, env: Env) -> None:
+        missing = self.variables.difference(env)
+        if missing:
+            raise ExpressionError(f"Missing value for: {', '.join(sorted(missing))}")
+
+    def __call__(self, variables: Optional[Env] = None) -> Any:
+        env = variables or {}
+        self._check(env)
+        return self._scalar(env)
+
+    def vectorized(self, bindings: Mapping[str, Sequence[float]]) -> np.ndarray:
+        """Evaluates over arrays of bindings at once (arrays broadcast against each other)."""
+        self._check(bindings)
+        if self._vector is None:
+            self._vector = _compile_node(self._tree.body, True, set())
+        env = {name: np.asarray(bindings[name], dtype=float) for name in self.variables}
+        with np.errstate(all="ignore"):
+            return np.asarray(self._vector(env), dtype=float)
+
+
+@lru_cache(maxsize=CALCULATOR_CACHE_SIZE)
+def _compile_cached(text: str) -> CompiledExpression:
+    try:
+        tree = ast.parse(text, mode="eval")
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise ExpressionError(f"Invalid expression: {getattr(e, 'msg', None) or type(e).__name__}") from None
+    return CompiledExpression(text, tree)
+
+
+def compile_expression(expression: str) -> CompiledExpression:
+    """Parse and compile once; repeats (ignoring surrounding whitespace) come from the LRU."""
+    text = (expression or "").strip()
+    if not text:
+        raise ExpressionError("Empty expression")
+    if len(text) > CALCULATOR_MAX_EXPRESSION_CHARS:
+        raise ExpressionError(f"Expression longer than {CALCULATOR_MAX_EXPRESSION_CHARS} characters")
+    return _compile_cached(text)
+
+
+def cache_stats() -> Dict[str, int]:
+    info = _compile_cached.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "entries": info.currsize, "max_entries": info.maxsize}
+
+
+# ---------------------------------------------------
+# Evaluation
+# ---------------------------------------------------
+def _json_number(value: Any) -> Optional[float]:
+    if isinstance(value, (np.floating, np.integer)):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def evaluate(expression: str, variables: Optional[Env] = None) -> Dict[str, Any]:
+    """One expression, one set of variables. Errors come back in the dict, never raised."""
+    try:
+        result = compile_expression(expression)(variables)
+        # Inside the try: str() of an int past 4300 digits raises ValueError
+        return {
+            "result": result,
+            "expression": expression,
+            "explanation": f"Calculated: {expression} = {result}",
+        }
+    except (ExpressionError, ArithmeticError, ValueError, TypeError) as e:
+        return {"result": None, "error": str(e), "expression": expression}
+
+
+def evaluate_many(expressions: Sequence[str], variables: Optional[Env] = None) -> List[Dict[str, Any]]:
+    """Many independent expressions sharing one set of variables."""
+    return [evaluate(expression, variables) for expression in expressions]
+
+
+def evaluate_vectorized(expression: str, bindings: Mapping[str, Sequence[float]],
+                        expected: Optional[Sequence[float]] = None,
+                        rel_tol: float = 1e-6, abs_tol: float = 1e-9) -> Dict[str, Any]:
+    """
+    One expression over arrays of variable bindings, e.g. a quiz formula and
+    every learner's inputs. With `expected`, also grades each row with
+    np.isclose. Rows that come out NaN or infinite are reported as None.
+    """
+    try:
+        values = compile_expression(expression).vectorized(bindings)
+    except (ExpressionError, ArithmeticError, ValueError, TypeError) as e:
+        return {"results": None, "error": str(e), "expression": expression}
+    values = np.atleast_1d(values)
+    finite = np.isfinite(values)
+    out: Dict[str, Any] = {
+        "results": [float(v) if ok else None for v, ok in zip(values.tolist(), finite.tolist())],
+        "expression": expression,
+        "invalid": int((~finite).sum()),
+    }
+    if expected is not None:
+        target = np.asarray(expected, dtype=float)
+        try:
+            correct = np.isclose(values, target, rtol=rel_tol, atol=abs_tol) & finite
+        except ValueError as e:
+            out["error"] = f"expected does not match the results' shape: {e}"
+            return out
+        out["correct"] = correct.tolist()
+        out["num_correct"] = int(correct.sum())
+    return out
@@ -1,15 +1,158 @@
 """
 Callback System for Agent Monitoring and Logging
 Implements proper callback functions for agent lifecycle events.
+
+Callbacks are fire-and-forget by default: each one gets its own bounded queue
+and worker thread, so a slow hook only ever delays itself. Hooks registered
+with inline=True run on the request path (keep those cheap). Plain functions
+and `async def` callbacks are both supported.
 """
-from typing import Callable, Dict, Any, List
+import asyncio
+import inspect
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
 from functools import wraps
+from agents.metrics import DURATION_BUCKETS, Histogram, agent_duration, agent_payload, metrics, payload_size
 from agents.shared_tools import monitor_event, logger
 
+CALLBACK_QUEUE_SIZE = int(os.getenv("CALLBACK_QUEUE_SIZE", "1000"))
+CALLBACK_TIMEOUT_SECONDS = float(os.getenv("CALLBACK_TIMEOUT_SECONDS", "5"))
+
+# ---------------------------------------------------
+# Callback Subscribers
+# ---------------------------------------------------
+class _Subscriber:
+    """
+    One registered callback plus its dispatch policy.
+
+    Async callbacks are cancelled when they exceed `timeout`. A plain function
+    cannot be interrupted, so one that overruns is counted as a timeout and
+    its backlog is bounded by the queue instead.
+    """
+
+    def __init__(self, event_type: str, callback: Callable, inline: bool, timeout: float, queue_size: int):
+        self.event_type = event_type
+        self.callback = callback
+        self.name = getattr(callback, "__qualname__", repr(callback))
+        self.inline = inline
+        self.timeout = timeout
+        self.is_async = inspect.iscoroutinefunction(callback)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._lag = Histogram(DURATION_BUCKETS)
+        self._stats = {"dispatched": 0, "completed": 0, "errors": 0, "timeouts": 0, "dropped": 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._stats[field] += 1
+
+    def _finish(self, started: float, error: Optional[BaseException]) -> None:
+        if isinstance(error, asyncio.TimeoutError):
+            self._count("timeouts")
+            logger.error(f"Callback {self.name} ({self.event_type}) timed out after {self.timeout}s")
+        elif error is not None:
+            self._count("errors")
+            logger.error(f"Callback error in {self.event_type}: {error}")
+        elif time.perf_counter() - started > self.timeout:
+            self._count("timeouts")
+        else:
+            self._count("completed")
+
+    # --- inline ---
+    def run_inline(self, kwargs: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        try:
+            if self.is_async:
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    asyncio.run(asyncio.wait_for(self.callback(**kwargs), self.timeout))
+                else:
+                    # A sync caller on an event loop thread cannot await: hand it to the worker
+                    self.dispatch(kwargs)
+                    return
+            else:
+                self.callback(**kwargs)
+        except Exception as e:
+            self._finish(started, e)
+            return
+        self._finish(started, None)
+
+    async def run_inline_async(self, kwargs: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        try:
+            if self.is_async:
+                await asyncio.wait_for(self.callback(**kwargs), self.timeout)
+            else:
+                self.callback(**kwargs)
+        except Exception as e:
+            self._finish(started, e)
+            return
+        self._finish(started, None)
+
+    # --- background ---
+    def dispatch(self, kwargs: Dict[str, Any]) -> None:
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((time.perf_counter(), kwargs))
+        except queue.Full:
+            self._count("dropped")
+            return
+        self._count("dispatched")
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)  # forked: old worker is gone
+            threading.Thread(target=self._run, name=f"callback-{self.name}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop() if self.is_async else None
+        q = self._queue
+        while True:
+            enqueued, kwargs = q.get()
+            started = time.perf_counter()
+            self._lag.observe(started - enqueued)
+            try:
+                if loop is not None:
+                    loop.run_until_complete(asyncio.wait_for(self.callback(**kwargs), self.timeout))
+                else:
+                    self.callback(**kwargs)
+            except Exception as e:
+                self._finish(started, e)
+            else:
+                self._finish(started, None)
+            finally:
+                q.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lag = self._lag.snapshot()
+        stats.update({
+            "callback": self.name,
+            "event_type": self.event_type,
+            "mode": "inline" if self.inline else "background",
+            "timeout": self.timeout,
+            "queue_depth": self._queue.qsize(),
+            "lag_p50": round(self._lag.quantile(0.5, lag), 6),
+            "lag_p99": round(self._lag.quantile(0.99, lag), 6),
+        })
+        return stats
+
+
 # ---------------------------------------------------
 # Callback Registry
 # ---------------------------------------------------
-_callbacks: Dict[str, List[Callable]] = {
+_callbacks: Dict[str, List[_Subscriber]] = {
     "on_start": [],
     "on_complete": [],
     "on_error": [],
@@ -17,26 +160,62 @@ _callbacks: Dict[str, List[Callable]] = {
 }
 
 
-def register_callback(event_type: str, callback: Callable):
+def register_callback(event_type: str, callback: Callable, inline: bool = False,
+                      timeout: Optional[float] = None, queue_size: Optional[int] = None):
     """
     Register a callback function for a specific event type.
     
     Args:
         event_type: One of "on_start", "on_complete", "on_error", "on_intermediate"
-        callback: Function to call (should accept **kwargs)
+        callback: Function or `async def` to call (should accept **kwargs)
+        inline: Run on the request path instead of the callback's own worker.
+            Only for hooks that must finish before the agent call returns.
+        timeout: Seconds before the callback counts as timed out (async ones are cancelled)
+        queue_size: Pending events kept for a background callback before new ones are dropped
     """
     if event_type not in _callbacks:
         raise ValueError(f"Unknown event type: {event_type}")
-    _callbacks[event_type].append(callback)
+    _callbacks[event_type].append(_Subscriber(
+        event_type, callback, inline,
+        timeout if timeout is not None else CALLBACK_TIMEOUT_SECONDS,
+        queue_size or CALLBACK_QUEUE_SIZE,
+    ))
 
 
 def trigger_callbacks(event_type: str, **kwargs):
     """Trigger all registered callbacks for an event type."""
-    for callback in _callbacks.get(event_type, []):
-        try:
-            callback(**kwargs)
-        except Exception as e:
-            logger.error(f"Callback error in {event_type}: {e}")
+    for subscriber in _callbacks.get(event_type, []):
+        if subscriber.inline:
+            subscriber.run_inline(kwargs)
+        else:
+            subscriber.dispatch(kwargs)
+
+
+async def atrigger_callbacks(event_type: str, **kwargs):
+    """trigger_callbacks for async callers: inline `async def` hooks are awaited on the caller's loop."""
+    for subscriber in _callbacks.get(event_type, []):
+        if subscriber.inline:
+            await subscriber.run_inline_async(kwargs)
+        else:
+            subscriber.dispatch(kwargs)
+
+
+def callback_stats() -> List[Dict[str, Any]]:
+    """Per-callback dispatch, drop, timeout and lag counters."""
+    return [s.stats() for subscribers in _callbacks.values() for s in subscribers]
+
+
+def _callback_gauges():
+    samples = [
+        ({"callback": stats["callback"], "event_type": stats["event_type"], "stat": key}, value)
+        for stats in callback_stats()
+        for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+    return [("tutor_callback_stat", "Dispatch, drop, timeout and lag counters per registered callback", samples)]
+
+
+metrics.register_collector(_callback_gauges)
 
 
 # ---------------------------------------------------
@@ -46,23 +225,69 @@ def with_callbacks(source: str):
     """
     Decorator that adds callback hooks to agent functions.
     
+    Works for plain functions, `async def` functions and async generators.
+    
     Usage:
         @with_callbacks("TeacherAgent")
         def teacher_explain(...):
             ...
     """
     def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @wraps(func)
+            async def stream_wrapper(*args, **kwargs):
+                await atrigger_callbacks("on_start", source=source, function=func.__name__, args=args, kwargs=kwargs)
+                started = time.perf_counter()
+                chunks = []
+                try:
+                    async for chunk in func(*args, **kwargs):
+                        chunks.append(chunk)
+                        yield chunk
+                except Exception as e:
+                    await atrigger_callbacks("on_error", source=source, function=func.__name__, error=str(e), args=args,
+                                             kwargs=kwargs, duration=time.perf_counter() - started)
+                    monitor_event(source, "error", {"function": func.__name__, "error": str(e)})
+                    raise
+                # Completion hooks see the assembled text, same as the non-streaming functions
+                result = "".join(chunks) if all(isinstance(c, str) for c in chunks) else chunks
+                await atrigger_callbacks("on_complete", source=source, function=func.__name__, result=result, args=args,
+                                         kwargs=kwargs, duration=time.perf_counter() - started)
+                monitor_event(source, "complete", {"function": func.__name__, "success": True})
+
+            return stream_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                await atrigger_callbacks("on_start", source=source, function=func.__name__, args=args, kwargs=kwargs)
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                    await atrigger_callbacks("on_complete", source=source, function=func.__name__, result=result, args=args,
+                                             kwargs=kwargs, duration=time.perf_counter() - started)
+                    monitor_event(source, "complete", {"function": func.__name__, "success": True})
+                    return result
+                except Exception as e:
+                    await atrigger_callbacks("on_error", source=source, function=func.__name__, error=str(e), args=args,
+                                             kwargs=kwargs, duration=time.perf_counter() - started)
+                    monitor_event(source, "error", {"function": func.__name__, "error": str(e)})
+                    raise
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Trigger on_start callback
             trigger_callbacks("on_start", source=source, function=func.__name__, args=args, kwargs=kwargs)
+            started = time.perf_counter()
             
             try:
                 # Execute the function
                 result = func(*args, **kwargs)
                 
                 # Trigger on_complete callback
-                trigger_callbacks("on_complete", source=source, function=func.__name__, result=result)
+                trigger_callbacks("on_complete", source=source, function=func.__name__, result=result, args=args,
+                                  kwargs=kwargs, duration=time.perf_counter() - started)
                 
                 # Also log via monitor_event
                 monitor_event(source, "complete", {"function": func.__name__, "success": True})
@@ -71,7 +296,8 @@ def with_callbacks(source: str):
             
             except Exception as e:
                 # Trigger on_error callback
-                trigger_callbacks("on_error", source=source, function=func.__name__, error=str(e), args=args)
+                trigger_callbacks("on_error", source=source, function=func.__name__, error=str(e), args=args,
+                                  kwargs=kwargs, duration=time.perf_counter() - started)
                 
                 # Log error
                 monitor_event(source, "error", {"function": func.__name__, "error": str(e)})
@@ -88,35 +314,34 @@ def log_intermediate(source: str, step: str, data: Any):
     Triggers on_intermediate callbacks.
     """
     trigger_callbacks("on_intermediate", source=source, step=step, data=data)
-    monitor_event(source, "intermediate", {"step": step, "data": str(data)[:500]})
+    # The monitoring writer truncates the payload off the request path
+    monitor_event(source, "intermediate", {"step": step, "data": data})
 
 
 # ---------------------------------------------------
 # Default Callbacks (Auto-registered)
 # ---------------------------------------------------
+# Completions, errors and intermediate steps are already recorded by
+# with_callbacks / log_intermediate through the monitoring queue, so only the
+# start event needs a default hook.
 def _default_start_callback(source: str, function: str, **kwargs):
     """Default callback for agent start events."""
-    logger.info(f"[CALLBACK] {source}.{function} started")
-
-
-def _default_complete_callback(source: str, function: str, result: Any, **kwargs):
-    """Default callback for agent completion events."""
-    logger.info(f"[CALLBACK] {source}.{function} completed successfully")
-
+    monitor_event(source, "start", {"function": function})
 
-def _default_error_callback(source: str, function: str, error: str, **kwargs):
-    """Default callback for agent error events."""
-    logger.error(f"[CALLBACK] {source}.{function} failed: {error}")
 
+def _metrics_complete_callback(source: str, function: str, result: Any, duration: float = 0.0,
+                               args: tuple = (), kwargs: dict = None, **_):
+    """Feeds the /metrics histograms (see agents/metrics.py)."""
+    agent_duration.observe(duration, source, function, "success")
+    agent_payload.observe(sum(map(payload_size, args)) + payload_size(kwargs or {}), source, function, "in")
+    agent_payload.observe(payload_size(result), source, function, "out")
 
-def _default_intermediate_callback(source: str, step: str, data: Any, **kwargs):
-    """Default callback for intermediate outputs."""
-    logger.debug(f"[CALLBACK] {source} intermediate step '{step}': {str(data)[:200]}")
 
+def _metrics_error_callback(source: str, function: str, duration: float = 0.0, **_):
+    agent_duration.observe(duration, source, function, "error")
 
-# Register default callbacks
-register_callback("on_start", _default_start_callback)
-register_callback("on_complete", _default_complete_callback)
-register_callback("on_error", _default_error_callback)
-register_callback("on_intermediate", _default_intermediate_callback)
 
+# Register default callbacks (all cheap, so they run inline)
+register_callback("on_start", _default_start_callback, inline=True)
+register_callback("on_complete", _metrics_complete_callback, inline=True)
+register_callback("on_error", _metrics_error_callback, inline=True)
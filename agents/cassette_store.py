@@ -0,0 +1,153 @@
+"""
+Cassette Store for Recorded LLM Calls
+Prompt/response pairs, with their timing, kept in a small SQLite file keyed by
+a hash of the model, temperature and messages. Written in record mode and read
+in replay mode by agents.llm_cassette.CassetteLLM, so plan, quiz and lesson
+pipelines can be benchmarked offline against real model output.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# off | record (always call the model, store every reply) |
+# replay (serve stored replies, fail on a miss) | auto (replay hits, record misses)
+CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = Path(os.getenv("LLM_CASSETTE_PATH", str(Path("state") / "llm_cassette.sqlite")))
+# 0 replays instantly, 1 waits the recorded latency, 0.5 half of it, ...
+CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "0"))
+CASSETTE_MODES = ("off", "record", "replay", "auto")
+
+
+# ---------------------------------------------------
+# Key Helpers
+# ---------------------------------------------------
+def _normalize_messages(messages: Any) -> list:
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    return [{"role": m.get("role"), "content": m.get("content")} for m in messages]
+
+
+def prompt_key(model: str, temperature: Optional[float], messages: Any) -> str:
+    raw = json.dumps([model, temperature, _normalize_messages(messages)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _preview(messages: Any) -> str:
+    last = _normalize_messages(messages)[-1:] or [{}]
+    return str(last[0].get("content") or "")[:200]
+
+
+# ---------------------------------------------------
+# SQLite Cassette
+# ---------------------------------------------------
+class CassetteStore:
+    """
+    One row per prompt hash; recording the same prompt again replaces it.
+    Replies are zlib-compressed, since plans and lessons are long and
+    repetitive. `seconds` is the model's wall time; `first_token_seconds` is
+    set when the reply was recorded from a stream.
+    """
+
+    def __init__(self, db_path: Path = CASSETTE_PATH):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "recorded": 0,
+            "recorded_llm_seconds": 0.0,
+            "replayed_llm_seconds": 0.0,
+        }
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cassette (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    preview TEXT,
+                    response BLOB NOT NULL,
+                    seconds REAL NOT NULL,
+                    first_token_seconds REAL,
+                    recorded_at REAL NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """{"response", "seconds", "first_token_seconds"} for a recorded prompt, else None."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT response, seconds, first_token_seconds FROM llm_cassette WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["replayed_llm_seconds"] += row[1]
+        return {
+            "response": zlib.decompress(row[0]).decode("utf-8"),
+            "seconds": row[1],
+            "first_token_seconds": row[2],
+        }
+
+    def record(self, key: str, model: str, messages: Any, response: str, seconds: float,
+               first_token_seconds: Optional[float] = None) -> None:
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cassette VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, _preview(messages), zlib.compress(response.encode("utf-8")),
+                     seconds, first_token_seconds, time.time()),
+                )
+            self._stats["recorded"] += 1
+            self._stats["recorded_llm_seconds"] += seconds
+
+    def clear(self) -> int:
+        with self._lock:
+            conn = self._db()
+            with conn:
+                return conn.execute("DELETE FROM llm_cassette").rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"mode": CASSETTE_MODE, "path": str(self.db_path)}
+        if CASSETTE_MODE == "off" and self._conn is None:
+            return stats
+        with self._lock:
+            stats.update(self._stats)
+            stats["entries"], stats["bytes"] = self._db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(response)), 0) FROM llm_cassette"
+            ).fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["recorded_llm_seconds"] = round(stats["recorded_llm_seconds"], 3)
+        stats["replayed_llm_seconds"] = round(stats["replayed_llm_seconds"], 3)
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared process-wide instance used by the agents
+cassette_store = CassetteStore()
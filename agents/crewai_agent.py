@@ -1,31 +1,63 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import math
 import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from crewai import Agent, Crew, LLM, Task
-from crewai.tools import tool
+
+# crewai (and litellm under it) takes seconds to import, so it is imported
+# where crews and LLMs are first built, not when this module loads.
+if TYPE_CHECKING:
+    from crewai import Agent, Crew, LLM
 
 # --- ENV LOADING ---
 env_path = Path(__file__).resolve().parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+from agents.json_repair import JSONRepairError, extract_json, parse_stats
 from agents.mcp_tools import call_mcp_tool
 from agents.shared_tools import monitor_event
-from state.context_store import load_study_plan, save_study_plan
-from state.models import Quiz, StudyPlan
+from agents.single_flight import flight_key, single_flight
+from state.context_store import add_bank_questions, get_study_plan, save_quiz, save_study_plan
+from state.models import Module, Quiz, QuizQuestion, StudyPlan
 
 GUIDELINES_PATH = Path("data") / "study_guidelines.json"
 
+# Bulk quiz generation limits (see generate_quizzes_async)
+QUIZ_BATCH_CONCURRENCY = int(os.getenv("QUIZ_BATCH_CONCURRENCY", "6"))
+QUIZ_TIMEOUT_SECONDS = float(os.getenv("QUIZ_TIMEOUT_SECONDS", "90"))
+
+# Crews block a thread for their whole run. They get one long-lived pool sized
+# for LLM waits instead of asyncio's CPU-sized default executor (min(32, cpus + 4)).
+CREW_MAX_WORKERS = int(os.getenv("CREW_MAX_WORKERS", "16"))
+_crew_executor = ThreadPoolExecutor(max_workers=CREW_MAX_WORKERS, thread_name_prefix="crew")
+
 # --- THE BRAIN: GROQ LLM ---
-# Using Groq for high-speed, 2026-standard performance
-groq_llm = LLM(
-    model="groq/llama-3.3-70b-versatile",
-    api_key=os.getenv("GROQ_API_KEY"),
-    temperature=0.2
-)
+# Using Groq for high-speed, 2026-standard performance.
+# Built on first use by _llm(); scripts may assign a StubLLM here beforehand.
+groq_llm: Optional["LLM"] = None
+_llm_lock = threading.Lock()
+
+def _llm() -> "LLM":
+    global groq_llm
+    if groq_llm is None:
+        with _llm_lock:
+            if groq_llm is None:
+                from crewai import LLM
+                from agents.llm_cassette import wrap
+                groq_llm = wrap(LLM(
+                    model="groq/llama-3.3-70b-versatile",
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    temperature=0.2
+                ))
+    return groq_llm
 
 def search_learning_resources(query: str) -> str:
     """Searches the web for high-quality learning resources and official documentation."""
@@ -34,41 +66,217 @@ def search_learning_resources(query: str) -> str:
         return "\n".join([f"- {i.get('title')}: {i.get('link')}" for i in results])
     except: return "No resources found."
 
+def search_learning_resources_batch(queries: str) -> str:
+    """Searches many topics at once, e.g. one per day of a plan. Put one query per line; returns links grouped by query with duplicate URLs removed."""
+    try:
+        batch = call_mcp_tool("batch_web_search", queries=queries.splitlines(), num_results=3)
+        lines = []
+        for query in batch["by_query"]:
+            lines.append(f"{query}:")
+            lines += [f"- {r['title']}: {r['link']}" for r in batch["results"] if r["query"] == query]
+        return "\n".join(lines) or "No resources found."
+    except: return "No resources found."
+
 def _get_search_tool():
+    from crewai.tools import tool
     return tool("Search learning resources")(search_learning_resources)
 
-def _get_study_plan_agent():
+def _get_batch_search_tool():
+    from crewai.tools import tool
+    return tool("Search learning resources in bulk")(search_learning_resources_batch)
+
+def _get_study_plan_agent() -> "Agent":
+    from crewai import Agent
     return Agent(
         role="Curriculum Architect",
         goal="Design high-end, intensive daily study plans in JSON format.",
         backstory="You are a world-class educator who specializes in rapid skill acquisition.",
-        llm=groq_llm,
-        tools=[_get_search_tool()],
+        llm=_llm(),
+        tools=[_get_search_tool(), _get_batch_search_tool()],
         allow_delegation=False,
         verbose=False
     )
 
+# --- POOLED CREWS ---
+# Building an Agent (plus its tools), Task and Crew costs far more than the
+# prompt that changes between requests. Each pool keeps ready single-task
+# crews whose Task is just "{prompt}"; a request borrows one, fills the
+# template through kickoff(inputs=...) and hands it back. A crewai Agent runs
+# one task at a time, so a crew is never shared while checked out; when every
+# pooled crew is busy a temporary one is built instead of queueing.
+CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "4"))
+
+class CrewPool:
+    def __init__(self, name: str, output_model: type, size: int = CREW_POOL_SIZE):
+        self.name = name
+        self.output_model = output_model
+        self.size = size
+        self._idle: "queue.LifoQueue[Crew]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._stats = {"built": 0, "checkouts": 0, "overflow": 0}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._stats[field] += 1
+
+    def _build(self) -> Crew:
+        from crewai import Crew, Task
+        agent = _get_study_plan_agent()
+        task = Task(
+            description="{prompt}",
+            expected_output="{expected_output}",
+            agent=agent,
+            output_json=self.output_model,
+            converter_cls=_raw_json_converter(),
+        )
+        self._count("built")
+        return Crew(agents=[agent], tasks=[task], verbose=False)
+
+    def warm(self) -> int:
+        """Fills the pool up to `size`; returns how many crews were built."""
+        built = 0
+        while self._idle.qsize() < self.size:
+            self._idle.put(self._build())
+            built += 1
+        return built
+
+    def reset(self) -> None:
+        """Drops idle crews, e.g. after swapping groq_llm for a stub."""
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                return
+
+    @contextmanager
+    def acquire(self):
+        self._count("checkouts")
+        try:
+            crew = self._idle.get_nowait()
+        except queue.Empty:
+            self._count("overflow")
+            crew = self._build()
+        try:
+            yield crew
+        finally:
+            if self._idle.qsize() < self.size:
+                self._idle.put(crew)
+
+    def kickoff(self, prompt: str, expected_output: str):
+        with self.acquire() as crew:
+            return crew.kickoff(inputs={"prompt": prompt, "expected_output": expected_output})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "size": self.size, "idle": self._idle.qsize()}
+
+_raw_json_converter_cls: Optional[type] = None
+
+def _raw_json_converter() -> type:
+    """
+    crewai Converter that hands the reply back untouched. crewai's own one
+    re-sends any reply that is not clean JSON to the LLM for re-formatting;
+    _plan_from_output / _quiz_from_output repair it locally instead.
+    """
+    global _raw_json_converter_cls
+    if _raw_json_converter_cls is None:
+        from crewai.utilities.converter import Converter
+
+        class RawJsonConverter(Converter):
+            def to_json(self, current_attempt: int = 1) -> str:
+                return self.text
+
+            async def ato_json(self, current_attempt: int = 1) -> str:
+                return self.text
+
+        _raw_json_converter_cls = RawJsonConverter
+    return _raw_json_converter_cls
+
+# Shared process-wide pools, one per output schema
+plan_crews = CrewPool("StudyPlanCrew", StudyPlan)
+quiz_crews = CrewPool("QuizCrew", Quiz)
+
+def _kickoff(pool: CrewPool, prompt: str, expected_output: str):
+    """Runs a pooled crew, sharing one run between identical concurrent prompts."""
+    return single_flight.run(flight_key(pool.name, prompt), lambda: pool.kickoff(prompt, expected_output))
+
+async def _kickoff_async(pool: CrewPool, prompt: str, expected_output: str):
+    return await single_flight.run_in_executor(
+        flight_key(pool.name, prompt), lambda: pool.kickoff(prompt, expected_output), _crew_executor
+    )
+
+def warm_up() -> Dict[str, Any]:
+    """
+    Startup hook: fills the crew pools and sends one tiny completion so the
+    LLM client's connection (DNS, TLS, HTTP pool) is open before the first
+    learner arrives. Failures are reported, never raised.
+    """
+    started = time.perf_counter()
+    report: Dict[str, Any] = {"crews_built": plan_crews.warm() + quiz_crews.warm()}
+    try:
+        _llm().call([{"role": "user", "content": "Reply with the single word OK."}])
+        report["llm"] = "ok"
+    except Exception as e:
+        report["llm"] = f"error: {e}"
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    monitor_event("CrewPool", "warm_up", report)
+    return report
+
+async def warm_up_async() -> Dict[str, Any]:
+    return await asyncio.get_running_loop().run_in_executor(_crew_executor, warm_up)
+
+# --- TOLERANT OUTPUT PARSING ---
+# A reply that fails to parse used to cost a whole new multi-thousand-token
+# generation. Replies are now extracted and repaired locally (json_repair);
+# entries that still fail validation are dropped, and only the missing plan
+# days or quiz questions are asked for again. Outcomes land in parse_stats.
+QUIZ_QUESTIONS = 5
+
+def _output_data(output) -> Tuple[Dict[str, Any], List[str]]:
+    """The crew reply as a dict plus the repairs it needed. Raises JSONRepairError."""
+    if isinstance(output.json_dict, dict):
+        return output.json_dict, []
+    if output.pydantic:
+        return output.pydantic.model_dump(), []
+    return extract_json(output.raw)
+
 def _parse_output(output, model_cls):
-    """Safely handles AI response and parses it into structured data."""
-    data: Dict[str, Any] | None = None
-    if output.json_dict: data = output.json_dict
-    elif output.pydantic: data = output.pydantic.model_dump()
-    else:
-        # Cleanup raw string for JSON parsing
-        raw = output.raw.strip().strip("`").replace("json", "")
-        data = json.loads(raw)
-    
-    if hasattr(model_cls, "model_validate"):
-        return model_cls.model_validate(data)
-    return model_cls.parse_obj(data)
+    """Extracts, repairs and validates the crew's JSON reply. Raises ValueError when it is unusable."""
+    try:
+        data, repairs = _output_data(output)
+        result = model_cls.model_validate(data)
+    except ValueError:
+        parse_stats.record(model_cls.__name__, "failed")
+        raise
+    parse_stats.record(model_cls.__name__, "repaired" if repairs else "clean", repairs)
+    return result
 
-def create_study_plan(subject: str, level: str, total_days: int, learner_name: str) -> StudyPlan:
-    """Generates a comprehensive day-by-day learning journey."""
-    
-    agent = _get_study_plan_agent()
-    
+def _valid_items(items: Any, model_cls: type) -> List[Any]:
+    """Validates list entries one by one, dropping the ones that do not fit the model."""
+    valid = []
+    for item in items if isinstance(items, list) else []:
+        try:
+            valid.append(model_cls.model_validate(item))
+        except ValueError:
+            continue
+    return valid
+
+def _reply_data(output, kind: str) -> Tuple[Dict[str, Any], List[str]]:
+    try:
+        return _output_data(output)
+    except JSONRepairError as e:
+        monitor_event("OutputParser", "unparseable", {"kind": kind, "error": str(e)[:200]})
+        return {}, ["unparseable"]
+
+def _as_int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def _plan_prompt(subject: str, level: str, total_days: int, learner_name: str) -> str:
     # THE PROMPT UPGRADE: High detail, Daily focus, No hashtags
-    task_description = f"""
+    return f"""
     Design an intensive {total_days}-day learning journey for {learner_name} to master {subject} at a {level} level.
     
     OUTPUT REQUIREMENTS:
@@ -76,21 +284,21 @@ def create_study_plan(subject: str, level: str, total_days: int, learner_name: s
     2. TITLES: Name the modules 'Day 1: [Topic]', 'Day 2: [Topic]', etc.
     3. NO HASHTAGS: Do NOT use the '#' character anywhere in the plan. Use bold text (**) for emphasis instead.
     4. CONTENT: Ensure each day has 3 learning objectives, 3 specific daily tasks, and 2-3 web resources.
+    5. RESOURCES: Gather them for all days in ONE call to 'Search learning resources in bulk' (one query per line), not day by day.
     
     The output must strictly follow the StudyPlan JSON schema.
     """
 
-    task = Task(
-        description=task_description,
-        expected_output=f"A JSON StudyPlan with {total_days} daily entries.",
-        agent=agent,
-        output_json=StudyPlan
-    )
-    
-    crew = Crew(agents=[agent], tasks=[task], verbose=False)
-    output = crew.kickoff()
-    
-    plan = _parse_output(output, StudyPlan)
+# Optional progress hook for background jobs: progress(stage, **details), with
+# stage one of "outline", "resources", "modules", "saved" (see agents.job_queue)
+Progress = Optional[Callable[..., None]]
+
+def _report(progress: Progress, stage: str, **details: Any) -> None:
+    if progress is not None:
+        progress(stage, **details)
+
+def _finalize_plan(plan: StudyPlan, subject: str, total_days: int, learner_name: str,
+                   session_id: Optional[str] = None) -> StudyPlan:
     plan.learner_name = learner_name
     
     # Metadata string-type fix for Pydantic safety
@@ -100,14 +308,297 @@ def create_study_plan(subject: str, level: str, total_days: int, learner_name: s
     metadata["theme"] = f"Mastering {subject} in {total_days} Days"
     plan.metadata = metadata
     
-    save_study_plan(plan)
+    save_study_plan(plan, session_id)
     return plan
 
-def generate_quiz_for_module(module_id: int, **kwargs) -> Quiz:
-    """Generates an assessment strictly based on the current module's objectives."""
+# --- CHUNKED GENERATION FOR LONG PLANS ---
+# A single completion for a 60-90 day plan is slow, runs into output-token
+# limits and is lost to one malformed character. Long plans instead get a
+# compact outline first, then week-sized chunks expanded in parallel; only
+# chunks that fail validation are re-asked.
+PLAN_CHUNK_DAYS = int(os.getenv("PLAN_CHUNK_DAYS", "7"))
+PLAN_CHUNKED_MIN_DAYS = int(os.getenv("PLAN_CHUNKED_MIN_DAYS", "21"))
+PLAN_CHUNK_RETRIES = int(os.getenv("PLAN_CHUNK_RETRIES", "2"))
+
+_PLANNER_SYSTEM = (
+    "You are a Curriculum Architect, a world-class educator who specializes in rapid skill acquisition. "
+    "Reply with JSON only. Never use the '#' character; use bold text (**) for emphasis instead."
+)
+
+_MODULE_SHAPE = """{"id": <day number>, "title": "Day <n>: <topic>", "duration_days": 1,
+      "learning_objectives": [3 strings], "daily_tasks": [3 strings], "resources": [2-3 URLs]}"""
+
+def _day_list(days: List[int]) -> str:
+    """[3, 4, 5, 9] -> "3-5, 9"."""
+    runs: List[List[int]] = []
+    for d in days:
+        if runs and d == runs[-1][-1] + 1:
+            runs[-1].append(d)
+        else:
+            runs.append([d])
+    return ", ".join(f"{r[0]}-{r[-1]}" if len(r) > 1 else str(r[0]) for r in runs)
+
+def _loads_llm_json(raw: str, kind: str = "planner") -> Dict[str, Any]:
+    """Parses the outermost JSON object in an LLM reply, repairing it where needed (see json_repair)."""
+    try:
+        data, repairs = extract_json(raw)
+    except JSONRepairError:
+        parse_stats.record(kind, "failed")
+        raise
+    parse_stats.record(kind, "repaired" if repairs else "clean", repairs)
+    return data
+
+def _ask_planner(prompt: str) -> str:
+    return _llm().call([
+        {"role": "system", "content": _PLANNER_SYSTEM},
+        {"role": "user", "content": prompt},
+    ])
+
+def _generate_outline(subject: str, level: str, total_days: int, learner_name: str) -> List[str]:
+    prompt = f"""
+    Outline an intensive {total_days}-day learning journey for {learner_name} to master {subject} at a {level} level.
+    Return ONLY this JSON: {{"days": ["<topic for day 1>", "<topic for day 2>", ...]}}
+    with exactly {total_days} short topic strings in learning order.
+    """
+    days: List[str] = []
+    for attempt in range(PLAN_CHUNK_RETRIES + 1):
+        try:
+            days = [str(d).strip() for d in _loads_llm_json(_ask_planner(prompt), "outline").get("days", [])]
+        except (ValueError, AttributeError) as e:
+            monitor_event("StudyPlanChunks", "outline_retry", {"attempt": attempt, "error": str(e)})
+            continue
+        if len(days) >= total_days:
+            return days[:total_days]
+        monitor_event("StudyPlanChunks", "outline_retry", {"attempt": attempt, "days": len(days)})
+    if not days:
+        raise ValueError(f"Could not generate an outline for {total_days} days")
+    # Short outline after all retries: cycle back over earlier topics as review days
+    return days + [f"Review and practice: {days[i % len(days)]}" for i in range(total_days - len(days))]
+
+def _chunk_ranges(total_days: int) -> List[Tuple[int, int]]:
+    return [(first, min(first + PLAN_CHUNK_DAYS - 1, total_days))
+            for first in range(1, total_days + 1, PLAN_CHUNK_DAYS)]
+
+def _outline_resources(subject: str, outline: List[str]) -> Dict[int, List[str]]:
+    """One concurrent search for every outline day, so chunks cite real links. Skipped without a search key."""
+    if not os.getenv("SERPAPI_KEY"):
+        return {}
+    queries = {day: f"{subject} {topic} tutorial".strip() for day, topic in enumerate(outline, start=1)}
+    batch = call_mcp_tool("batch_web_search", queries=list(queries.values()), num_results=3)
+    monitor_event("StudyPlanChunks", "resources", batch["summary"])
+    # by_query keeps every hit of every query; "results" is deduplicated across
+    # queries and would leave a day whose links an earlier day found empty
+    links = {q: list(dict.fromkeys(hits)) for q, hits in batch["by_query"].items()}
+    return {day: links[q] for day, q in queries.items() if links.get(q)}
+
+def _expand_chunk(subject: str, level: str, total_days: int, outline: List[str],
+                  first_day: int, last_day: int,
+                  resources: Optional[Dict[int, List[str]]] = None) -> Tuple[List[Module], int, bool]:
+    """
+    Expands one chunk of the outline into Modules. Returns (modules, retries
+    used, succeeded). Days that come back valid are kept; retries ask only
+    for the days still missing.
+    """
+    resources = resources or {}
+    by_id: Dict[int, Module] = {}
+    for attempt in range(PLAN_CHUNK_RETRIES + 1):
+        missing = [d for d in range(first_day, last_day + 1) if d not in by_id]
+        topics = "\n    ".join(
+            f"Day {d}: {outline[d - 1]}" + (f" (resources: {', '.join(resources[d])})" if d in resources else "")
+            for d in missing
+        )
+        prompt = f"""
+    Expand days {_day_list(missing)} of a {total_days}-day plan to master {subject} at a {level} level.
+    TOPICS:
+    {topics}
     
-    # 1. Load the existing plan from memory to get the real context
-    plan = load_study_plan()
+    Return ONLY this JSON: {{"modules": [...]}} with one object per day, each shaped as
+    {_MODULE_SHAPE}
+    Prefer the resources listed next to a topic when there are any.
+    """
+        try:
+            modules = _valid_items(_loads_llm_json(_ask_planner(prompt), "chunk").get("modules"), Module)
+            by_id.update((m.id, m) for m in modules if m.id in missing)
+            still_missing = [d for d in missing if d not in by_id]
+            if not still_missing:
+                return [by_id[d] for d in range(first_day, last_day + 1)], attempt, True
+            raise ValueError(f"missing days {still_missing}")
+        except ValueError as e:
+            monitor_event("StudyPlanChunks", "chunk_retry",
+                          {"days": f"{first_day}-{last_day}", "attempt": attempt, "error": str(e)[:200]})
+    # Keep the plan whole: fall back to bare outline days for what is still missing
+    monitor_event("StudyPlanChunks", "chunk_failed", {"days": f"{first_day}-{last_day}"})
+    return [by_id.get(d) or Module(id=d, title=f"Day {d}: {outline[d - 1]}", duration_days=1)
+            for d in range(first_day, last_day + 1)], PLAN_CHUNK_RETRIES, False
+
+def _assemble_chunked_plan(subject: str, level: str, total_days: int,
+                           ranges: List[Tuple[int, int]], results: List[Tuple[List[Module], int, bool]]) -> StudyPlan:
+    failed = [f"{first}-{last}" for (first, last), (_, _, ok) in zip(ranges, results) if not ok]
+    metadata = {
+        "generation_mode": "chunked",
+        "chunks": str(len(ranges)),
+        "chunk_retries": str(sum(retries for _, retries, _ in results)),
+    }
+    if failed:
+        metadata["outline_only_days"] = ", ".join(failed)
+    return StudyPlan(
+        subject=subject,
+        level=level,
+        duration_weeks=max(1, math.ceil(total_days / 7)),
+        modules=[m for modules, _, _ in results for m in modules],
+        metadata=metadata,
+    )
+
+def create_study_plan_chunked(subject: str, level: str, total_days: int, learner_name: str,
+                              session_id: Optional[str] = None) -> StudyPlan:
+    """Outline first, then every chunk expanded in parallel on the crew executor."""
+    outline = _generate_outline(subject, level, total_days, learner_name)
+    resources = _outline_resources(subject, outline)
+    ranges = _chunk_ranges(total_days)
+    results = list(_crew_executor.map(
+        lambda r: _expand_chunk(subject, level, total_days, outline, *r, resources), ranges
+    ))
+    plan = _assemble_chunked_plan(subject, level, total_days, ranges, results)
+    return _finalize_plan(plan, subject, total_days, learner_name, session_id)
+
+async def create_study_plan_chunked_async(subject: str, level: str, total_days: int, learner_name: str,
+                                          session_id: Optional[str] = None, progress: Progress = None) -> StudyPlan:
+    loop = asyncio.get_running_loop()
+    outline = await loop.run_in_executor(_crew_executor, _generate_outline, subject, level, total_days, learner_name)
+    _report(progress, "outline", days=len(outline))
+    resources = await loop.run_in_executor(_crew_executor, _outline_resources, subject, outline)
+    _report(progress, "resources", days=len(resources))
+    ranges = _chunk_ranges(total_days)
+    done = 0
+
+    async def _chunk(first: int, last: int):
+        nonlocal done
+        result = await loop.run_in_executor(
+            _crew_executor, _expand_chunk, subject, level, total_days, outline, first, last, resources
+        )
+        done += last - first + 1
+        _report(progress, "modules", done=done, total=total_days)
+        return result
+
+    results = await asyncio.gather(*[_chunk(first, last) for first, last in ranges])
+    plan = _assemble_chunked_plan(subject, level, total_days, ranges, list(results))
+    plan = await asyncio.to_thread(_finalize_plan, plan, subject, total_days, learner_name, session_id)
+    _report(progress, "saved", modules=len(plan.modules))
+    return plan
+
+def _reask_plan_days(subject: str, level: str, total_days: int, modules: List[Module],
+                     days: List[int]) -> Tuple[Dict[int, Module], int]:
+    """Asks the planner for just `days` of a plan that already has `modules`. Returns (found, LLM calls)."""
+    planned = "\n    ".join(m.title for m in modules) or "(none)"
+    found: Dict[int, Module] = {}
+    calls = 0
+    for start in range(0, len(days), PLAN_CHUNK_DAYS):
+        group = days[start:start + PLAN_CHUNK_DAYS]
+        for attempt in range(PLAN_CHUNK_RETRIES + 1):
+            missing = [d for d in group if d not in found]
+            if not missing:
+                break
+            prompt = f"""
+    Part of a {total_days}-day plan to master {subject} at a {level} level was lost. Days already planned:
+    {planned}
+    
+    Write ONLY the missing days {_day_list(missing)}, continuing the same progression.
+    Return ONLY this JSON: {{"modules": [...]}} with one object per day, each shaped as
+    {_MODULE_SHAPE}
+    """
+            calls += 1
+            try:
+                modules_back = _valid_items(_loads_llm_json(_ask_planner(prompt), "plan_days").get("modules"), Module)
+            except ValueError:
+                continue
+            found.update((m.id, m) for m in modules_back if m.id in missing)
+    return found, calls
+
+def _plan_from_output(output, subject: str, level: str, total_days: int) -> StudyPlan:
+    """
+    Parses the crew's plan. Days lost to truncation or failing validation are
+    re-asked on their own instead of regenerating the whole plan.
+    """
+    data, repairs = _reply_data(output, "StudyPlan")
+    try:
+        plan = StudyPlan.model_validate(data)
+    except ValueError:
+        metadata = data.get("metadata")
+        plan = StudyPlan(
+            subject=str(data.get("subject") or subject),
+            level=str(data.get("level") or level),
+            duration_weeks=_as_int(data.get("duration_weeks"), max(1, math.ceil(total_days / 7))),
+            modules=_valid_items(data.get("modules"), Module),
+            metadata={str(k): str(v) for k, v in metadata.items()} if isinstance(metadata, dict) else {},
+        )
+        repairs = repairs + ["invalid_entries"]
+
+    ids = [m.id for m in plan.modules]
+    numbered = len(set(ids)) == len(ids) and all(1 <= i <= total_days for i in ids)
+    if numbered:
+        missing = [d for d in range(1, total_days + 1) if d not in ids]
+    else:  # ids are not day numbers: count instead
+        missing = list(range(len(plan.modules) + 1, total_days + 1))
+    if not missing:
+        parse_stats.record("StudyPlan", "repaired" if repairs else "clean", repairs)
+        return plan
+
+    found, calls = _reask_plan_days(subject, level, total_days, plan.modules, missing)
+    lost = [d for d in missing if d not in found]
+    if not plan.modules and not found:
+        parse_stats.record("StudyPlan", "failed", repairs, calls)
+        raise ValueError(f"Could not generate a {total_days}-day study plan")
+    # Anything still missing becomes a review day so the plan keeps its length
+    plan.modules += [found.get(d) or Module(id=d, title=f"Day {d}: Review and practice", duration_days=1)
+                     for d in missing]
+    if numbered:
+        plan.modules.sort(key=lambda m: m.id)
+    if lost:
+        plan.metadata["placeholder_days"] = _day_list(lost)
+    parse_stats.record("StudyPlan", "reasked", repairs, calls)
+    monitor_event("OutputParser", "plan_days_reasked",
+                  {"days": _day_list(missing), "recovered": len(found), "calls": calls})
+    return plan
+
+def create_study_plan(subject: str, level: str, total_days: int, learner_name: str,
+                      session_id: Optional[str] = None) -> StudyPlan:
+    """Generates a comprehensive day-by-day learning journey, saved under the learner's session."""
+    if total_days >= PLAN_CHUNKED_MIN_DAYS:
+        return create_study_plan_chunked(subject, level, total_days, learner_name, session_id)
+    output = _kickoff(plan_crews, _plan_prompt(subject, level, total_days, learner_name),
+                      f"A JSON StudyPlan with {total_days} daily entries.")
+    plan = _plan_from_output(output, subject, level, total_days)
+    return _finalize_plan(plan, subject, total_days, learner_name, session_id)
+
+async def create_study_plan_async(subject: str, level: str, total_days: int, learner_name: str,
+                                  session_id: Optional[str] = None, progress: Progress = None) -> StudyPlan:
+    """
+    Async twin of create_study_plan. The crew uses a blocking search tool, so
+    it runs on the shared crew executor rather than blocking the event loop.
+    A single-shot crew writes the modules and gathers their resources in one
+    run, so only "modules" and "saved" are reported for it.
+    """
+    if total_days >= PLAN_CHUNKED_MIN_DAYS:
+        return await create_study_plan_chunked_async(subject, level, total_days, learner_name, session_id, progress)
+    output = await _kickoff_async(plan_crews, _plan_prompt(subject, level, total_days, learner_name),
+                                  f"A JSON StudyPlan with {total_days} daily entries.")
+    # Re-asking lost days blocks on the LLM, so parsing runs on the crew executor too
+    plan = await asyncio.get_running_loop().run_in_executor(
+        _crew_executor, _plan_from_output, output, subject, level, total_days
+    )
+    _report(progress, "modules", done=len(plan.modules), total=total_days)
+    # Saving writes the store and invalidates caches: off the event loop
+    plan = await asyncio.to_thread(_finalize_plan, plan, subject, total_days, learner_name, session_id)
+    _report(progress, "saved", modules=len(plan.modules))
+    return plan
+
+QUIZ_EXPECTED_OUTPUT = "A valid JSON Quiz object based strictly on the provided module objectives."
+
+def _quiz_prompt(module_id: int, session_id: Optional[str] = None, avoid: Optional[List[str]] = None,
+                 num_questions: int = QUIZ_QUESTIONS) -> str:
+    # 1. Load the learner's plan from memory to get the real context (a store read:
+    # async callers run this in a thread)
+    plan = get_study_plan(session_id)
     
     # 2. Find the specific module using the module_id
     module = None
@@ -120,12 +611,10 @@ def generate_quiz_for_module(module_id: int, **kwargs) -> Quiz:
     subject = plan.subject if plan else "the requested subject"
     module_title = module.title if module else f"Phase {module_id}"
     
-    agent = _get_study_plan_agent()
-    
     # 4. The Strict Technical Prompt: This kills the "Capital of France" random questions
-    task_description = f"""
+    return f"""
     Act as a Technical Examiner. You are creating a quiz for a student learning '{subject}'.
-    Your mission is to generate a 5-question multiple choice quiz for the module: '{module_title}'.
+    Your mission is to generate a {num_questions}-question multiple choice quiz for the module: '{module_title}'.
     
     THE QUIZ MUST BE STRICTLY BASED ON THESE LEARNING OBJECTIVES:
     {objectives}
@@ -137,16 +626,143 @@ def generate_quiz_for_module(module_id: int, **kwargs) -> Quiz:
     - Indicate exactly one correct answer.
     - Provide a short, helpful explanation for the correct answer.
     - DO NOT use the '#' character anywhere in your output.
+    """ + _avoid_block(avoid)
+
+def _avoid_block(avoid: Optional[List[str]]) -> str:
+    # Bank refills pass the questions already banked so each round adds new ones
+    if not avoid:
+        return ""
+    listed = "\n    ".join(f"- {q}" for q in avoid)
+    return f"""
+    These questions are already in the question bank. Do NOT repeat or rephrase them:
+    {listed}
     """
 
-    task = Task(
-        description=task_description, 
-        expected_output="A valid JSON Quiz object based strictly on the provided module objectives.", 
-        agent=agent, 
-        output_json=Quiz
-    )
+def _quiz_from_output(output, module_id: int, session_id: Optional[str] = None,
+                      avoid: Optional[List[str]] = None, num_questions: int = QUIZ_QUESTIONS) -> Quiz:
+    """
+    Parses the crew's quiz. Questions lost to truncation or failing validation
+    are re-asked on their own instead of regenerating the whole quiz.
+    """
+    data, repairs = _reply_data(output, "Quiz")
+    try:
+        quiz = Quiz.model_validate(data)
+    except ValueError:
+        title = data.get("module_title")
+        quiz = Quiz(
+            module_id=_as_int(data.get("module_id"), module_id),
+            module_title=str(title) if title else None,
+            questions=_valid_items(data.get("questions"), QuizQuestion),
+        )
+        repairs = repairs + ["invalid_entries"]
+    del quiz.questions[num_questions:]
+
+    calls = 0
+    for _ in range(PLAN_CHUNK_RETRIES + 1):
+        wanted = num_questions - len(quiz.questions)
+        if wanted <= 0:
+            break
+        written = "\n    ".join(f"- {q.question}" for q in quiz.questions) or "(none)"
+        prompt = f"""{_quiz_prompt(module_id, session_id, avoid, num_questions)}
+    These questions are already written:
+    {written}
     
+    Write ONLY {wanted} NEW question(s), different from the ones above.
+    Return ONLY this JSON: {{"questions": [...]}}, each shaped as
+    {{"question": "...", "options": ["A) ...", "B) ...", "C) ...", "D) ..."], "answer": "...", "explanation": "..."}}
+    """
+        calls += 1
+        try:
+            quiz.questions += _valid_items(_loads_llm_json(_ask_planner(prompt), "quiz_questions").get("questions"),
+                                           QuizQuestion)[:wanted]
+        except ValueError:
+            continue
+
+    if not quiz.questions:
+        parse_stats.record("Quiz", "failed", repairs, calls)
+        raise ValueError(f"Could not generate a quiz for module {module_id}")
+    if calls:
+        parse_stats.record("Quiz", "reasked", repairs, calls)
+        monitor_event("OutputParser", "quiz_questions_reasked",
+                      {"module_id": module_id, "questions": len(quiz.questions), "calls": calls})
+    else:
+        parse_stats.record("Quiz", "repaired" if repairs else "clean", repairs)
+    return quiz
+
+def generate_quiz_for_module(module_id: int, session_id: Optional[str] = None,
+                             avoid: Optional[List[str]] = None, num_questions: int = QUIZ_QUESTIONS,
+                             **kwargs) -> Quiz:
+    """
+    Generates a `num_questions` assessment strictly based on the current module's objectives.
+    `avoid` lists questions the quiz must not repeat (see agents.quiz_bank).
+    """
     # 5. Run the crew and return the result
-    crew = Crew(agents=[agent], tasks=[task], verbose=False)
-    output = crew.kickoff()
-    return _parse_output(output, Quiz)
\ No newline at end of file
+    output = _kickoff(quiz_crews, _quiz_prompt(module_id, session_id, avoid, num_questions), QUIZ_EXPECTED_OUTPUT)
+    return _quiz_from_output(output, module_id, session_id, avoid, num_questions)
+
+async def generate_quiz_for_module_async(module_id: int, session_id: Optional[str] = None,
+                                         avoid: Optional[List[str]] = None, num_questions: int = QUIZ_QUESTIONS,
+                                         **kwargs) -> Quiz:
+    """Async twin of generate_quiz_for_module (see create_study_plan_async)."""
+    prompt = await asyncio.to_thread(_quiz_prompt, module_id, session_id, avoid, num_questions)
+    output = await _kickoff_async(quiz_crews, prompt, QUIZ_EXPECTED_OUTPUT)
+    return await asyncio.get_running_loop().run_in_executor(
+        _crew_executor, _quiz_from_output, output, module_id, session_id, avoid, num_questions
+    )
+
+async def generate_quizzes_async(
+    module_ids: Optional[List[int]] = None,
+    num_questions: int = QUIZ_QUESTIONS,
+    concurrency: Optional[int] = None,
+    timeout_seconds: Optional[float] = None,
+    session_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Generates quizzes for many modules (default: every module in the plan) with
+    at most `concurrency` crews running at once and a per-module timeout.
+    Each quiz is persisted as soon as it completes, so a partial batch is never lost.
+    Crews run on the shared crew executor: a timed-out crew stops being
+    awaited, but its worker thread finishes in the background. Store reads
+    and writes run in threads, off the event loop.
+    """
+    if module_ids is None:
+        plan = await asyncio.to_thread(get_study_plan, session_id)
+        module_ids = [m.id for m in plan.modules] if plan else []
+    # Never more crews than QUIZ_BATCH_CONCURRENCY, whatever the caller asks for
+    limit = asyncio.Semaphore(min(max(1, concurrency or QUIZ_BATCH_CONCURRENCY), QUIZ_BATCH_CONCURRENCY))
+    timeout = timeout_seconds or QUIZ_TIMEOUT_SECONDS
+    batch_started = time.perf_counter()
+
+    async def _one(module_id: int) -> Dict[str, Any]:
+        async with limit:
+            started = time.perf_counter()
+            try:
+                quiz = await asyncio.wait_for(
+                    generate_quiz_for_module_async(module_id, session_id, num_questions=num_questions), timeout
+                )
+                quiz.module_id = module_id
+                await asyncio.to_thread(save_quiz, quiz, session_id)
+                # Every generated question also serves later retakes
+                await asyncio.to_thread(add_bank_questions, module_id, quiz.questions, session_id)
+            except asyncio.TimeoutError:
+                monitor_event("QuizBatch", "module_timeout", {"module_id": module_id, "timeout": timeout})
+                return {"module_id": module_id, "status": "timeout", "seconds": round(time.perf_counter() - started, 3)}
+            except Exception as e:
+                monitor_event("QuizBatch", "module_failed", {"module_id": module_id, "error": str(e)})
+                return {"module_id": module_id, "status": "error", "error": str(e),
+                        "seconds": round(time.perf_counter() - started, 3)}
+            return {"module_id": module_id, "status": "success",
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "quiz": quiz.model_dump() if hasattr(quiz, 'model_dump') else quiz.dict()}
+
+    results = await asyncio.gather(*[_one(mid) for mid in dict.fromkeys(module_ids)])
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("success", "timeout", "error")}
+    summary = {
+        "requested": len(results),
+        "succeeded": counts["success"],
+        "timed_out": counts["timeout"],
+        "failed": counts["error"],
+        "seconds": round(time.perf_counter() - batch_started, 3),
+    }
+    monitor_event("QuizBatch", "batch_complete", summary)
+    return {"summary": summary, "results": results}
@@ -0,0 +1,254 @@
+"""
+Paginated Reading for Large Course Files
+Serves CSV, JSONL and text files a page at a time. The first request for a
+file scans it once through mmap with NumPy and keeps an array of record start
+offsets, so any page afterwards is a single slice of the file: jumping to row
+N costs the same as reading row 0, and nothing outside the page is decoded.
+Row counts come from the index and sizes from os.stat, never from parsing.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import csv
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agents.single_flight import single_flight
+
+PARSE_FILE_PAGE_SIZE = int(os.getenv("PARSE_FILE_PAGE_SIZE", "100"))
+PARSE_FILE_MAX_PAGE_SIZE = int(os.getenv("PARSE_FILE_MAX_PAGE_SIZE", "1000"))
+FILE_INDEX_CACHE_ENTRIES = int(os.getenv("FILE_INDEX_CACHE_ENTRIES", "32"))
+_SCAN_CHUNK_BYTES = 16 * 1024 * 1024
+
+PAGED_TYPES = ("csv", "jsonl", "txt")
+
+
+class PageError(ValueError):
+    """Bad cursor, offset or file type for a paginated read."""
+
+
+def detect_file_type(path: str) -> str:
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == ".json":
+        return "json"
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "txt"
+
+
+# ---------------------------------------------------
+# Record Offset Index
+# ---------------------------------------------------
+class LineIndex:
+    """
+    Byte offset of every record start in one version of a file. CSV indexes
+    are quote-aware: a newline inside a quoted field does not start a record
+    (a newline is a boundary only when an even number of quotes precede it).
+    """
+
+    __slots__ = ("path", "size", "mtime_ns", "starts")
+
+    def __init__(self, path: str, size: int, mtime_ns: int, starts: np.ndarray):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.starts = starts
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def span(self, first: int, last: int) -> Tuple[int, int]:
+        """Byte range covering records [first, last)."""
+        end = int(self.starts[last]) if last < len(self.starts) else self.size
+        return int(self.starts[first]), end
+
+    @classmethod
+    def build(cls, path: str, quote_aware: bool) -> "LineIndex":
+        st = os.stat(path)
+        if st.st_size == 0:
+            return cls(path, 0, st.st_mtime_ns, np.zeros(0, dtype=np.int64))
+        boundaries: List[np.ndarray] = []
+        quotes_before = 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for base in range(0, st.st_size, _SCAN_CHUNK_BYTES):
+                chunk = np.frombuffer(mm, dtype=np.uint8, count=min(_SCAN_CHUNK_BYTES, st.st_size - base), offset=base)
+                newlines = np.flatnonzero(chunk == 0x0A)
+                if quote_aware:
+                    quotes = np.flatnonzero(chunk == 0x22)
+                    inside = (np.searchsorted(quotes, newlines) + quotes_before) % 2 == 1
+                    newlines = newlines[~inside]
+                    quotes_before += len(quotes)
+                boundaries.append(newlines.astype(np.int64) + base + 1)
+                del chunk  # the mmap cannot close while a NumPy view is alive
+        starts = np.concatenate([np.zeros(1, dtype=np.int64)] + boundaries)
+        if starts[-1] == st.st_size:
+            starts = starts[:-1]  # trailing newline does not open another record
+        return cls(path, st.st_size, st.st_mtime_ns, starts)
+
+
+class IndexCache:
+    """LRU of LineIndex per (path, quote_aware), rebuilt when the file's size or mtime changes."""
+
+    def __init__(self, max_entries: int = FILE_INDEX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, bool], LineIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0}
+
+    def get(self, path: str, quote_aware: bool) -> LineIndex:
+        path = os.path.realpath(path)
+        key = (path, quote_aware)
+        st = os.stat(path)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None and index.size == st.st_size and index.mtime_ns == st.st_mtime_ns:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return index
+        # Concurrent first pages of the same file share one scan
+        index = single_flight.run(("file_index", f"{path}|{quote_aware}|{st.st_size}|{st.st_mtime_ns}"),
+                                  lambda: LineIndex.build(path, quote_aware))
+        with self._lock:
+            self._stats["builds"] += 1
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "indexed_records": int(sum(len(i) for i in self._entries.values())),
+            }
+
+
+# Shared process-wide instance
+index_cache = IndexCache()
+
+
+# ---------------------------------------------------
+# Cursors
+# ---------------------------------------------------
+# Opaque to callers; pins the file version so a cursor never silently
+# continues into a file that was rewritten underneath it.
+def _encode_cursor(offset: int, index: LineIndex) -> str:
+    raw = json.dumps({"o": offset, "s": index.size, "m": index.mtime_ns}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, index: LineIndex) -> int:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset, size, mtime_ns = int(raw["o"]), raw["s"], raw["m"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise PageError("Invalid cursor") from None
+    if size != index.size or mtime_ns != index.mtime_ns:
+        raise PageError("File changed since the cursor was issued; start again from offset 0")
+    return offset
+
+
+# ---------------------------------------------------
+# Pages
+# ---------------------------------------------------
+def _read_span(path: str, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _records(index: LineIndex, first: int, last: int) -> List[str]:
+    """Records [first, last) decoded, without their line endings."""
+    if first >= last:
+        return []
+    start, end = index.span(first, last)
+    blob = _read_span(index.path, start, end)
+    bounds = [int(s) - start for s in index.starts[first:last]] + [end - start]
+    return [blob[a:b].decode("utf-8", errors="replace").rstrip("\r\n") for a, b in zip(bounds, bounds[1:])]
+
+
+def _header(index: LineIndex) -> List[str]:
+    return next(csv.reader(_records(index, 0, 1)), []) if len(index) else []
+
+
+def describe_file(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
+    """Size and record count from os.stat and the offset index; no rows are parsed."""
+    file_type = detect_file_type(file_path) if file_type == "auto" else file_type
+    st = os.stat(file_path)
+    info: Dict[str, Any] = {"file_type": file_type, "size_bytes": st.st_size, "modified": st.st_mtime}
+    if file_type in PAGED_TYPES:
+        index = index_cache.get(file_path, quote_aware=file_type == "csv")
+        if file_type == "csv":
+            info["columns"] = _header(index)
+            info["row_count"] = max(0, len(index) - 1)
+        else:
+            info["row_count"] = len(index)
+    return info
+
+
+def read_page(file_path: str, file_type: str = "auto", offset: Optional[int] = None,
+              limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of rows. Start from `offset` (0-based row) or from the `cursor`
+    returned by the previous page; `next_cursor` is None on the last page.
+    CSV rows are dicts keyed by the header, JSONL rows are parsed objects and
+    text rows are lines. Unparseable JSONL lines are reported in `errors`.
+    """
+    file_type = detect_file_type(file_path) if file_type == "auto" else file_type
+    if file_type not in PAGED_TYPES:
+        raise PageError(f"Pagination supports {', '.join(PAGED_TYPES)}; got {file_type}")
+    limit = max(1, min(limit or PARSE_FILE_PAGE_SIZE, PARSE_FILE_MAX_PAGE_SIZE))
+    index = index_cache.get(file_path, quote_aware=file_type == "csv")
+    row = _decode_cursor(cursor, index) if cursor else (offset or 0)
+    if row < 0:
+        raise PageError("offset must be >= 0")
+
+    skip = 1 if file_type == "csv" else 0  # record 0 of a CSV is its header
+    total = max(0, len(index) - skip)
+    first, last = min(row, total), min(row + limit, total)
+    records = _records(index, first + skip, last + skip)
+    errors: List[Dict[str, Any]] = []
+
+    if file_type == "csv":
+        header = _header(index)
+        data: List[Any] = list(csv.DictReader(records, fieldnames=header))
+    elif file_type == "jsonl":
+        data = []
+        for n, line in enumerate(records, start=first):
+            if not line.strip():
+                continue
+            try:
+                data.append(json.loads(line))
+            except ValueError as e:
+                errors.append({"row": n, "error": str(e)})
+    else:
+        data = records
+
+    page: Dict[str, Any] = {
+        "success": True,
+        "file_type": file_type,
+        "data": data,
+        "offset": first,
+        "limit": limit,
+        "total_rows": total,
+        "size_bytes": index.size,
+        "next_cursor": _encode_cursor(last, index) if last < total else None,
+    }
+    if errors:
+        page["errors"] = errors
+    return page
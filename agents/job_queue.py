@@ -0,0 +1,518 @@
+"""
+Persistent Background Job Queue
+Long-running work (study plan generation) is stored as a row in a SQLite job
+table and executed by a bounded pool of asyncio workers, so the HTTP request
+returns a job id at once instead of holding a connection for the whole run.
+Jobs record their progress stages as they go, survive a process restart
+(a job left "running" by a dead process is queued again) and are retried
+with backoff on failure. Handlers must be idempotent: a retried or recovered
+job runs again from the start. The job table is only touched through
+asyncio.to_thread, so a busy database never stalls the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agents.shared_tools import monitor_event
+
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", str(Path("state") / "jobs.sqlite")))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "5"))  # doubled per attempt
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+# A running job not touched for this long belongs to a dead worker and is queued again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Idle workers and progress streams re-check the table this often (jobs from other processes)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+JOB_STATES = ("queued", "running", "succeeded", "failed")
+FINISHED_STATES = ("succeeded", "failed")
+
+# handler(params, progress) -> result; progress(stage, **details) records a stage
+# and is called on the event loop
+Handler = Callable[[Dict[str, Any], Callable[..., None]], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFull(RuntimeError):
+    """Too many jobs are already waiting to run."""
+
+
+def params_hash(kind: str, params: Dict[str, Any]) -> str:
+    raw = json.dumps([kind, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------
+# SQLite Job Table
+# ---------------------------------------------------
+class JobStore:
+    """
+    One row per job. `idempotency_key` is unique: submitting a key again
+    returns the job it already names. `events` is the JSON list of progress
+    stages; `owner` names the process running the job and `updated_at` is its
+    lease, refreshed by progress and heartbeats.
+    """
+
+    def __init__(self, db_path: Path = JOB_DB_PATH):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    params_hash TEXT NOT NULL,
+                    idempotency_key TEXT UNIQUE,
+                    state TEXT NOT NULL,
+                    stage TEXT,
+                    events TEXT NOT NULL DEFAULT '[]',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    owner TEXT,
+                    run_after REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, run_after)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_params ON jobs(params_hash, state)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["events"] = json.loads(job["events"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._row(self._db().execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone())
+
+    def submit(self, kind: str, params: Dict[str, Any], idempotency_key: Optional[str] = None,
+               max_attempts: int = JOB_MAX_ATTEMPTS, max_queued: int = JOB_MAX_QUEUED) -> Tuple[Dict[str, Any], bool]:
+        """
+        Returns (job, created). A known idempotency key returns its job, and
+        a failed one is queued again with fresh attempts. Without a key, an
+        identical job still queued or running is returned instead of a new one.
+        """
+        digest = params_hash(kind, params)
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                if idempotency_key:
+                    row = conn.execute("SELECT * FROM jobs WHERE idempotency_key=?", (idempotency_key,)).fetchone()
+                    if row is not None and row["params_hash"] != digest:
+                        raise ValueError("Idempotency key was already used for a different request")
+                    if row is not None and row["state"] == "failed":
+                        conn.execute(
+                            "UPDATE jobs SET state='queued', stage=NULL, events='[]', error=NULL, attempts=0, "
+                            "owner=NULL, run_after=?, updated_at=?, finished_at=NULL WHERE id=?",
+                            (now, now, row["id"]),
+                        )
+                        row = conn.execute("SELECT * FROM jobs WHERE id=?", (row["id"],)).fetchone()
+                else:
+                    row = conn.execute(
+                        "SELECT * FROM jobs WHERE params_hash=? AND state IN ('queued', 'running') "
+                        "ORDER BY created_at LIMIT 1", (digest,)
+                    ).fetchone()
+                if row is not None:
+                    return self._row(row), False
+                queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE state='queued'").fetchone()[0]
+                if queued >= max_queued:
+                    raise JobQueueFull(f"{queued} jobs are already queued; try again later")
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, params, params_hash, idempotency_key, state, max_attempts, "
+                    "run_after, created_at, updated_at) VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(params, ensure_ascii=False), digest, idempotency_key or None,
+                     max_attempts, now, now, now),
+                )
+                return self._row(conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()), True
+
+    def claim(self, owner: str, kinds: List[str]) -> Optional[Dict[str, Any]]:
+        """Moves the oldest runnable queued job to "running" for `owner`. The guarded UPDATE makes this safe across processes."""
+        marks = ", ".join("?" for _ in kinds)
+        with self._lock:
+            conn = self._db()
+            while True:
+                now = time.time()
+                row = conn.execute(
+                    f"SELECT id FROM jobs WHERE state='queued' AND run_after<=? AND kind IN ({marks}) "
+                    "ORDER BY run_after, created_at LIMIT 1", (now, *kinds)
+                ).fetchone()
+                if row is None:
+                    return None
+                with conn:
+                    claimed = conn.execute(
+                        "UPDATE jobs SET state='running', attempts=attempts+1, owner=?, updated_at=? "
+                        "WHERE id=? AND state='queued'", (owner, now, row["id"])
+                    ).rowcount
+                if claimed:
+                    return self._row(conn.execute("SELECT * FROM jobs WHERE id=?", (row["id"],)).fetchone())
+
+    def progress(self, job_id: str, stage: str, details: Dict[str, Any]) -> None:
+        with self._lock:
+            conn = self._db()
+            with conn:
+                row = conn.execute("SELECT events FROM jobs WHERE id=?", (job_id,)).fetchone()
+                if row is None:
+                    return
+                events = json.loads(row["events"])
+                events.append({"stage": stage, "at": round(time.time(), 3), **details})
+                conn.execute("UPDATE jobs SET stage=?, events=?, updated_at=? WHERE id=?",
+                             (stage, json.dumps(events, ensure_ascii=False), time.time(), job_id))
+
+    def finish(self, job_id: str, result: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET state='succeeded', result=?, error=NULL, owner=NULL, updated_at=?, "
+                    "finished_at=? WHERE id=?", (json.dumps(result, ensure_ascii=False), now, now, job_id)
+                )
+
+    def fail(self, job_id: str, error: str, backoff: float = JOB_RETRY_BACKOFF_SECONDS, retry: bool = True) -> bool:
+        """
+        Records a failed attempt. Returns True if the job was queued again for
+        another attempt; retry=False fails it for good whatever attempts are left.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id=?", (job_id,)).fetchone()
+                if row is None:
+                    return False
+                if retry and row["attempts"] < row["max_attempts"]:
+                    conn.execute(
+                        "UPDATE jobs SET state='queued', error=?, owner=NULL, run_after=?, updated_at=? WHERE id=?",
+                        (error, now + backoff * 2 ** (row["attempts"] - 1), now, job_id),
+                    )
+                    return True
+                conn.execute("UPDATE jobs SET state='failed', error=?, owner=NULL, updated_at=?, finished_at=? "
+                             "WHERE id=?", (error, now, now, job_id))
+                return False
+
+    def release(self, job_id: str) -> None:
+        """Puts an interrupted job back in the queue without spending an attempt (shutdown)."""
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    "UPDATE jobs SET state='queued', attempts=MAX(attempts - 1, 0), owner=NULL, run_after=?, "
+                    "updated_at=? WHERE id=? AND state='running'", (now, now, job_id)
+                )
+
+    def heartbeat(self, owner: str) -> None:
+        with self._lock:
+            conn = self._db()
+            with conn:
+                conn.execute("UPDATE jobs SET updated_at=? WHERE state='running' AND owner=?", (time.time(), owner))
+
+    def recover(self, is_dead: Callable[[str], bool], lease: float = JOB_LEASE_SECONDS) -> int:
+        """
+        Queues again the running jobs whose owner is dead or whose lease ran
+        out. A job that has used all its attempts is failed instead, so a job
+        that kills its worker cannot loop forever. Returns the jobs recovered.
+        """
+        now = time.time()
+        recovered = 0
+        with self._lock:
+            conn = self._db()
+            with conn:
+                rows = conn.execute("SELECT id, owner, attempts, max_attempts, updated_at FROM jobs "
+                                    "WHERE state='running'").fetchall()
+                for row in rows:
+                    if not (is_dead(row["owner"] or "") or row["updated_at"] < now - lease):
+                        continue
+                    if row["attempts"] < row["max_attempts"]:
+                        conn.execute("UPDATE jobs SET state='queued', owner=NULL, run_after=?, updated_at=? "
+                                     "WHERE id=? AND state='running'", (now, now, row["id"]))
+                    else:
+                        conn.execute("UPDATE jobs SET state='failed', error='Worker lost during the last attempt', "
+                                     "owner=NULL, updated_at=?, finished_at=? WHERE id=?", (now, now, row["id"]))
+                    recovered += 1
+        return recovered
+
+    def purge(self, older_than: float = JOB_RETENTION_SECONDS) -> int:
+        with self._lock:
+            conn = self._db()
+            with conn:
+                return conn.execute("DELETE FROM jobs WHERE state IN ('succeeded', 'failed') AND finished_at<?",
+                                    (time.time() - older_than,)).rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = dict.fromkeys(JOB_STATES, 0)
+        counts.update({state: n for state, n in rows})
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# ---------------------------------------------------
+# Worker Pool
+# ---------------------------------------------------
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """The fields /jobs/{id} reports."""
+    return {
+        "id": job["id"],
+        "kind": job["kind"],
+        "state": job["state"],
+        "stage": job["stage"],
+        "progress": job["events"],
+        "attempts": job["attempts"],
+        "max_attempts": job["max_attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "finished_at": job["finished_at"],
+        "result": job["result"],
+    }
+
+
+class JobQueue:
+    """
+    Runs stored jobs on `workers` asyncio tasks in the app's event loop.
+    Workers claim jobs from the table, so jobs submitted by another process
+    or left behind by a dead one are picked up too. A sweeper renews the
+    leases of this process's running jobs, recovers expired ones and purges
+    old finished jobs.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = JOB_WORKERS,
+                 timeout: float = JOB_TIMEOUT_SECONDS, lease: float = JOB_LEASE_SECONDS,
+                 poll: float = JOB_POLL_SECONDS):
+        self.store = store or JobStore()
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.lease = lease
+        self.poll = poll
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._changed: Optional[asyncio.Event] = None
+        # host:pid:boot token, so a restarted process with a reused pid is not mistaken for the old one
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "retried": 0, "recovered": 0}
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[field] += n
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self._handlers[kind] = handler
+
+    def _is_dead(self, owner: str) -> bool:
+        host, _, rest = owner.partition(":")
+        pid, _, _ = rest.partition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            return False  # another machine: left to the lease
+        if int(pid) == os.getpid():
+            return owner != self.owner  # our pid, an earlier boot
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def _notify(self) -> None:
+        # Wakes idle workers and progress streams; a fresh event for the next change
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def _wait_change(self, timeout: float) -> None:
+        event = self._changed or asyncio.Event()
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    # ----- lifecycle -----
+    async def start(self) -> None:
+        """Starts the workers and the sweeper on the running loop (app startup)."""
+        if self._tasks:
+            return
+        self._changed = asyncio.Event()
+        recovered = await asyncio.to_thread(self.store.recover, self._is_dead, self.lease)
+        if recovered:
+            self._count("recovered", recovered)
+            monitor_event("JobQueue", "jobs_recovered", {"jobs": recovered})
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self) -> None:
+        """Cancels the workers; their running jobs go back to the queue for the next start."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._changed = None
+
+    # ----- submitting and watching -----
+    async def submit(self, kind: str, params: Dict[str, Any],
+                     idempotency_key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind {kind!r}")
+        job, created = await asyncio.to_thread(self.store.submit, kind, params, idempotency_key)
+        self._count("submitted" if created else "deduplicated")
+        if created:
+            monitor_event("JobQueue", "job_submitted", {"job_id": job["id"], "kind": kind})
+        self._notify()
+        return job, created
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yields the job whenever it changes, ending with its finished state."""
+        last = None
+        while True:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            if job is None:
+                return
+            version = (job["state"], job["updated_at"], len(job["events"]))
+            if version != last:
+                last = version
+                yield job
+            if job["state"] in FINISHED_STATES:
+                return
+            await self._wait_change(self.poll)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """The job once finished, or as it stands after `timeout` seconds."""
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if timeout is None:
+            timeout = self.timeout * job["max_attempts"] if job else 0
+        deadline = time.monotonic() + timeout
+        while job is not None and job["state"] not in FINISHED_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await self._wait_change(min(self.poll, remaining))
+            job = await asyncio.to_thread(self.store.get, job_id)
+        return job
+
+    # ----- execution -----
+    async def _worker(self) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.owner, list(self._handlers))
+            if job is None:
+                await self._wait_change(self.poll)
+                continue
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        started = time.perf_counter()
+        # progress() is synchronous for the handler; one writer task records the
+        # stages in order off the event loop
+        stages: asyncio.Queue = asyncio.Queue()
+
+        async def _record() -> None:
+            while True:
+                stage, details = await stages.get()
+                try:
+                    await asyncio.to_thread(self.store.progress, job_id, stage, details)
+                    self._notify()
+                finally:
+                    stages.task_done()
+
+        def progress(stage: str, **details: Any) -> None:
+            stages.put_nowait((stage, details))
+
+        writer = asyncio.create_task(_record())
+        self._notify()
+        try:
+            result = await asyncio.wait_for(self._handlers[job["kind"]](job["params"], progress), self.timeout)
+            await stages.join()  # every stage lands before the finished state
+        except asyncio.CancelledError:
+            writer.cancel()
+            await asyncio.to_thread(self.store.release, job_id)
+            raise
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            # A timed-out handler's crew threads cannot be stopped and keep
+            # running, so a retry would start a second LLM run of the same job
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            if timed_out:
+                error = f"Job timed out after {self.timeout:g}s"
+            retrying = await asyncio.to_thread(self.store.fail, job_id, error, retry=not timed_out)
+            self._count("retried" if retrying else "failed")
+            monitor_event("JobQueue", "job_retrying" if retrying else "job_failed", {
+                "job_id": job_id, "kind": job["kind"], "attempt": job["attempts"], "error": error,
+            })
+        else:
+            await asyncio.to_thread(self.store.finish, job_id, result)
+            self._count("succeeded")
+            monitor_event("JobQueue", "job_succeeded", {
+                "job_id": job_id, "kind": job["kind"], "attempt": job["attempts"],
+                "seconds": round(time.perf_counter() - started, 3),
+            })
+        finally:
+            writer.cancel()
+        self._notify()
+
+    async def _sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.lease / 3, 0.1))
+            await asyncio.to_thread(self.store.heartbeat, self.owner)
+            recovered = await asyncio.to_thread(self.store.recover, self._is_dead, self.lease)
+            if recovered:
+                self._count("recovered", recovered)
+                monitor_event("JobQueue", "jobs_recovered", {"jobs": recovered})
+                self._notify()
+            await asyncio.to_thread(self.store.purge)
+
+    def stats(self) -> Dict[str, Any]:
+        """Reads the job table: call from a sync route (threadpool) or via asyncio.to_thread."""
+        with self._lock:
+            stats = dict(self._stats)
+        counts = self.store.counts()
+        # queued/running at top level so /metrics exports them; "jobs" has every state in the table
+        return {**stats, "queued": counts["queued"], "running": counts["running"], "workers": self.workers,
+                "started": bool(self._tasks), "jobs": counts}
+
+
+# Shared process-wide instance used by the coordinator
+job_queue = JobQueue()
@@ -0,0 +1,209 @@
+"""
+Tolerant JSON Extraction for LLM Replies
+Finds the outermost JSON object in a noisy reply (code fences, chatter before
+and after) and repairs the defects models commonly produce, in one linear scan:
+trailing commas, smart or single quotes, invalid escapes, Python literals and
+output cut off mid-object. Parse outcomes are counted so /metrics can show how many full
+regenerations the repairs and partial re-asks saved.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+_OPEN = {"{": "}", "[": "]"}
+_SMART_DOUBLE = "\u201c\u201d\u201e"  # curly double quotes
+_ESCAPES = set('"\\/bfnrtu')
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class JSONRepairError(ValueError):
+    """No JSON object could be recovered from the text."""
+
+
+# ---------------------------------------------------
+# Single-Pass Scanner
+# ---------------------------------------------------
+def _scan(text: str, start: int) -> Tuple[str, Optional[int], List[str]]:
+    """
+    Copies the value opening at text[start] into valid JSON. Returns
+    (json text, index just past the value or None if the text ran out first,
+    repairs applied). Truncated values are cut back to the last complete
+    element and their open brackets closed.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    repairs: set = set()
+    # (length of out, open brackets) after each complete element, for truncation
+    safe_point: Tuple[int, Tuple[str, ...]] = (0, ())
+    quote: Optional[str] = None  # closing characters of the open string
+    escape = False
+    i, n = start, len(text)
+
+    while i < n:
+        ch = text[i]
+        if quote is not None:
+            if escape:
+                escape = False
+                out.append(ch)
+            elif ch == "\\":
+                if i + 1 < n and text[i + 1] == "'":
+                    # Python-repr \' (it\'s): a plain apostrophe, not the closing quote
+                    out.append("'")
+                    if quote == '"':
+                        repairs.add("invalid_escapes")
+                    i += 2
+                    continue
+                if i + 1 < n and text[i + 1] not in _ESCAPES:
+                    out.append("\\\\")  # e.g. a regex like \d: keep the backslash literally
+                    repairs.add("invalid_escapes")
+                else:
+                    escape = True
+                    out.append(ch)
+            elif ch in quote:
+                quote = None
+                out.append('"')
+            elif ch == '"':
+                out.append('\\"')  # a plain quote inside a smart- or single-quoted string
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            quote = '"'
+            out.append(ch)
+        elif ch in _SMART_DOUBLE:
+            quote = _SMART_DOUBLE
+            repairs.add("smart_quotes")
+            out.append('"')
+        elif ch in "'\u2018":
+            quote = "'" if ch == "'" else "\u2019"
+            repairs.add("single_quotes")
+            out.append('"')
+        elif ch in _OPEN:
+            stack.append(_OPEN[ch])
+            out.append(ch)
+        elif ch in "}]":
+            if not stack or ch != stack[-1]:
+                break  # stray closer: stop and treat the value as cut off here
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                repairs.add("trailing_commas")
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return "".join(out), i + 1, sorted(repairs)
+            safe_point = (len(out), tuple(stack))
+        elif ch == ",":
+            safe_point = (len(out), tuple(stack))
+            out.append(ch)
+        else:
+            literal = next((lit for lit in _LITERALS if text.startswith(lit, i)), None)
+            if literal:
+                repairs.add("python_literals")
+                out.append(_LITERALS[literal])
+                i += len(literal)
+                continue
+            out.append(ch)
+        i += 1
+
+    # Ran out of text inside the value: keep the complete elements only
+    repairs.add("truncated")
+    length, open_brackets = safe_point
+    body = "".join(out[:length]).rstrip().rstrip(",")
+    return body + "".join(reversed(open_brackets)), None, sorted(repairs)
+
+
+def extract_json(text: str) -> Tuple[Any, List[str]]:
+    """
+    Returns (the outermost JSON object in `text`, repairs applied). Text
+    around the object is ignored; the repairs list is empty for a reply that
+    was already a clean JSON object. Raises JSONRepairError when nothing
+    parses.
+    """
+    if not isinstance(text, str):
+        raise JSONRepairError(f"Expected text, got {type(text).__name__}")
+    start = text.find("{")
+    # Fast path: a well-formed object, possibly wrapped in fences or chatter, parses at C speed
+    end = text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1], strict=False)
+        except json.JSONDecodeError:
+            pass
+        else:
+            if isinstance(data, dict):
+                return data, (["extracted"] if text[:start].strip() or text[end + 1:].strip() else [])
+    error = "No JSON object in LLM output"
+    while start != -1:
+        candidate, end, repairs = _scan(text, start)
+        try:
+            data = json.loads(candidate, strict=False)
+        except json.JSONDecodeError as e:
+            error = f"Unrepairable JSON at offset {start}: {e}"
+        else:
+            if isinstance(data, dict):
+                if text[:start].strip() or (end is not None and text[end:].strip()):
+                    repairs = ["extracted"] + repairs
+                return data, repairs
+        if end is None:
+            break
+        start = text.find("{", end)
+    raise JSONRepairError(error)
+
+
+def loads(text: str) -> Any:
+    """extract_json without the repairs list."""
+    return extract_json(text)[0]
+
+
+# ---------------------------------------------------
+# Outcome Counters
+# ---------------------------------------------------
+class ParseStats:
+    """
+    Per-kind parse outcomes: "clean" (valid as returned), "repaired" (valid
+    after extract_json repairs), "reasked" (completed by asking the model for
+    the missing part only) and "failed". Every repaired or re-asked parse is
+    a full regeneration that would otherwise have been needed.
+    """
+
+    OUTCOMES = ("clean", "repaired", "reasked", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_kind: Dict[str, Dict[str, int]] = {}
+        self._repairs: Dict[str, int] = {}
+        self._reask_calls = 0
+
+    def record(self, kind: str, outcome: str, repairs: Optional[List[str]] = None, reask_calls: int = 0) -> None:
+        with self._lock:
+            counts = self._by_kind.setdefault(kind, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+            for repair in repairs or ():
+                self._repairs[repair] = self._repairs.get(repair, 0) + 1
+            self._reask_calls += reask_calls
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_kind = {kind: dict(counts) for kind, counts in self._by_kind.items()}
+            repairs = dict(self._repairs)
+            reask_calls = self._reask_calls
+        totals = {o: sum(c[o] for c in by_kind.values()) for o in self.OUTCOMES}
+        parsed = sum(totals.values())
+        return {
+            **totals,
+            "retries_saved": totals["repaired"] + totals["reasked"],
+            "reask_calls": reask_calls,
+            "salvage_rate": round((totals["repaired"] + totals["reasked"]) / parsed, 4) if parsed else 0.0,
+            "repairs": repairs,
+            "by_kind": by_kind,
+        }
+
+
+# Shared process-wide instance used by the agents
+parse_stats = ParseStats()
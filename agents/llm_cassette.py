@@ -0,0 +1,161 @@
+"""
+Record/Replay Wrapper for the Groq LLMs
+CassetteLLM sits between the agents and the real LLM. In record mode every
+call goes to the model and the reply is written to the cassette store; in
+replay mode replies come from the store, optionally after their recorded
+latency. Enabled with LLM_CASSETTE_MODE (see agents.cassette_store). The
+async paths read and write the store with asyncio.to_thread.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+from agents.cassette_store import (
+    CASSETTE_LATENCY_SCALE,
+    CASSETTE_MODE,
+    CASSETTE_MODES,
+    CassetteStore,
+    cassette_store,
+    prompt_key,
+)
+
+
+class CassetteMiss(LookupError):
+    """Replay mode met a prompt that was never recorded."""
+
+
+async def astream_completion(llm: Any, messages: Any) -> AsyncIterator[str]:
+    """Yields completion text as it arrives. LLMs with a native astream() (e.g. StubLLM) use it."""
+    if hasattr(llm, "astream"):
+        async for chunk in llm.astream(messages):
+            yield chunk
+        return
+    import litellm
+    response = await litellm.acompletion(
+        model=llm.model,
+        messages=messages,
+        api_key=llm.api_key,
+        temperature=llm.temperature,
+        stream=True,
+    )
+    async for part in response:
+        delta = part.choices[0].delta.content if part.choices else None
+        if delta:
+            yield delta
+
+
+class CassetteLLM(BaseLLM):
+    """
+    Wraps `inner` (the real LLM) with the given cassette `mode`.
+
+    The wrapper reports no native function calling, so crew agents use the
+    text tool protocol and every reply is a plain string, in both record and
+    replay. Replayed streams yield the reply in `chunk_size` pieces, after the
+    recorded time to first token and spread over the rest of the recorded
+    time (both scaled by `latency_scale`).
+    """
+
+    inner: Optional[Any] = None
+    mode: str = "replay"
+    latency_scale: float = CASSETTE_LATENCY_SCALE
+    chunk_size: int = 16
+    store: Any = None
+
+    def _store(self) -> CassetteStore:
+        return self.store or cassette_store
+
+    def _key(self, messages: Any) -> str:
+        return prompt_key(self.model, self.temperature, messages)
+
+    def _replayed(self, key: str) -> Optional[dict]:
+        if self.mode not in ("replay", "auto"):
+            return None
+        entry = self._store().lookup(key)
+        if entry is None and self.mode == "replay":
+            raise CassetteMiss(f"No recorded reply for prompt {key[:12]} in {self._store().db_path}")
+        return entry
+
+    def _sync_inner(self) -> Any:
+        if self.inner is None:
+            raise CassetteMiss("CassetteLLM has no inner LLM to record from")
+        # crewai sets stop words on the LLM it was given, i.e. on this wrapper
+        if self.stop:
+            self.inner.stop = list(self.stop)
+        return self.inner
+
+    def call(self, messages: Any, tools: Any = None, callbacks: Any = None,
+             available_functions: Any = None, from_task: Any = None,
+             from_agent: Any = None, response_model: Any = None) -> str:
+        key = self._key(messages)
+        entry = self._replayed(key)
+        if entry is not None:
+            if self.latency_scale:
+                time.sleep(entry["seconds"] * self.latency_scale)
+            return entry["response"]
+        inner = self._sync_inner()
+        started = time.perf_counter()
+        response = inner.call(messages, callbacks=callbacks, from_task=from_task, from_agent=from_agent)
+        self._store().record(key, self.model, messages, str(response), time.perf_counter() - started)
+        return response
+
+    async def acall(self, messages: Any, tools: Any = None, callbacks: Any = None,
+                    available_functions: Any = None, from_task: Any = None,
+                    from_agent: Any = None, response_model: Any = None) -> str:
+        key = self._key(messages)
+        entry = await asyncio.to_thread(self._replayed, key)
+        if entry is not None:
+            if self.latency_scale:
+                await asyncio.sleep(entry["seconds"] * self.latency_scale)
+            return entry["response"]
+        inner = self._sync_inner()
+        started = time.perf_counter()
+        response = await inner.acall(messages, callbacks=callbacks, from_task=from_task, from_agent=from_agent)
+        await asyncio.to_thread(self._store().record, key, self.model, messages, str(response),
+                                time.perf_counter() - started)
+        return response
+
+    async def astream(self, messages: Any) -> AsyncIterator[str]:
+        key = self._key(messages)
+        entry = await asyncio.to_thread(self._replayed, key)
+        if entry is not None:
+            reply = entry["response"]
+            first = entry["first_token_seconds"]
+            first = entry["seconds"] if first is None else first
+            chunks = max(1, -(-len(reply) // self.chunk_size))
+            gap = max(0.0, entry["seconds"] - first) / chunks
+            if self.latency_scale and first:
+                await asyncio.sleep(first * self.latency_scale)
+            for start in range(0, len(reply), self.chunk_size):
+                if start and self.latency_scale and gap:
+                    await asyncio.sleep(gap * self.latency_scale)
+                yield reply[start:start + self.chunk_size]
+            return
+
+        inner = self._sync_inner()
+        parts, first = [], None
+        started = time.perf_counter()
+        async for chunk in astream_completion(inner, messages):
+            if first is None:
+                first = time.perf_counter() - started
+            parts.append(chunk)
+            yield chunk
+        await asyncio.to_thread(self._store().record, key, self.model, messages, "".join(parts),
+                                time.perf_counter() - started, first_token_seconds=first)
+
+    def get_context_window_size(self) -> int:
+        if self.inner is not None:
+            return self.inner.get_context_window_size()
+        return super().get_context_window_size()
+
+
+def wrap(llm: Any, mode: str = CASSETTE_MODE) -> Any:
+    """Returns `llm` behind a CassetteLLM, or unchanged when the cassette is off."""
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"LLM_CASSETTE_MODE must be one of {', '.join(CASSETTE_MODES)}, got {mode!r}")
+    if mode == "off":
+        return llm
+    return CassetteLLM(model=llm.model, temperature=llm.temperature, inner=llm, mode=mode)
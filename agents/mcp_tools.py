@@ -3,20 +3,160 @@ MCP (Model Context Protocol) Tools for Agent Integration
 Implements external tools that agents can use.
 """
 import os
+import threading
+import time
 import requests
 import json
-from typing import List, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from agents import calculator, file_pages
+from agents.single_flight import single_flight
 
 load_dotenv()
 
+SEARCH_API_URL = os.getenv("SEARCH_API_URL", "https://serpapi.com/search.json")
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "10"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "3600"))
+SEARCH_NEGATIVE_TTL_SECONDS = float(os.getenv("SEARCH_NEGATIVE_TTL_SECONDS", "30"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+MCP_HTTP_POOL_SIZE = int(os.getenv("MCP_HTTP_POOL_SIZE", "16"))
+SEARCH_BATCH_CONCURRENCY = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "8"))
+SEARCH_BATCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_BATCH_DEADLINE_SECONDS", "15"))
+PARSE_FILE_MAX_INLINE_BYTES = int(os.getenv("PARSE_FILE_MAX_INLINE_BYTES", str(20 * 1024 * 1024)))
+
+# ---------------------------------------------------
+# Shared HTTP Client
+# ---------------------------------------------------
+# One keep-alive connection pool per process, so repeated tool calls skip
+# DNS/TCP/TLS setup. requests.Session is safe to share for plain GETs.
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MCP_HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session, _session_pid = session, os.getpid()
+    return _session
+
+
+# ---------------------------------------------------
+# Search Result Cache
+# ---------------------------------------------------
+class SearchCache:
+    """
+    TTL + LRU cache of search results keyed by (normalized query, num_results).
+    Failures are cached too, for a much shorter time, so a flaky upstream is
+    not hit again by every agent step that repeats the same query.
+    """
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL_SECONDS, negative_ttl: float = SEARCH_NEGATIVE_TTL_SECONDS,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, bool, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "upstream_calls": 0, "upstream_errors": 0}
+
+    @staticmethod
+    def key(query: str, num_results: int) -> Tuple[str, int]:
+        return " ".join(query.lower().split()), int(num_results)
+
+    def get(self, key: Tuple[str, int]):
+        """Returns (found, ok, value); ok is False for a cached failure."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._stats["misses"] += 1
+                return False, False, None
+            self._entries.move_to_end(key)
+            self._stats["hits" if entry[1] else "negative_hits"] += 1
+            return True, entry[1], entry[2]
+
+    def put(self, key: Tuple[str, int], ok: bool, value: Any) -> None:
+        expires = time.monotonic() + (self.ttl if ok else self.negative_ttl)
+        with self._lock:
+            self._entries[key] = (expires, ok, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, field: str) -> None:
+        with self._lock:
+            self._stats[field] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["negative_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Shared process-wide instance used by mcp_web_search
+search_cache = SearchCache()
+
+
 # ---------------------------------------------------
 # 1. Web Search Tool (MCP-compatible)
 # ---------------------------------------------------
+def _search_error_result(query: str, error: str) -> List[Dict[str, str]]:
+    return [
+        {"title": f"Search Error: {error}", "link": "", "snippet": f"Could not fetch results for: {query}"}
+    ]
+
+
+def _fetch_search(query: str, num_results: int, api_key: str) -> List[Dict[str, str]]:
+    search_cache.count("upstream_calls")
+    response = http_session().get(
+        SEARCH_API_URL,
+        params={
+            "q": query,
+            "api_key": api_key,
+            "num": num_results,
+            "engine": "google"
+        },
+        timeout=SEARCH_TIMEOUT_SECONDS
+    )
+    response.raise_for_status()
+    data = response.json()
+    
+    results = []
+    for item in data.get("organic_results", [])[:num_results]:
+        results.append({
+            "title": item.get("title", ""),
+            "link": item.get("link", ""),
+            "snippet": item.get("snippet", "")
+        })
+    return results
+
+
 def mcp_web_search(query: str, num_results: int = 5) -> List[Dict[str, str]]:
     """
     Real web search tool using SerpAPI (can be replaced with any MCP-compatible search).
     Returns structured results that agents can use.
+    Results are cached per (query, num_results) and identical in-flight
+    searches share one upstream request.
     """
     api_key = os.getenv("SERPAPI_KEY")
     
@@ -27,84 +167,136 @@ def mcp_web_search(query: str, num_results: int = 5) -> List[Dict[str, str]]:
             {"title": f"Additional Resource: {query}", "link": "https://example.com", "snippet": f"More details on {query}"}
         ]
     
-    try:
-        response = requests.get(
-            "https://serpapi.com/search.json",
-            params={
-                "q": query,
-                "api_key": api_key,
-                "num": num_results,
-                "engine": "google"
-            },
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        results = []
-        for item in data.get("organic_results", [])[:num_results]:
-            results.append({
-                "title": item.get("title", ""),
-                "link": item.get("link", ""),
-                "snippet": item.get("snippet", "")
-            })
+    key = SearchCache.key(query, num_results)
+    found, ok, value = search_cache.get(key)
+    if found:
+        # Copies, so callers can edit their results without touching the cache
+        return [dict(r) for r in value] if ok else _search_error_result(query, value)
+    
+    def fetch():
+        try:
+            results = _fetch_search(query, num_results, api_key)
+        except Exception as e:
+            search_cache.count("upstream_errors")
+            search_cache.put(key, False, str(e))
+            raise
+        search_cache.put(key, True, results)
         return results
+    
+    try:
+        results = single_flight.run(("web_search", f"{key[0]}|{key[1]}"), fetch)
     except Exception as e:
         # Fallback on error
-        return [
-            {"title": f"Search Error: {str(e)}", "link": "", "snippet": f"Could not fetch results for: {query}"}
-        ]
+        return _search_error_result(query, str(e))
+    return [dict(r) for r in results]
+
+
+# ---------------------------------------------------
+# 1b. Batch Web Search Tool (MCP-compatible)
+# ---------------------------------------------------
+def _canonical_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def mcp_batch_web_search(queries: List[str], num_results: int = 5, concurrency: Optional[int] = None,
+                         deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Runs many web searches at once (at most `concurrency` in flight) and
+    returns whatever finished within `deadline_seconds`, deduplicated by URL.
+    Searches still running at the deadline are abandoned, not awaited; their
+    results land in the search cache when they complete.
+    """
+    started = time.perf_counter()
+    unique_queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    deadline = deadline_seconds or SEARCH_BATCH_DEADLINE_SECONDS
+    by_query: Dict[str, Any] = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency or SEARCH_BATCH_CONCURRENCY, len(unique_queries) or 1)),
+                              thread_name_prefix="search")
+    try:
+        pending = {pool.submit(mcp_web_search, q, num_results): q for q in unique_queries}
+        while pending:
+            remaining = deadline - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                by_query[pending.pop(future)] = future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    results, seen, failed, duplicates = [], set(), 0, 0
+    links: Dict[str, List[str]] = {}
+    # Keep the caller's query order so the first query to find a URL owns it
+    for query in unique_queries:
+        if query not in by_query:
+            continue
+        hits = [r for r in by_query[query] if r.get("link")]
+        if not hits:
+            failed += 1
+        links[query] = []
+        for item in hits:
+            url = _canonical_url(item["link"])
+            links[query].append(item["link"])
+            if url in seen:
+                duplicates += 1
+                continue
+            seen.add(url)
+            results.append({**item, "query": query})
+    return {
+        "results": results,
+        "by_query": links,
+        "summary": {
+            "queries": len(unique_queries),
+            "completed": len(by_query),
+            "timed_out": len(unique_queries) - len(by_query),
+            "failed": failed,
+            "unique_results": len(results),
+            "duplicates_removed": duplicates,
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+    }
 
 
 # ---------------------------------------------------
 # 2. Calculator Tool (MCP-compatible)
 # ---------------------------------------------------
-def mcp_calculator(expression: str) -> Dict[str, Any]:
+def mcp_calculator(expression: str, variables: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
     """
     Safe calculator tool that evaluates mathematical expressions.
     Returns structured result with calculation and explanation.
+    Expressions are compiled from their AST (see agents/calculator.py), never eval'd.
     """
-    import re
-    import math
-    
-    # Sanitize input - only allow safe math operations
-    safe_chars = re.compile(r'^[0-9+\-*/().\s,]+$')
-    if not safe_chars.match(expression):
-        return {
-            "result": None,
-            "error": "Invalid expression: Only numbers and basic math operators allowed",
-            "expression": expression
-        }
-    
-    try:
-        # Use eval with limited globals for safety
-        allowed_names = {
-            k: v for k, v in math.__dict__.items() if not k.startswith("__")
-        }
-        allowed_names.update({"abs": abs, "round": round, "min": min, "max": max})
-        
-        result = eval(expression, {"__builtins__": {}}, allowed_names)
-        
-        return {
-            "result": result,
-            "expression": expression,
-            "explanation": f"Calculated: {expression} = {result}"
-        }
-    except Exception as e:
-        return {
-            "result": None,
-            "error": str(e),
-            "expression": expression
-        }
+    return calculator.evaluate(expression, variables)
+
+
+def mcp_calculator_batch(expressions: Optional[List[str]] = None, expression: Optional[str] = None,
+                         variables: Optional[Dict[str, Any]] = None, expected: Optional[List[float]] = None,
+                         rel_tol: float = 1e-6, abs_tol: float = 1e-9) -> Dict[str, Any]:
+    """
+    Bulk calculator for checking numeric answers.
+    - `expressions`: many expressions, each evaluated with the scalar `variables`.
+    - `expression` + `variables` of equal-length lists: one formula over every
+      row at once with NumPy; pass `expected` to grade each row.
+    """
+    if expression is not None:
+        return calculator.evaluate_vectorized(expression, variables or {}, expected, rel_tol, abs_tol)
+    return {"results": calculator.evaluate_many(expressions or [], variables)}
 
 
 # ---------------------------------------------------
 # 3. File Parser Tool (MCP-compatible)
 # ---------------------------------------------------
-def mcp_parse_file(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
+def mcp_parse_file(file_path: str, file_type: str = "auto", offset: Optional[int] = None,
+                   limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, Any]:
     """
     Parse various file types and return structured data.
-    Supports: JSON, CSV, TXT
+    Supports: JSON, CSV, JSONL, TXT
+
+    Pass offset/limit or the previous page's `next_cursor` to read CSV, JSONL
+    or text a page at a time (see agents/file_pages.py). Files larger than
+    PARSE_FILE_MAX_INLINE_BYTES are always paged, starting at the first page.
     """
     import csv
     from pathlib import Path
@@ -121,12 +313,21 @@ def mcp_parse_file(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
     try:
         if file_type == "auto":
             # Auto-detect from extension
-            if path.suffix == ".json":
-                file_type = "json"
-            elif path.suffix == ".csv":
-                file_type = "csv"
-            else:
-                file_type = "txt"
+            file_type = file_pages.detect_file_type(file_path)
+        size = path.stat().st_size
+
+        paged = offset is not None or limit is not None or cursor is not None
+        if paged or size > PARSE_FILE_MAX_INLINE_BYTES:
+            if file_type not in file_pages.PAGED_TYPES:
+                return {
+                    "success": False,
+                    "error": f"{file_type} files cannot be paged; store large datasets as JSONL or CSV",
+                    "data": None
+                }
+            page = file_pages.read_page(file_path, file_type, offset, limit, cursor)
+            if not paged:
+                page["truncated"] = page["next_cursor"] is not None
+            return page
         
         if file_type == "json":
             with open(path, 'r', encoding='utf-8') as f:
@@ -135,11 +336,11 @@ def mcp_parse_file(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
                 "success": True,
                 "file_type": "json",
                 "data": data,
-                "size": len(str(data))
+                "size": size
             }
         
         elif file_type == "csv":
-            with open(path, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
                 reader = csv.DictReader(f)
                 rows = list(reader)
             return {
@@ -148,6 +349,16 @@ def mcp_parse_file(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
                 "data": rows,
                 "row_count": len(rows)
             }
+
+        elif file_type == "jsonl":
+            with open(path, 'r', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            return {
+                "success": True,
+                "file_type": "jsonl",
+                "data": rows,
+                "row_count": len(rows)
+            }
         
         else:  # txt
             with open(path, 'r', encoding='utf-8') as f:
@@ -167,13 +378,26 @@ def mcp_parse_file(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
         }
 
 
+def mcp_file_info(file_path: str, file_type: str = "auto") -> Dict[str, Any]:
+    """Cheap file metadata: size from os.stat, row count and CSV columns from the offset index."""
+    if not os.path.exists(file_path):
+        return {"success": False, "error": f"File not found: {file_path}"}
+    try:
+        return {"success": True, **file_pages.describe_file(file_path, file_type)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 # ---------------------------------------------------
 # MCP Tool Registry
 # ---------------------------------------------------
 MCP_TOOLS = {
     "web_search": mcp_web_search,
+    "batch_web_search": mcp_batch_web_search,
     "calculator": mcp_calculator,
-    "parse_file": mcp_parse_file
+    "calculator_batch": mcp_calculator_batch,
+    "parse_file": mcp_parse_file,
+    "file_info": mcp_file_info,
 }
 
 
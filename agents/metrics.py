@@ -0,0 +1,197 @@
+"""
+In-Process Metrics for /metrics
+Fixed-bucket histograms labelled by agent source or HTTP route, rendered in the
+Prometheus text format. Observing a value is a bisect plus three additions on
+preallocated counters, so memory stays flat no matter how many samples arrive;
+p50/p95/p99 are interpolated from the buckets at scrape time.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        slot = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q: float, snapshot=None) -> float:
+        """Linear interpolation inside the bucket holding the q-th sample."""
+        counts, _, count = snapshot or self.snapshot()
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for slot, n in enumerate(counts):
+            if seen + n >= rank and n:
+                if slot == len(self.bounds):
+                    return self.bounds[-1]  # beyond the last bound: report the bound
+                lower = self.bounds[slot - 1] if slot else 0.0
+                upper = self.bounds[slot]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+class HistogramFamily:
+    """One metric name, one Histogram per distinct label tuple."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any) -> Histogram:
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, Histogram(self.buckets))
+        return series
+
+    def observe(self, value: float, *labelvalues: Any) -> None:
+        self.labels(*labelvalues).observe(value)
+
+    def series(self) -> List[Tuple[Tuple[str, ...], Histogram]]:
+        with self._lock:
+            return list(self._series.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# A collector returns (name, help, [(labels dict, value), ...]) gauge families at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, HistogramFamily] = {}
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str],
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> HistogramFamily:
+        with self._lock:
+            family = self._histograms.get(name)
+            if family is None:
+                family = self._histograms[name] = HistogramFamily(name, help_text, labelnames, buckets)
+            return family
+
+    def register_collector(self, collector: Collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4."""
+        lines: List[str] = []
+        with self._lock:
+            families = list(self._histograms.values())
+            collectors = list(self._collectors)
+        for family in families:
+            series = family.series()
+            lines += [f"# HELP {family.name} {family.help}", f"# TYPE {family.name} histogram"]
+            for values, hist in series:
+                counts, total, count = hist.snapshot()
+                cumulative = 0
+                for bound, n in zip(family.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    le = 'le="%s"' % ("+Inf" if bound == float("inf") else _number(bound))
+                    lines.append(f"{family.name}_bucket{_labels(family.labelnames, values, le)} {cumulative}")
+                lines.append(f"{family.name}_sum{_labels(family.labelnames, values)} {_number(total)}")
+                lines.append(f"{family.name}_count{_labels(family.labelnames, values)} {count}")
+            # Precomputed percentiles, for dashboards that do not run histogram_quantile()
+            q_name = f"{family.name}_quantile"
+            lines += [f"# HELP {q_name} p50/p95/p99 of {family.name}, interpolated from its buckets",
+                      f"# TYPE {q_name} gauge"]
+            for values, hist in series:
+                snap = hist.snapshot()
+                for q in QUANTILES:
+                    label = _labels(family.labelnames, values, 'quantile="%s"' % q)
+                    lines.append(f"{q_name}{label} {_number(round(hist.quantile(q, snap), 6))}")
+        for collector in collectors:
+            for name, help_text, samples in collector():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def stats_collector(name: str, help_text: str, label: str,
+                    sources: Dict[str, Callable[[], Dict[str, Any]]]) -> Collector:
+    """Expose the numeric top-level fields of several stats() dicts as one gauge family."""
+    def collect():
+        samples = []
+        for source, stats_fn in sources.items():
+            for stat, value in stats_fn().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    samples.append(({label: source, "stat": stat}, value))
+        return [(name, help_text, samples)]
+    return collect
+
+
+def payload_size(value: Any) -> int:
+    """Rough size in characters: strings directly, one level into containers and models."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(v) for v in value.values() if isinstance(v, (str, bytes)))
+    if isinstance(value, (list, tuple)):
+        return sum(len(v) for v in value if isinstance(v, (str, bytes)))
+    fields = getattr(value, "__dict__", None)
+    if fields:
+        return sum(len(v) for v in fields.values() if isinstance(v, (str, bytes)))
+    return 0
+
+
+# Shared process-wide registry and the families the agents and routes record into
+metrics = MetricsRegistry()
+agent_duration = metrics.histogram(
+    "tutor_agent_call_duration_seconds", "Wall-clock time of agent functions wrapped by with_callbacks",
+    ("source", "function", "outcome"),
+)
+agent_payload = metrics.histogram(
+    "tutor_agent_payload_chars", "Characters in agent arguments (in) and results (out)",
+    ("source", "function", "direction"), SIZE_BUCKETS,
+)
+route_duration = metrics.histogram(
+    "tutor_http_request_duration_seconds", "Time to the last response byte per coordinator route",
+    ("method", "route", "status"),
+)
@@ -0,0 +1,200 @@
+"""
+Queue-Backed Monitoring Pipeline
+monitor_event() only drops a small tuple on a bounded in-memory queue; a
+background thread formats, truncates and writes the events as JSON lines in
+batches. When the queue is full events are dropped and counted rather than
+making a request wait on disk or stdout.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+MONITOR_LOG_PATH = Path(os.getenv("MONITOR_LOG_PATH", str(Path("logs") / "agent.jsonl")))
+MONITOR_QUEUE_SIZE = int(os.getenv("MONITOR_QUEUE_SIZE", "10000"))
+MONITOR_BATCH_SIZE = int(os.getenv("MONITOR_BATCH_SIZE", "256"))
+MONITOR_FLUSH_INTERVAL = float(os.getenv("MONITOR_FLUSH_INTERVAL", "0.2"))  # max wait for a batch to fill
+MONITOR_SAMPLE_RATE = float(os.getenv("MONITOR_SAMPLE_RATE", "1.0"))
+MONITOR_MAX_FIELD_CHARS = int(os.getenv("MONITOR_MAX_FIELD_CHARS", "500"))
+MONITOR_MAX_RECORD_CHARS = int(os.getenv("MONITOR_MAX_RECORD_CHARS", "4000"))
+MONITOR_STDOUT = os.getenv("MONITOR_STDOUT", "true").lower() in ("1", "true", "yes")
+
+_STOP = object()
+
+
+def _is_error(event: str) -> bool:
+    return "error" in event or "fail" in event or "timeout" in event
+
+
+def _truncate(value: Any, limit: int, depth: int = 0) -> Any:
+    """Shorten long strings (and anything str() would make long) inside a payload."""
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit] + f"...[+{len(value) - limit}]"
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    if depth < 2 and isinstance(value, dict):
+        return {str(k): _truncate(v, limit, depth + 1) for k, v in value.items()}
+    if depth < 2 and isinstance(value, (list, tuple)):
+        return [_truncate(v, limit, depth + 1) for v in value[:50]]
+    return _truncate(str(value), limit, depth)
+
+
+class EventPipeline:
+    def __init__(
+        self,
+        path: Path = MONITOR_LOG_PATH,
+        maxsize: int = MONITOR_QUEUE_SIZE,
+        batch_size: int = MONITOR_BATCH_SIZE,
+        flush_interval: float = MONITOR_FLUSH_INTERVAL,
+        sample_rate: float = MONITOR_SAMPLE_RATE,
+        max_field_chars: int = MONITOR_MAX_FIELD_CHARS,
+        max_record_chars: int = MONITOR_MAX_RECORD_CHARS,
+        echo: bool = MONITOR_STDOUT,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.max_field_chars = max_field_chars
+        self.max_record_chars = max_record_chars
+        self.echo = echo
+        self._queue: "queue.Queue" = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+        self._pid = None
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "sampled_out": 0,
+                       "batches": 0, "write_errors": 0}
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[field] += n
+
+    # ---------------------------------------------------
+    # Hot path
+    # ---------------------------------------------------
+    def emit(self, source: str, event: str, data: Any = None) -> bool:
+        """Queue one event; returns False if it was sampled out or dropped. Never blocks."""
+        if self.sample_rate < 1.0 and not _is_error(event) and random.random() >= self.sample_rate:
+            self._count("sampled_out")
+            return False
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((time.time(), source, event, data))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    # ---------------------------------------------------
+    # Background writer
+    # ---------------------------------------------------
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # First use, or a forked worker that inherited a dead writer thread
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._writer = threading.Thread(target=self._run, name="monitor-writer", daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def _format(self, ts: float, source: str, event: str, data: Any) -> str:
+        record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts % 1 * 1000):03d}Z",
+            "source": source,
+            "event": event,
+            "data": _truncate(data, self.max_field_chars),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        if len(line) > self.max_record_chars:
+            record["data"] = {"truncated": json.dumps(record["data"], ensure_ascii=False, default=str)
+                              [:self.max_record_chars // 2]}
+            line = json.dumps(record, ensure_ascii=False, default=str)
+        return line
+
+    def _write(self, batch) -> None:
+        lines = [self._format(*item) for item in batch]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            if self.echo:
+                sys.stdout.write("".join(
+                    f"[MONITOR] [{s}] {e} | DATA: {_truncate(d, self.max_field_chars)}\n" for _, s, e, d in batch
+                ))
+                sys.stdout.flush()
+            self._count("written", len(batch))
+            self._count("batches")
+        except (OSError, ValueError):
+            self._count("write_errors")
+
+    def _run(self) -> None:
+        q = self._queue
+        while True:
+            first = q.get()
+            batch, stop = [], first is _STOP
+            if not stop:
+                batch.append(first)
+            # Give the batch up to flush_interval to fill before writing it
+            deadline = time.monotonic() + self.flush_interval
+            while not stop and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                q.task_done()
+            if stop:
+                return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queued event is written (tests, benchmarks, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def close(self, timeout: float = 5.0) -> None:
+        if self._writer is None or self._pid != os.getpid():
+            return
+        self.flush(timeout)
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._writer.join(timeout)
+        self._pid = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["queue_capacity"] = self._queue.maxsize
+        stats["sample_rate"] = self.sample_rate
+        return stats
+
+
+# Shared process-wide instance behind shared_tools.monitor_event
+event_pipeline = EventPipeline()
+atexit.register(event_pipeline.close)
@@ -0,0 +1,264 @@
+"""
+Persistent Quiz-Question Bank
+Retakes used to run a fresh quiz crew (5-15 s) on every click. Each module
+now keeps a bank of questions in the context store, deduplicated by
+normalized question text. /generate-quiz samples `num_questions` from the
+bank at random; a background worker tops a bank up whenever it falls below
+the low-water mark, asking the crew for questions not already banked. A
+quiz is generated on the request path only when the module's bank is empty,
+and a bank holding fewer than `num_questions` has the shortfall generated
+(source "bank+generated") rather than serving a short quiz.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set, Tuple
+
+from agents.crewai_agent import QUIZ_QUESTIONS, generate_quiz_for_module, generate_quiz_for_module_async
+from agents.shared_tools import monitor_event
+from agents.single_flight import flight_key, single_flight
+from state.context_store import (
+    add_bank_questions,
+    clear_quiz_bank,
+    count_bank_questions,
+    get_study_plan,
+    recent_bank_questions,
+    sample_bank_questions,
+)
+from state.models import Quiz, StudyPlan
+
+QUIZ_BANK_ENABLED = os.getenv("QUIZ_BANK_ENABLED", "true").lower() in ("1", "true", "yes")
+QUIZ_BANK_TARGET_SIZE = int(os.getenv("QUIZ_BANK_TARGET_SIZE", "20"))
+QUIZ_BANK_LOW_WATER = int(os.getenv("QUIZ_BANK_LOW_WATER", "10"))
+QUIZ_BANK_WORKERS = int(os.getenv("QUIZ_BANK_WORKERS", "2"))
+# Only the first modules are filled when a plan is created; later ones fill on first use
+QUIZ_BANK_PREFILL_MODULES = int(os.getenv("QUIZ_BANK_PREFILL_MODULES", "7"))
+QUIZ_BANK_MAX_PENDING = int(os.getenv("QUIZ_BANK_MAX_PENDING", "256"))
+# Banked questions shown to the crew as "do not repeat"; bounds the prompt size
+QUIZ_BANK_AVOID_LIMIT = int(os.getenv("QUIZ_BANK_AVOID_LIMIT", "30"))
+# Most questions one refill round asks the crew for; bounds the reply size
+QUIZ_BANK_ROUND_QUESTIONS = int(os.getenv("QUIZ_BANK_ROUND_QUESTIONS", str(QUIZ_QUESTIONS)))
+
+# Two refill rounds in a row that add nothing new mean the crew has run dry
+_MAX_IDLE_ROUNDS = 2
+
+BankKey = Tuple[int, Optional[str]]  # (module_id, session_id)
+
+
+class QuizBank:
+    def __init__(
+        self,
+        enabled: bool = QUIZ_BANK_ENABLED,
+        target_size: int = QUIZ_BANK_TARGET_SIZE,
+        low_water: int = QUIZ_BANK_LOW_WATER,
+        workers: int = QUIZ_BANK_WORKERS,
+        prefill_modules: int = QUIZ_BANK_PREFILL_MODULES,
+        max_pending: int = QUIZ_BANK_MAX_PENDING,
+        avoid_limit: int = QUIZ_BANK_AVOID_LIMIT,
+        round_questions: int = QUIZ_BANK_ROUND_QUESTIONS,
+    ):
+        self.enabled = enabled
+        self.target_size = target_size
+        self.low_water = min(low_water, target_size)
+        self.workers = max(1, workers)
+        self.prefill_modules = prefill_modules
+        self.max_pending = max_pending
+        self.avoid_limit = avoid_limit
+        self.round_questions = max(1, round_questions)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending: Set[BankKey] = set()
+        self._stats = {
+            "served_from_bank": 0, "topped_up": 0, "fallbacks": 0, "refill_jobs": 0, "refill_rounds": 0,
+            "questions_added": 0, "duplicates": 0, "dropped": 0, "errors": 0,
+        }
+
+    def _count(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[field] += n
+
+    # ---------------------------------------------------
+    # Background Refill
+    # ---------------------------------------------------
+    def request_refill(self, module_id: int, session_id: Optional[str] = None, size: int = 0) -> bool:
+        """
+        Queues a top-up of the module's bank to target_size, or to `size` if
+        larger (a quiz bigger than the target). False if disabled, already
+        queued or the queue is full.
+        """
+        if not self.enabled:
+            return False
+        key = (module_id, session_id)
+        with self._lock:
+            if key in self._pending:
+                return False
+            if len(self._pending) >= self.max_pending:
+                self._stats["dropped"] += 1
+                return False
+            self._pending.add(key)
+            self._stats["refill_jobs"] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="quiz-bank")
+            executor = self._executor
+        executor.submit(self._refill, key, max(self.target_size, size))
+        return True
+
+    def _refill(self, key: BankKey, size: int) -> None:
+        module_id, session_id = key
+        started = time.perf_counter()
+        added_total, idle_rounds = 0, 0
+        try:
+            # A round asks for what is missing, at most round_questions; allow a few wasted rounds
+            for _ in range(math.ceil(size / self.round_questions) + _MAX_IDLE_ROUNDS):
+                missing = size - count_bank_questions(module_id, session_id)
+                if missing <= 0:
+                    break
+                avoid = recent_bank_questions(module_id, self.avoid_limit, session_id)
+                quiz = generate_quiz_for_module(module_id, session_id, avoid=avoid,
+                                                num_questions=min(missing, self.round_questions))
+                added = add_bank_questions(module_id, quiz.questions, session_id)
+                added_total += added
+                self._count("refill_rounds")
+                self._count("questions_added", added)
+                self._count("duplicates", len(quiz.questions) - added)
+                idle_rounds = 0 if added else idle_rounds + 1
+                if idle_rounds >= _MAX_IDLE_ROUNDS:
+                    break
+            monitor_event("QuizBank", "refilled", {
+                "module_id": module_id, "added": added_total,
+                "size": count_bank_questions(module_id, session_id),
+                "seconds": round(time.perf_counter() - started, 3),
+            })
+        except Exception as e:
+            self._count("errors")
+            monitor_event("QuizBank", "refill_failed", {"module_id": module_id, "error": str(e)})
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._idle.notify_all()
+
+    def fill_for_plan(self, plan: StudyPlan, session_id: Optional[str] = None) -> int:
+        """
+        Starts filling the banks for a freshly created plan. The session's old
+        questions belonged to the previous plan and are dropped. Returns the
+        number of modules queued.
+        """
+        if not self.enabled:
+            return 0
+        clear_quiz_bank(session_id)
+        return sum(self.request_refill(m.id, session_id) for m in plan.modules[: self.prefill_modules])
+
+    def drain(self, timeout: float = 60.0) -> bool:
+        """Waits until no refill is queued or running (benchmarks, shutdown). False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------------------------------------------------
+    # Serving
+    # ---------------------------------------------------
+    def _from_bank(self, module_id: int, num_questions: int, session_id: Optional[str]) -> Optional[Quiz]:
+        """A random sample of the bank, short of num_questions if the bank is; None if it is empty."""
+        questions = sample_bank_questions(module_id, num_questions, session_id)
+        if not questions:
+            return None
+        if count_bank_questions(module_id, session_id) < max(self.low_water, num_questions):
+            self.request_refill(module_id, session_id, num_questions)
+        plan = get_study_plan(session_id)
+        module = next((m for m in plan.modules if m.id == module_id), None) if plan else None
+        return Quiz(module_id=module_id, module_title=module.title if module else None, questions=questions)
+
+    def _banked(self, module_id: int, quiz: Quiz, session_id: Optional[str], num_questions: int = 0) -> None:
+        added = add_bank_questions(module_id, quiz.questions, session_id)
+        self._count("questions_added", added)
+        self._count("duplicates", len(quiz.questions) - added)
+        self.request_refill(module_id, session_id, num_questions)
+
+    def _topped_up(self, module_id: int, quiz: Quiz, extra: Quiz, num_questions: int,
+                   session_id: Optional[str]) -> Quiz:
+        self._count("topped_up")
+        self._banked(module_id, extra, session_id, num_questions)
+        quiz.questions += extra.questions[: num_questions - len(quiz.questions)]
+        return quiz
+
+    def get_quiz(self, module_id: int, num_questions: int = QUIZ_QUESTIONS,
+                 session_id: Optional[str] = None) -> Tuple[Quiz, str]:
+        """Returns (quiz, source) where source is "bank", "bank+generated" or "generated"."""
+        quiz = self._from_bank(module_id, num_questions, session_id) if self.enabled else None
+        if quiz is not None and len(quiz.questions) >= num_questions:
+            self._count("served_from_bank")
+            return quiz, "bank"
+        if quiz is not None:
+            extra = generate_quiz_for_module(module_id, session_id, avoid=[q.question for q in quiz.questions],
+                                             num_questions=num_questions - len(quiz.questions))
+            return self._topped_up(module_id, quiz, extra, num_questions, session_id), "bank+generated"
+        quiz = generate_quiz_for_module(module_id, session_id, num_questions=num_questions)
+        if self.enabled:
+            self._count("fallbacks")
+            self._banked(module_id, quiz, session_id, num_questions)
+        return quiz, "generated"
+
+    async def get_quiz_async(self, module_id: int, num_questions: int = QUIZ_QUESTIONS,
+                             session_id: Optional[str] = None) -> Tuple[Quiz, str]:
+        """
+        Async twin of get_quiz. The bank is read and written with
+        asyncio.to_thread, off the event loop. Concurrent fallbacks for one
+        empty bank share a single generation.
+        """
+        if not self.enabled:
+            return await generate_quiz_for_module_async(module_id, session_id, num_questions=num_questions), "generated"
+        quiz = await asyncio.to_thread(self._from_bank, module_id, num_questions, session_id)
+        if quiz is not None and len(quiz.questions) >= num_questions:
+            self._count("served_from_bank")
+            return quiz, "bank"
+        if quiz is not None:
+            extra = await generate_quiz_for_module_async(module_id, session_id, avoid=[q.question for q in quiz.questions],
+                                                         num_questions=num_questions - len(quiz.questions))
+            quiz = await asyncio.to_thread(self._topped_up, module_id, quiz, extra, num_questions, session_id)
+            return quiz, "bank+generated"
+
+        async def _generate() -> Quiz:
+            generated = await generate_quiz_for_module_async(module_id, session_id, num_questions=num_questions)
+            self._count("fallbacks")
+            await asyncio.to_thread(self._banked, module_id, generated, session_id, num_questions)
+            return generated
+
+        key = flight_key("quiz_bank_fallback", f"{session_id or ''}:{module_id}:{num_questions}")
+        quiz = await single_flight.run_async(key, _generate)
+        return quiz.model_copy(deep=True), "generated"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            pending = len(self._pending)
+        served = stats["served_from_bank"] + stats["topped_up"] + stats["fallbacks"]
+        return {
+            "enabled": self.enabled,
+            **stats,
+            "pending_refills": pending,
+            "bank_hit_rate": round(stats["served_from_bank"] / served, 4) if served else 0.0,
+            "target_size": self.target_size,
+            "low_water": self.low_water,
+            "round_questions": self.round_questions,
+        }
+
+
+# Shared process-wide instance used by the coordinator
+quiz_bank = QuizBank()
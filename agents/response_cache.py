@@ -0,0 +1,247 @@
+"""
+Response Cache for Teacher Agent Outputs
+Two-tier cache (in-memory LRU backed by SQLite) with TTL, size-based eviction
+and explicit invalidation. Sits in front of teacher_explain / get_topic_brief so
+repeated topics skip the Groq round-trip.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_DB_PATH = Path("state") / "response_cache.sqlite"
+
+DEFAULT_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+DEFAULT_MEMORY_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", "256"))
+CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
+# ---------------------------------------------------
+# Key Helpers
+# ---------------------------------------------------
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_topic(topic: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return _WS_RE.sub(" ", (topic or "").strip().lower()).strip(" .?!")
+
+
+def make_key(kind: str, topic: str, level: str, version: str) -> str:
+    raw = "|".join([kind, version, (level or "any").strip().lower(), normalize_topic(topic)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------
+# Two-Tier Cache
+# ---------------------------------------------------
+class ResponseCache:
+    """
+    LRU memory tier in front of a SQLite tier.
+
+    Memory entries hold (value, expires_at, llm_seconds). The SQLite tier
+    survives restarts and is shared between uvicorn workers; it is trimmed
+    to `max_entries` by least-recent access on every write.
+    """
+
+    def __init__(
+        self,
+        db_path: Path = CACHE_DB_PATH,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    ):
+        self.db_path = Path(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[str, float, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._stats: Dict[str, float] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+            "saved_llm_seconds": 0.0,
+        }
+
+    # ----- storage -----
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    level TEXT,
+                    value TEXT NOT NULL,
+                    llm_seconds REAL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_topic ON response_cache(kind, topic)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, value: str, expires_at: float, llm_seconds: float) -> None:
+        self._memory[key] = (value, expires_at, llm_seconds)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ----- public API -----
+    def lookup(self, kind: str, topic: str, level: str, version: str) -> Optional[str]:
+        """Return the cached response, or None on a miss / expired entry."""
+        if not CACHE_ENABLED:
+            return None
+        key = make_key(kind, topic, level, version)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at, llm_seconds = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    self._stats["saved_llm_seconds"] += llm_seconds
+                    return value
+                del self._memory[key]
+
+            conn = self._db()
+            row = conn.execute(
+                "SELECT value, expires_at, llm_seconds FROM response_cache WHERE key=?", (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            value, expires_at, llm_seconds = row
+            if expires_at <= now:
+                with conn:
+                    conn.execute("DELETE FROM response_cache WHERE key=?", (key,))
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            with conn:
+                conn.execute("UPDATE response_cache SET last_access=? WHERE key=?", (now, key))
+            self._remember(key, value, expires_at, llm_seconds or 0.0)
+            self._stats["disk_hits"] += 1
+            self._stats["saved_llm_seconds"] += llm_seconds or 0.0
+            return value
+
+    def store(
+        self,
+        kind: str,
+        topic: str,
+        level: str,
+        version: str,
+        value: str,
+        llm_seconds: float = 0.0,
+    ) -> None:
+        """Insert or refresh a response in both tiers and trim the SQLite tier."""
+        if not CACHE_ENABLED or not value:
+            return
+        key = make_key(kind, topic, level, version)
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at, llm_seconds)
+            conn = self._db()
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO response_cache
+                        (key, kind, topic, level, value, llm_seconds, created_at, expires_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        value=excluded.value, llm_seconds=excluded.llm_seconds,
+                        created_at=excluded.created_at, expires_at=excluded.expires_at,
+                        last_access=excluded.last_access
+                    """,
+                    (key, kind, normalize_topic(topic), (level or "any").lower(), value,
+                     llm_seconds, now, expires_at, now),
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()
+                excess = count - self.max_entries
+                if excess > 0:
+                    conn.execute(
+                        """
+                        DELETE FROM response_cache WHERE key IN (
+                            SELECT key FROM response_cache ORDER BY last_access ASC LIMIT ?
+                        )
+                        """,
+                        (excess,),
+                    )
+                    self._stats["evictions"] += excess
+            self._stats["writes"] += 1
+
+    def invalidate(self, kind: Optional[str] = None, topic: Optional[str] = None) -> int:
+        """
+        Drop cached responses. With no arguments everything is removed;
+        otherwise only rows matching the given kind and/or topic.
+        Returns the number of SQLite rows deleted.
+        """
+        clauses, params = [], []
+        if kind:
+            clauses.append("kind=?")
+            params.append(kind)
+        if topic:
+            clauses.append("topic=?")
+            params.append(normalize_topic(topic))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            conn = self._db()
+            with conn:
+                deleted = conn.execute(f"DELETE FROM response_cache{where}", params).rowcount
+                purge_expired = conn.execute(
+                    "DELETE FROM response_cache WHERE expires_at <= ?", (time.time(),)
+                ).rowcount
+            # Memory keys are hashes, so targeted invalidation just drops the tier.
+            self._memory.clear()
+            self._stats["invalidations"] += deleted
+            self._stats["expired"] += purge_expired
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_size"] = len(self._memory)
+            stats["disk_size"] = self._db().execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        stats["saved_llm_seconds"] = round(stats["saved_llm_seconds"], 3)
+        stats["enabled"] = CACHE_ENABLED
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared process-wide instance used by the agents
+response_cache = ResponseCache()
@@ -1,16 +1,20 @@
 import sqlite3
 import logging
+import re
 from datetime import datetime
 import os
 import json
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+
+from agents.monitoring import event_pipeline
 
 # ---------------------------------------------------
 # Lazy Initialization Helpers
 # ---------------------------------------------------
 _logger = None
 _DB_INITIALIZED = False
+_FTS_AVAILABLE = False
 DB_NAME = "notes.db"
 
 
@@ -39,23 +43,66 @@ def _ensure_initialized():
                 created_at TIMESTAMP
             )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_notes_module ON notes(module_id, id)")
+        _init_fts(cur)
         conn.commit()
         conn.close()
         _logger.info("Notes database initialized successfully.")
         _DB_INITIALIZED = True
 
 
+def _init_fts(cur: sqlite3.Cursor) -> None:
+    """
+    Full-text index over notes.content, kept in sync by triggers.
+    External-content FTS5 stores only the index, not a second copy of the text.
+    module_id is indexed as a token too, so module-scoped searches intersect
+    posting lists inside FTS5 instead of ranking every module's matches; user
+    terms are restricted to the content column (see search_notes_ranked).
+    """
+    global _FTS_AVAILABLE
+    try:
+        cur.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                content, module_id, content='notes', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: search_notes falls back to LIKE
+        _logger.info(f"FTS5 unavailable, notes search uses LIKE: {e}")
+        _FTS_AVAILABLE = False
+        return
+    cur.executescript("""
+        CREATE TRIGGER IF NOT EXISTS notes_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, content, module_id) VALUES (new.id, new.content, new.module_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS notes_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, content, module_id)
+            VALUES ('delete', old.id, old.content, old.module_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS notes_au AFTER UPDATE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, content, module_id)
+            VALUES ('delete', old.id, old.content, old.module_id);
+            INSERT INTO notes_fts(rowid, content, module_id) VALUES (new.id, new.content, new.module_id);
+        END;
+    """)
+    # Databases created before the index existed get backfilled once
+    if cur.execute("PRAGMA user_version").fetchone()[0] < 1:
+        cur.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+        cur.execute("PRAGMA user_version = 1")
+    _FTS_AVAILABLE = True
+
+
 # ---------------------------------------------------
 # Monitoring Function
 # ---------------------------------------------------
 def monitor_event(source: str, event: str, data=None):
     """
     Tracks agent execution, errors, flow, and debugging information.
+    Events are queued for the background writer in agents/monitoring.py
+    (logs/agent.jsonl), so the caller never waits on file or console I/O.
     """
-    _ensure_initialized()
-    msg = f"[MONITOR] [{source}] {event} | DATA: {data}"
-    _logger.info(msg)
-    print(msg)
+    event_pipeline.emit(source, event, data)
 
 
 # Provide a lazy logger proxy so other modules can `from agents.shared_tools import logger`
@@ -93,19 +140,99 @@ def add_note(module_id: int, content: str):
     conn.close()
 
 
-def search_notes(module_id: int, query: str):
+# Quoted phrases, or bare terms with an optional trailing * for prefix matching
+_QUERY_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def _fts_query(query: str) -> str:
     """
-    Allows doubt solver agent to fetch previous explanations.
+    Turn free text into a safe FTS5 MATCH expression: every term and "quoted
+    phrase" is required, and a trailing * (e.g. decor*) makes a prefix match.
+    Everything is quoted, so FTS5 operators typed by a user are plain words.
+    """
+    parts = []
+    for phrase, word in _QUERY_TOKEN_RE.findall(query or ""):
+        text = phrase if phrase else word
+        prefix = not phrase and text.endswith("*")
+        text = text.rstrip("*").replace('"', '""').strip()
+        if not text:
+            continue
+        parts.append(f'"{text}"*' if prefix else f'"{text}"')
+    return " ".join(parts)
+
+
+def search_notes_ranked(query: str, module_id: Optional[int] = None,
+                        limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """
+    BM25-ranked note search, optionally scoped to one module, one page at a time.
+    Returns {"results": [...], "next_offset": int | None}; an empty query lists
+    the newest notes instead.
     """
     conn = create_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT content FROM notes WHERE module_id=? AND content LIKE ?",
-        (module_id, f"%{query}%")
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return [r[0] for r in rows]
+    try:
+        match = _fts_query(query)
+        scope_sql = "" if module_id is None else "AND n.module_id = ?"
+        scope_args = () if module_id is None else (module_id,)
+        # One extra row tells us whether another page exists
+        if match and _FTS_AVAILABLE:
+            # Terms only match content, so a number in the query never hits a module id
+            match = f"content : ({match})"
+            if module_id is not None:
+                match = f'module_id : "{int(module_id)}" AND {match}'
+            # Weight 0 on module_id keeps the scope token out of the BM25 score
+            rows = conn.execute(
+                """
+                SELECT n.id, n.module_id, n.content, n.created_at,
+                       snippet(notes_fts, 0, '**', '**', '...', 16), bm25(notes_fts, 1.0, 0.0) AS rank
+                FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+                WHERE notes_fts MATCH ?
+                ORDER BY rank LIMIT ? OFFSET ?
+                """,
+                (match, limit + 1, offset),
+            ).fetchall()
+        elif match:
+            rows = conn.execute(
+                f"""
+                SELECT n.id, n.module_id, n.content, n.created_at, NULL, NULL
+                FROM notes n WHERE n.content LIKE ? {scope_sql}
+                ORDER BY n.id DESC LIMIT ? OFFSET ?
+                """,
+                (f"%{query}%", *scope_args, limit + 1, offset),
+            ).fetchall()
+        else:
+            where = "WHERE n.module_id = ?" if module_id is not None else ""
+            rows = conn.execute(
+                f"""
+                SELECT n.id, n.module_id, n.content, n.created_at, NULL, NULL
+                FROM notes n {where} ORDER BY n.id DESC LIMIT ? OFFSET ?
+                """,
+                (*scope_args, limit + 1, offset),
+            ).fetchall()
+    finally:
+        conn.close()
+
+    results = [
+        {
+            "id": note_id,
+            "module_id": mid,
+            "content": content,
+            "created_at": created_at,
+            "snippet": snippet or (content or "")[:160],
+            # bm25() is lower-is-better; flip it so callers sort by a positive score
+            "score": round(-score, 4) if score is not None else None,
+        }
+        for note_id, mid, content, created_at, snippet, score in rows[:limit]
+    ]
+    return {"results": results, "next_offset": offset + limit if len(rows) > limit else None}
+
+
+def search_notes(module_id: int, query: str, limit: int = 20, offset: int = 0):
+    """
+    Allows doubt solver agent to fetch previous explanations.
+    Best matches come first (see search_notes_ranked).
+    """
+    page = search_notes_ranked(query, module_id=module_id, limit=limit, offset=offset)
+    return [r["content"] for r in page["results"]]
 
 
 def web_search(query: str):
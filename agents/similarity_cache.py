@@ -0,0 +1,215 @@
+"""
+Near-Duplicate Question Cache for the Doubt Solver
+Keeps a per-subject index of answered questions as hashed TF-IDF vectors and
+scores new questions against it with NumPy, so rephrased repeats are answered
+from memory instead of a fresh Groq call.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_THRESHOLD = float(os.getenv("DOUBT_CACHE_THRESHOLD", "0.85"))
+DEFAULT_CAPACITY = int(os.getenv("DOUBT_CACHE_CAPACITY", "512"))
+DEFAULT_MAX_SUBJECTS = int(os.getenv("DOUBT_CACHE_MAX_SUBJECTS", "32"))
+HASH_DIM = 2 ** 12
+INITIAL_ROWS = 16  # per subject; doubled on demand up to DOUBT_CACHE_CAPACITY
+
+# Filler words that change phrasing but not the doubt itself.
+# Question words like "why"/"how" are kept on purpose - they change the answer.
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "what", "whats", "explain",
+    "pls", "plz", "please", "tell", "me", "about", "can", "could", "would", "you",
+    "i", "do", "does", "did", "of", "to", "in", "on", "for", "and", "it", "this",
+    "that", "my", "some", "give", "show", "understand", "mean", "means", "meaning",
+}
+_TOKEN_RE = re.compile(r"[a-z0-9_+#]+")
+
+
+# ---------------------------------------------------
+# Text -> Hashed Term Frequencies
+# ---------------------------------------------------
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    words = [_stem(t) for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _hashed_tf(text: str, dim: int = HASH_DIM) -> np.ndarray:
+    vec = np.zeros(dim, dtype=np.float32)
+    for term in tokenize(text):
+        vec[zlib.crc32(term.encode("utf-8")) % dim] += 1.0
+    np.log1p(vec, out=vec)
+    return vec
+
+
+# ---------------------------------------------------
+# Per-Subject Index
+# ---------------------------------------------------
+class _SubjectIndex:
+    """
+    Rows of IDF-weighted, L2-normalised term vectors; the least recently used
+    row is overwritten when full. The matrix starts small and doubles up to
+    `capacity`, so memory follows the number of cached questions. A row is
+    weighted with the IDF at the time it is inserted and never recomputed,
+    so an insert costs one row, not the whole matrix; queries are weighted
+    with the current IDF.
+    """
+
+    def __init__(self, capacity: int, dim: int):
+        self.capacity = capacity
+        rows = min(capacity, INITIAL_ROWS)
+        self.rows = np.zeros((rows, dim), dtype=np.float32)
+        self.df = np.zeros(dim, dtype=np.float32)
+        self.last_used = np.zeros(rows, dtype=np.float64)
+        self.questions: List[Optional[str]] = [None] * rows
+        self.answers: List[Optional[str]] = [None] * rows
+        self.size = 0
+
+    def _idf(self) -> np.ndarray:
+        return np.log((1.0 + self.size) / (1.0 + self.df)) + 1.0
+
+    def _grow(self) -> None:
+        rows = min(self.capacity, 2 * len(self.rows))
+        extra = rows - len(self.rows)
+        self.rows = np.vstack([self.rows, np.zeros((extra, self.rows.shape[1]), dtype=np.float32)])
+        self.last_used = np.concatenate([self.last_used, np.zeros(extra)])
+        self.questions += [None] * extra
+        self.answers += [None] * extra
+
+    def best_match(self, tf: np.ndarray):
+        if self.size == 0:
+            return None, 0.0
+        q = tf * self._idf()
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0:
+            return None, 0.0
+        scores = self.rows[:self.size] @ (q / norm).astype(np.float32)
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def insert(self, tf: np.ndarray, question: str, answer: str) -> bool:
+        """Add a row; returns True when an older row had to be evicted."""
+        evicted = False
+        if self.size < self.capacity:
+            if self.size == len(self.rows):
+                self._grow()
+            slot = self.size
+            self.size += 1
+        else:
+            slot = int(np.argmin(self.last_used[:self.size]))
+            self.df -= (self.rows[slot] > 0)
+            evicted = True
+        self.df += (tf > 0)
+        weighted = tf * self._idf()
+        self.rows[slot] = weighted / float(np.linalg.norm(weighted))
+        self.last_used[slot] = time.monotonic()
+        self.questions[slot] = question
+        self.answers[slot] = answer
+        return evicted
+
+
+# ---------------------------------------------------
+# Subject-Scoped Cache
+# ---------------------------------------------------
+class SimilarityCache:
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        capacity: int = DEFAULT_CAPACITY,
+        max_subjects: int = DEFAULT_MAX_SUBJECTS,
+        dim: int = HASH_DIM,
+    ):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.max_subjects = max_subjects
+        self.dim = dim
+        self._indexes: "OrderedDict[str, _SubjectIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "inserts": 0, "evictions": 0, "subject_evictions": 0}
+
+    @staticmethod
+    def _scope(subject: Optional[str]) -> str:
+        return (subject or "general").strip().lower()
+
+    def lookup(self, subject: Optional[str], question: str) -> Optional[Dict[str, Any]]:
+        """Return the stored answer for the closest question above the threshold, else None."""
+        tf = _hashed_tf(question, self.dim)
+        with self._lock:
+            index = self._indexes.get(self._scope(subject))
+            if index is None:
+                self._stats["misses"] += 1
+                return None
+            slot, score = index.best_match(tf)
+            if slot is None or score < self.threshold:
+                self._stats["misses"] += 1
+                return None
+            index.last_used[slot] = time.monotonic()
+            self._indexes.move_to_end(self._scope(subject))
+            self._stats["hits"] += 1
+            return {
+                "answer": index.answers[slot],
+                "matched_question": index.questions[slot],
+                "similarity": round(score, 4),
+            }
+
+    def insert(self, subject: Optional[str], question: str, answer: str) -> None:
+        if not answer:
+            return
+        tf = _hashed_tf(question, self.dim)
+        if not tf.any():
+            return
+        scope = self._scope(subject)
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is None:
+                index = _SubjectIndex(self.capacity, self.dim)
+                self._indexes[scope] = index
+                while len(self._indexes) > self.max_subjects:
+                    self._indexes.popitem(last=False)
+                    self._stats["subject_evictions"] += 1
+            self._indexes.move_to_end(scope)
+            slot, score = index.best_match(tf)
+            if slot is not None and score >= 0.999:
+                # Same question again (e.g. coalesced duplicates): refresh instead of adding a row
+                index.answers[slot] = answer
+                index.last_used[slot] = time.monotonic()
+                return
+            if index.insert(tf, question, answer):
+                self._stats["evictions"] += 1
+            self._stats["inserts"] += 1
+
+    def clear(self, subject: Optional[str] = None) -> None:
+        with self._lock:
+            if subject is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(self._scope(subject), None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["subjects"] = len(self._indexes)
+            stats["entries"] = sum(i.size for i in self._indexes.values())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["threshold"] = self.threshold
+        return stats
+
+
+# Shared process-wide instance used by the doubt solver
+doubt_cache = SimilarityCache()
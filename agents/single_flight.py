@@ -0,0 +1,121 @@
+"""
+Single-Flight Coalescing for LLM Calls
+When identical requests (same agent, same normalized prompt) arrive while one
+is already in flight, only the first caller hits the LLM; the rest wait on the
+same future. Works across sync threads and async tasks alike because every
+flight is a concurrent.futures.Future.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+def flight_key(label: str, prompt: str) -> Tuple[str, str]:
+    normalized = " ".join(prompt.split()).lower()
+    return label, hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Tuple[str, str], Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, label: str, field: str) -> None:
+        per_label = self._stats.setdefault(label, {"leaders": 0, "coalesced": 0, "errors": 0})
+        per_label[field] += 1
+
+    def _join_or_lead(self, key: Tuple[str, str]):
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._count(key[0], "coalesced")
+                return flight, False
+            flight = Future()
+            self._flights[key] = flight
+            self._count(key[0], "leaders")
+            return flight, True
+
+    def _land(self, key: Tuple[str, str], flight: Future, result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+            if error is not None:
+                self._count(key[0], "errors")
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    def _fly(self, key: Tuple[str, str], flight: Future, fn: Callable[[], Any]) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            return
+        self._land(key, flight, result=result)
+
+    @staticmethod
+    async def _wait(flight: Future) -> Any:
+        waiter = asyncio.wrap_future(flight)
+        # If every awaiting request is cancelled, nobody reads the outcome; consume it here.
+        waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return await asyncio.shield(waiter)
+
+    def run(self, key: Tuple[str, str], fn: Callable[[], Any]) -> Any:
+        """Blocking call: lead the flight for `key` or wait for the one already running."""
+        flight, leader = self._join_or_lead(key)
+        if leader:
+            self._fly(key, flight, fn)
+        return flight.result()
+
+    async def run_async(self, key: Tuple[str, str], fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async call. The leader's work runs as its own task, so a leader whose
+        request gets cancelled does not take the followers down with it.
+        """
+        flight, leader = self._join_or_lead(key)
+        if leader:
+            task = asyncio.ensure_future(fn())
+
+            def _done(t: asyncio.Task) -> None:
+                if t.cancelled():
+                    self._land(key, flight, error=asyncio.CancelledError())
+                elif t.exception() is not None:
+                    self._land(key, flight, error=t.exception())
+                else:
+                    self._land(key, flight, result=t.result())
+
+            task.add_done_callback(_done)
+        return await self._wait(flight)
+
+    async def run_in_executor(self, key: Tuple[str, str], fn: Callable[[], Any], executor: Executor) -> Any:
+        """
+        Async callers, blocking work. The flight lands from the worker thread
+        itself, so it completes even if the awaiting event loop goes away.
+        """
+        flight, leader = self._join_or_lead(key)
+        if leader:
+            executor.submit(self._fly, key, flight, fn)
+        return await self._wait(flight)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_label = {label: dict(counts) for label, counts in self._stats.items()}
+            in_flight = len(self._flights)
+        leaders = sum(c["leaders"] for c in by_label.values())
+        coalesced = sum(c["coalesced"] for c in by_label.values())
+        return {
+            "leaders": leaders,
+            "coalesced": coalesced,
+            "in_flight": in_flight,
+            "coalesce_rate": round(coalesced / (leaders + coalesced), 4) if leaders + coalesced else 0.0,
+            "by_agent": by_label,
+        }
+
+
+# Shared process-wide instance used by both agent modules
+single_flight = SingleFlight()
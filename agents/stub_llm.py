@@ -0,0 +1,148 @@
+"""
+Stub LLM for Offline Runs
+A drop-in crewai LLM that never leaves the process: it waits a configurable
+latency and returns a canned response. Used by the load tests and benchmarks
+in scripts/ so the request path can be exercised without a Groq key.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import zlib
+from typing import Any, AsyncIterator, Callable, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+DEFAULT_RESPONSE = (
+    "**INTRODUCTION**\n\nThis is a stubbed lesson used for offline load testing.\n\n"
+    "**EXAMPLE**\n\n```python\nprint('hello')\n```\n"
+)
+
+
+class StubLLM(BaseLLM):
+    """
+    Sleeps `latency` seconds (async-aware) and returns `response`, or
+    `responder(messages)` when one is set so replies can depend on the prompt.
+    astream() instead waits `first_token_latency`, then yields the reply in
+    `chunk_size`-character pieces spaced `chunk_delay` seconds apart.
+
+    `latency_dist` samples each call's latency around `latency` instead:
+    "fixed", "uniform" (latency +/- latency_spread), "exponential" (mean
+    latency) or "lognormal" (median latency, sigma latency_spread).
+    """
+
+    latency: float = 0.0
+    latency_dist: str = "fixed"
+    latency_spread: float = 0.5
+    response: str = DEFAULT_RESPONSE
+    first_token_latency: float = 0.0
+    chunk_size: int = 16
+    chunk_delay: float = 0.0
+    responder: Optional[Callable[[Any], str]] = None
+
+    def _reply(self, messages: Any) -> str:
+        return self.responder(messages) if self.responder else self.response
+
+    def _delay(self) -> float:
+        if not self.latency or self.latency_dist == "fixed":
+            return self.latency
+        if self.latency_dist == "uniform":
+            return max(0.0, random.uniform(self.latency - self.latency_spread, self.latency + self.latency_spread))
+        if self.latency_dist == "exponential":
+            return random.expovariate(1 / self.latency)
+        if self.latency_dist == "lognormal":
+            return random.lognormvariate(math.log(self.latency), self.latency_spread)
+        raise ValueError(f"Unknown latency_dist: {self.latency_dist}")
+
+    def call(self, messages: Any, tools: Any = None, callbacks: Any = None,
+             available_functions: Any = None, from_task: Any = None,
+             from_agent: Any = None, response_model: Any = None) -> str:
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._reply(messages)
+
+    async def acall(self, messages: Any, tools: Any = None, callbacks: Any = None,
+                    available_functions: Any = None, from_task: Any = None,
+                    from_agent: Any = None, response_model: Any = None) -> str:
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._reply(messages)
+
+    async def astream(self, messages: Any) -> AsyncIterator[str]:
+        if self.first_token_latency:
+            await asyncio.sleep(self.first_token_latency)
+        reply = self._reply(messages)
+        for start in range(0, len(reply), self.chunk_size):
+            if start and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield reply[start:start + self.chunk_size]
+
+
+# ---------------------------------------------------
+# Canned Replies Shaped Like Each Agent's Output
+# ---------------------------------------------------
+def _prompt_text(messages: Any) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(m.get("content") or "" for m in messages if isinstance(m.get("content"), str))
+
+
+def _module(day: int, topic: str = "") -> dict:
+    return {
+        "id": day,
+        "title": f"Day {day}: {topic or f'Topic {day}'}",
+        "duration_days": 1,
+        "learning_objectives": ["Understand it", "Apply it", "Explain it"],
+        "daily_tasks": ["Read", "Practice", "Review"],
+        "resources": ["https://docs.python.org/3/tutorial/"],
+    }
+
+
+def _days(spec: str) -> list:
+    """Inverse of crewai_agent._day_list: "3-5, 9" -> [3, 4, 5, 9]."""
+    days = []
+    for part in spec.replace(" ", "").strip(",-").split(","):
+        first, _, last = part.partition("-")
+        days += range(int(first), int(last or first) + 1)
+    return days
+
+
+def tutor_responder(messages: Any) -> str:
+    """
+    Valid JSON for every structured prompt the agents send (single-shot plans,
+    chunked-plan outlines and chunks, quizzes) and markdown for everything else,
+    so StubLLM(responder=tutor_responder) can serve every route.
+    """
+    prompt = _prompt_text(messages)
+    if "Outline an intensive" in prompt:
+        days = int(re.search(r"(\d+)-day", prompt).group(1))
+        return json.dumps({"days": [f"Topic {d}" for d in range(1, days + 1)]})
+    match = re.search(r"(?:Expand days|Write ONLY the missing days) ([\d, -]+)", prompt)
+    if match:
+        return json.dumps({"modules": [_module(d) for d in _days(match.group(1))]})
+    if "Technical Examiner" in prompt:
+        title = re.search(r"for the module: '([^']*)'", prompt)
+        # Distinct per prompt, so a quiz bank filled with "avoid" lists keeps growing
+        tag = zlib.crc32(prompt.encode()) % 100000
+        count = re.search(r"generate a (\d+)-question", prompt)
+        questions = [{"question": f"Which option is correct ({tag}-{i})?", "options": ["A", "B", "C", "D"],
+                      "answer": "A", "explanation": "A is correct."}
+                     for i in range(1, int(count.group(1)) + 1 if count else 6)]
+        module_id = re.search(r"Day (\d+):", title.group(1)) if title else None
+        return json.dumps({"module_id": int(module_id.group(1)) if module_id else 1,
+                           "module_title": title.group(1) if title else None,
+                           "questions": questions})
+    match = re.search(r"Design an intensive (\d+)-day", prompt)
+    if match:
+        days = int(match.group(1))
+        subject = re.search(r"to master (.+?) at a", prompt)
+        return json.dumps({"subject": subject.group(1) if subject else "Subject", "level": "beginner",
+                           "duration_weeks": max(1, -(-days // 7)),
+                           "modules": [_module(d) for d in range(1, days + 1)]})
+    return DEFAULT_RESPONSE
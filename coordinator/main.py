@@ -4,17 +4,75 @@ import os
 # 1. Load Environment Variables immediately
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, Dict, List
 
 # 2. Local Imports
-from agents.crewai_agent import create_study_plan, generate_quiz_for_module
-from agents.adk_agent import teacher_explain, doubt_solver
+from agents.crewai_agent import (
+    QUIZ_BATCH_CONCURRENCY, QUIZ_TIMEOUT_SECONDS, create_study_plan_async, generate_quizzes_async,
+    plan_crews, quiz_crews, warm_up_async as warm_up_crews,
+)
+from agents.adk_agent import (
+    teacher_explain_async, doubt_solver_async, get_topic_brief_async,
+    teacher_explain_stream, get_topic_brief_stream, warm_up_async as warm_up_teacher,
+)
 from agents.shared_tools import monitor_event
+from agents.monitoring import event_pipeline
+from agents.callbacks import callback_stats
+from agents.metrics import metrics, route_duration, stats_collector
+from agents.response_cache import response_cache
+from agents.similarity_cache import doubt_cache
+from agents.single_flight import single_flight
+from agents.mcp_tools import search_cache
+from agents.cassette_store import cassette_store
+from agents.json_repair import parse_stats
+from agents.quiz_bank import quiz_bank
+from agents.job_queue import JobQueueFull, job_queue, public_job
+from state.context_store import MAX_SESSION_ID_LENGTH, load_quiz
+
+# Startup warm-up: fill the crew pools and open the LLM connections (this is
+# also where crewai first gets imported, see agents/adk_agent.py). APP_WARMUP:
+#   background (default) - serve immediately, warm up alongside;
+#   blocking - only report ready once warm; off - build on the first request.
+# Bounded by APP_WARMUP_TIMEOUT_SECONDS so a slow or missing LLM never hangs boot.
+APP_WARMUP = os.getenv("APP_WARMUP", "background")
+APP_WARMUP_TIMEOUT_SECONDS = float(os.getenv("APP_WARMUP_TIMEOUT_SECONDS", "15"))
+
+async def _warm_up():
+    started = time.perf_counter()
+    try:
+        crews, teacher = await asyncio.wait_for(
+            asyncio.gather(warm_up_crews(), warm_up_teacher()), APP_WARMUP_TIMEOUT_SECONDS
+        )
+        monitor_event("Coordinator", "warm_up", {
+            "crews": crews, "teacher": teacher, "seconds": round(time.perf_counter() - started, 3),
+        })
+    except asyncio.TimeoutError:
+        monitor_event("Coordinator", "warm_up_timeout", {"seconds": APP_WARMUP_TIMEOUT_SECONDS})
 
-app = FastAPI(title="Personalized Learning Assistant")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = None
+    # Picks up jobs queued (or left running) before a restart
+    await job_queue.start()
+    if APP_WARMUP == "blocking":
+        await _warm_up()
+    elif APP_WARMUP == "background":
+        task = asyncio.create_task(_warm_up())
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+    await job_queue.stop()
+    quiz_bank.shutdown()
+
+app = FastAPI(title="Personalized Learning Assistant", lifespan=lifespan)
 
 # 3. CORS Settings - Allowed all for high-interaction frontend
 app.add_middleware(
@@ -25,31 +83,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 4. Per-route latency for /metrics, measured until the last body byte (so SSE
+# streams count in full). Routes are labelled by their path template, e.g.
+# /quiz/{module_id}, which keeps the label set bounded. Plain ASGI rather than
+# @app.middleware("http") to stay off the streaming path.
+class RouteLatencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            route_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status[0],
+            )
+
+app.add_middleware(RouteLatencyMiddleware)
+
+metrics.register_collector(stats_collector(
+    "tutor_cache_stat", "Counters and sizes reported by the in-process caches and queues", "cache",
+    {
+        "response_cache": response_cache.stats,
+        "doubt_cache": doubt_cache.stats,
+        "single_flight": single_flight.stats,
+        "search_cache": search_cache.stats,
+        "monitor_queue": event_pipeline.stats,
+        "plan_crews": plan_crews.stats,
+        "quiz_crews": quiz_crews.stats,
+        "llm_json": parse_stats.stats,
+        "quiz_bank": quiz_bank.stats,
+        "jobs": job_queue.stats,
+    },
+))
+
 # -------------------------------
 # REQUEST MODELS
 # -------------------------------
+# session_id scopes the plan (and its quizzes) to one learner. Omitting it
+# uses the shared single-learner plan, as before sessions existed.
+SessionId = Annotated[Optional[str], Field(max_length=MAX_SESSION_ID_LENGTH)]
 
 class StartRequest(BaseModel):
     subject: str
     level: str
     total_days: int # MUST BE THIS
     learner_name: str = "Learner"
+    session_id: SessionId = None
 
 class ExplanationRequest(BaseModel):
     topic: str
     module_id: int | Optional[int] = None
+    session_id: SessionId = None
 
 class DoubtRequest(BaseModel):
     question: str
     module_id: int | Optional[int] = None
+    session_id: SessionId = None
 
 class QuizRequest(BaseModel):
     module_id: int | Optional[int] = None
-    num_questions: int = 5
+    num_questions: int = Field(default=5, ge=1, le=50)
+    session_id: SessionId = None
+
+class BulkQuizRequest(BaseModel):
+    module_ids: Optional[List[int]] = None  # None = every module in the plan
+    num_questions: int = Field(default=5, ge=1, le=50)
+    # A request can lower the server's crew limit and per-module timeout, never raise them
+    concurrency: Optional[int] = Field(default=None, ge=1, le=QUIZ_BATCH_CONCURRENCY)
+    timeout_seconds: Optional[float] = Field(default=None, gt=0, le=QUIZ_TIMEOUT_SECONDS)
+    session_id: SessionId = None
 
 class TopicRequest(BaseModel):
     topic: str
 
+class CacheInvalidateRequest(BaseModel):
+    kind: Optional[str] = None  # "explain" | "brief" | None for all
+    topic: Optional[str] = None
+
 # -------------------------------
 # ENDPOINTS (ROUTES)
 # -------------------------------
@@ -58,61 +183,226 @@ class TopicRequest(BaseModel):
 def home():
     return {"message": "Personalized Learning Assistant backend is running!"}
 
-@app.post("/start-learning")
-def start_learning(req: StartRequest):
+# -------------------------------
+# BACKGROUND JOBS
+# -------------------------------
+# Plan generation can take 30+ seconds, so /start-learning stores it as a job
+# and answers with the job id at once. Progress: GET /jobs/{id} or the SSE
+# stream at /jobs/{id}/events. ?wait=true keeps the old blocking behaviour.
+
+async def _run_plan_job(params: Dict, progress) -> Dict:
+    req = StartRequest(**params)
+    study_plan = await create_study_plan_async(
+        req.subject,
+        req.level,
+        req.total_days,
+        req.learner_name,
+        session_id=req.session_id,
+        progress=progress,
+    )
+    # Retakes are served from the per-module question bank; start filling it now
+    await asyncio.to_thread(quiz_bank.fill_for_plan, study_plan, req.session_id)
+
+    # Handle serialization safely for both Pydantic v1 and v2
+    study_plan_dict = study_plan.dict() if hasattr(study_plan, 'dict') else study_plan.model_dump()
+
+    summary = {
+        "subject": study_plan.subject,
+        "level": study_plan.level,
+        "total_days": req.total_days, # Updated summary field
+        "total_modules": len(study_plan.modules),
+        "theme": study_plan.metadata.get("theme") if study_plan.metadata else "General Learning",
+    }
+    return {"status": "success", "session_id": req.session_id, "summary": summary, "study_plan": study_plan_dict}
+
+job_queue.register("study_plan", _run_plan_job)
+
+def _job_links(job: Dict) -> Dict:
+    return {"status_url": f"/jobs/{job['id']}", "events_url": f"/jobs/{job['id']}/events"}
+
+@app.post("/start-learning", status_code=202)
+async def start_learning(
+    req: StartRequest,
+    response: Response,
+    wait: bool = Query(default=False),
+    idempotency_key: Optional[str] = Header(default=None, max_length=200),
+):
     monitor_event("Coordinator", "start_learning_called", req.dict())
     try:
-        # We now pass total_days to the agent
-        study_plan = create_study_plan(
-            req.subject,
-            req.level,
-            req.total_days, 
-            req.learner_name,
-        )
-        
-        # Handle serialization safely for both Pydantic v1 and v2
-        study_plan_dict = study_plan.dict() if hasattr(study_plan, 'dict') else study_plan.model_dump()
-        
-        summary = {
-            "subject": study_plan.subject,
-            "level": study_plan.level,
-            "total_days": req.total_days, # Updated summary field
-            "total_modules": len(study_plan.modules),
-            "theme": study_plan.metadata.get("theme") if study_plan.metadata else "General Learning",
-        }
-        return {"status": "success", "summary": summary, "study_plan": study_plan_dict}
-    except Exception as e:
-        monitor_event("Coordinator", "start_learning_failed", {"error": str(e)})
-        print(f"ERROR: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        # A retried request with the same Idempotency-Key gets the job it already started
+        job, created = await job_queue.submit("study_plan", req.dict(), idempotency_key)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if wait:
+        job = await job_queue.wait(job["id"])
+        if job["state"] == "succeeded":
+            response.status_code = 200
+            return job["result"]
+        if job["state"] == "failed":
+            monitor_event("Coordinator", "start_learning_failed", {"job_id": job["id"], "error": job["error"]})
+            raise HTTPException(status_code=500, detail=job["error"])
+    return {
+        "status": "accepted",
+        "job_id": job["id"],
+        "state": job["state"],
+        "deduplicated": not created,
+        "session_id": req.session_id,
+        **_job_links(job),
+    }
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return {"status": "success", "job": public_job(job), **_job_links(job)}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    if await asyncio.to_thread(job_queue.store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+
+    # "state" on every state change (queued, running, retries), "progress" per
+    # stage reached, then "done" with the plan summary or "error"
+    async def events():
+        state, sent = None, 0
+        async for job in job_queue.watch(job_id):
+            if (job["state"], job["attempts"]) != state:
+                state = (job["state"], job["attempts"])
+                yield _sse("state", {"state": job["state"], "attempts": job["attempts"], "error": job["error"]})
+            for event in job["events"][sent:]:
+                yield _sse("progress", event)
+            sent = len(job["events"])
+            if job["state"] == "succeeded":
+                yield _sse("done", {"job_id": job_id, "summary": (job["result"] or {}).get("summary"),
+                                    **_job_links(job)})
+            elif job["state"] == "failed":
+                yield _sse("error", {"detail": job["error"]})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/get-topic-brief")
-def topic_brief(req: TopicRequest):
+async def topic_brief(req: TopicRequest):
     try:
-        # Import the modern Learning Card function
-        from agents.adk_agent import get_topic_brief
-        brief_md = get_topic_brief(req.topic)
+        # The modern Learning Card function
+        brief_md = await get_topic_brief_async(req.topic)
         return {"status": "success", "brief": brief_md}
     except Exception as e:
         monitor_event("Coordinator", "topic_brief_failed", {"error": str(e)})
         raise HTTPException(status_code=500, detail=str(e))
 
+# -------------------------------
+# STREAMING (Server-Sent Events)
+# -------------------------------
+
+def _sse(event: str, data: Dict) -> str:
+    # JSON keeps multi-line markdown inside a single `data:` line
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(chunks, done: Dict, source: str) -> StreamingResponse:
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield _sse("token", {"text": chunk})
+            yield _sse("done", done)
+        except Exception as e:
+            monitor_event("Coordinator", f"{source}_stream_failed", {"error": str(e)})
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/explain-topic/stream")
+async def explain_topic_stream(req: ExplanationRequest):
+    monitor_event("Coordinator", "teacher_explain_stream_called", req.dict())
+    chunks = teacher_explain_stream(req.module_id or 0, req.topic, session_id=req.session_id)
+    return _sse_response(chunks, {"module_id": req.module_id or 0, "topic": req.topic}, "teacher_explain")
+
+@app.post("/get-topic-brief/stream")
+async def topic_brief_stream(req: TopicRequest):
+    monitor_event("Coordinator", "topic_brief_stream_called", req.dict())
+    return _sse_response(get_topic_brief_stream(req.topic), {"topic": req.topic}, "topic_brief")
+
 @app.post("/explain-topic")
-def explain_topic(req: ExplanationRequest):
+async def explain_topic(req: ExplanationRequest):
     monitor_event("Coordinator", "teacher_explain_called", req.dict())
-    explanation = teacher_explain(req.module_id or 0, req.topic)
+    explanation = await teacher_explain_async(req.module_id or 0, req.topic, session_id=req.session_id)
     exp_dict = explanation.dict() if hasattr(explanation, 'dict') else explanation
     return {"status": "success", "explanation": exp_dict}
 
 @app.post("/ask-doubt")
-def ask_doubt(req: DoubtRequest):
+async def ask_doubt(req: DoubtRequest):
     monitor_event("Coordinator", "doubt_solver_called", req.dict())
-    answer = doubt_solver(req.module_id or 0, req.question)
+    answer = await doubt_solver_async(req.module_id or 0, req.question, session_id=req.session_id)
     return {"status": "success", "response": answer}
 
 @app.post("/generate-quiz")
-def generate_quiz(req: QuizRequest):
+async def generate_quiz(req: QuizRequest):
     monitor_event("Coordinator", "generate_quiz_called", req.dict())
-    quiz = generate_quiz_for_module(req.module_id or 0, num_questions=req.num_questions)
+    # Sampled from the module's question bank; a short bank has the rest generated
+    # ("bank+generated") and an empty one a whole quiz ("generated")
+    quiz, source = await quiz_bank.get_quiz_async(
+        req.module_id or 0, num_questions=req.num_questions, session_id=req.session_id
+    )
     quiz_dict = quiz.dict() if hasattr(quiz, 'dict') else quiz
-    return {"status": "success", "quiz": quiz_dict}
\ No newline at end of file
+    return {"status": "success", "source": source, "quiz": quiz_dict}
+
+@app.post("/generate-quizzes")
+async def generate_quizzes(req: BulkQuizRequest):
+    monitor_event("Coordinator", "generate_quizzes_called", req.dict())
+    batch = await generate_quizzes_async(
+        req.module_ids,
+        num_questions=req.num_questions,
+        concurrency=req.concurrency,
+        timeout_seconds=req.timeout_seconds,
+        session_id=req.session_id,
+    )
+    succeeded = batch["summary"]["succeeded"]
+    status = "success" if succeeded == batch["summary"]["requested"] else ("partial" if succeeded else "failed")
+    return {"status": status, **batch}
+
+@app.get("/quiz/{module_id}")
+def get_saved_quiz(module_id: int, session_id: Optional[str] = Query(default=None, max_length=MAX_SESSION_ID_LENGTH)):
+    quiz = load_quiz(module_id, session_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail=f"No saved quiz for module {module_id}")
+    return {"status": "success", "quiz": quiz.dict() if hasattr(quiz, 'dict') else quiz}
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {
+        "status": "success",
+        "response_cache": response_cache.stats(),
+        "doubt_cache": doubt_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "search_cache": search_cache.stats(),
+        "crew_pools": {"plan": plan_crews.stats(), "quiz": quiz_crews.stats()},
+        "llm_cassette": cassette_store.stats(),
+        "llm_json": parse_stats.stats(),
+        "quiz_bank": quiz_bank.stats(),
+        "jobs": job_queue.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/monitor-stats")
+def monitor_stats():
+    return {"status": "success", "monitor": event_pipeline.stats(), "callbacks": callback_stats()}
+
+@app.post("/cache/invalidate")
+def cache_invalidate(req: CacheInvalidateRequest):
+    monitor_event("Coordinator", "cache_invalidate_called", req.dict())
+    deleted = response_cache.invalidate(kind=req.kind, topic=req.topic)
+    return {"status": "success", "deleted": deleted}
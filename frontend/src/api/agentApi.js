@@ -1,11 +1,13 @@
 import axios from 'axios';
+import { getSessionId } from './session';
 
 const API_BASE = 'http://127.0.0.1:8000';
 
 export const explainTopic = async (module_id, topic) => {
   const response = await axios.post(`${API_BASE}/explain-topic`, {
     module_id,
-    topic
+    topic,
+    session_id: getSessionId()
   });
   return response.data;
 };
@@ -13,7 +15,8 @@ export const explainTopic = async (module_id, topic) => {
 export const solveDoubt = async (module_id, question) => {
   const response = await axios.post(`${API_BASE}/ask-doubt`, {
     module_id,
-    question
+    question,
+    session_id: getSessionId()
   });
   return response.data;
 };
@@ -21,7 +24,8 @@ export const solveDoubt = async (module_id, question) => {
 export const generateQuiz = async (module_id, num_questions = 5) => {
   const response = await axios.post(`${API_BASE}/generate-quiz`, {
     module_id,
-    num_questions
+    num_questions,
+    session_id: getSessionId()
   });
   return response.data;
 };
@@ -30,4 +34,41 @@ export const getTopicBrief = async (topic) => {
   // Replace with your actual base URL if different (e.g., http://localhost:8000)
   const response = await axios.post('/get-topic-brief', { topic });
   return response.data;
-};
\ No newline at end of file
+};
+
+// Streams an SSE route, calling onToken(text) per chunk; resolves with the full text.
+const streamSse = async (path, body, onToken) => {
+  const response = await fetch(`${API_BASE}${path}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  });
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let full = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+      if (event === 'token') {
+        full += data.text;
+        onToken?.(data.text);
+      } else if (event === 'error') {
+        throw new Error(data.detail);
+      }
+    }
+  }
+  return full;
+};
+
+export const streamExplainTopic = (module_id, topic, onToken) =>
+  streamSse('/explain-topic/stream', { module_id, topic, session_id: getSessionId() }, onToken);
+
+export const streamTopicBrief = (topic, onToken) =>
+  streamSse('/get-topic-brief/stream', { topic }, onToken);
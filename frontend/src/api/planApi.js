@@ -1,15 +1,33 @@
 import axios from 'axios';
+import { getSessionId } from './session';
 
 const API_BASE = 'http://127.0.0.1:8000';
 
-export const createStudyPlan = async (subject, level, duration_weeks, learner_name) => {
-  const response = await axios.post(`${API_BASE}/start-learning`, {
-    subject,
-    level,
-    duration_weeks,
-    learner_name
-  });
-  return response.data;
+const JOB_POLL_MS = 1000;
+const SUBMIT_ATTEMPTS = 3;
+
+// Plan generation runs as a background job: submit it, then poll until it finishes.
+// A submit lost to a network error is retried with the same idempotency key, so it reuses the job.
+export const createStudyPlan = async (subject, level, total_days, learner_name) => {
+  const body = { subject, level, total_days, learner_name, session_id: getSessionId() };
+  const headers = { 'Idempotency-Key': crypto.randomUUID() };
+  let response;
+  for (let attempt = 1; !response; attempt++) {
+    try {
+      response = await axios.post(`${API_BASE}/start-learning`, body, { headers });
+    } catch (error) {
+      if (error.response || attempt >= SUBMIT_ATTEMPTS) throw error;
+    }
+  }
+  let job = (await axios.get(`${API_BASE}${response.data.status_url}`)).data.job;
+  while (job.state === 'queued' || job.state === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_MS));
+    job = (await axios.get(`${API_BASE}${response.data.status_url}`)).data.job;
+  }
+  if (job.state === 'failed') {
+    throw new Error(job.error || 'Study plan generation failed');
+  }
+  return job.result;
 };
 
 export const getStudyPlan = async () => {
@@ -0,0 +1,11 @@
+// One learner session per browser, so each learner keeps their own plan and quizzes.
+const SESSION_KEY = 'adaptive_tutor_session_id';
+
+export const getSessionId = () => {
+  let id = localStorage.getItem(SESSION_KEY);
+  if (!id) {
+    id = crypto.randomUUID();
+    localStorage.setItem(SESSION_KEY, id);
+  }
+  return id;
+};
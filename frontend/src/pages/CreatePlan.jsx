@@ -6,7 +6,7 @@ import {
   ArrowRight, Loader2, Zap, GraduationCap, 
   ChevronLeft, LayoutGrid 
 } from 'lucide-react';
-import axios from 'axios';
+import { createStudyPlan } from '../api/planApi';
 
 export default function CreatePlan() {
     const navigate = useNavigate();
@@ -22,8 +22,10 @@ export default function CreatePlan() {
         e.preventDefault();
         setLoading(true);
         try {
-            const response = await axios.post('http://localhost:8000/start-learning', formData);
-            navigate('/view-plan', { state: { studyPlan: response.data.study_plan } });
+            // Resolves once the background plan job has finished
+            const { subject, level, total_days, learner_name } = formData;
+            const result = await createStudyPlan(subject, level, total_days, learner_name);
+            navigate('/view-plan', { state: { studyPlan: result.study_plan } });
         } catch (error) {
             console.error(error);
             alert("Mentor Neural-Link failed. Ensure backend is running on port 8000");
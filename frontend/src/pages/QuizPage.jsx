@@ -3,6 +3,7 @@ import { useLocation, useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 import { BrainCircuit, ArrowLeft, CheckCircle2, XCircle, ChevronRight, Loader2, Award } from 'lucide-react';
 import axios from 'axios';
+import { getSessionId } from '../api/session';
 
 export default function QuizPage() {
     const location = useLocation();
@@ -18,7 +19,7 @@ export default function QuizPage() {
     const fetchQuiz = async () => {
         setLoading(true);
         try {
-            const res = await axios.post('http://localhost:8000/generate-quiz', { module_id: moduleId });
+            const res = await axios.post('http://localhost:8000/generate-quiz', { module_id: moduleId, session_id: getSessionId() });
             setQuiz(res.data.quiz);
         } catch (err) { alert("Neural link failed. Try again!"); }
         setLoading(false);
@@ -3,6 +3,7 @@ import { useLocation, useNavigate } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import { MessageSquare, ArrowLeft, Send, Sparkles, Loader2 } from 'lucide-react';
 import axios from 'axios';
+import { getSessionId } from '../api/session';
 import ModernBrief from '../components/ModernBrief';
 
 export default function SolveDoubt() {
@@ -20,7 +21,8 @@ export default function SolveDoubt() {
         try {
             const res = await axios.post('http://localhost:8000/ask-doubt', { 
                 question, 
-                module_id: moduleId 
+                module_id: moduleId,
+                session_id: getSessionId()
             });
             setAnswer(res.data.response.answer);
         } catch (err) { alert("Neural link interrupted."); }
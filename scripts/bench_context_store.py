@@ -0,0 +1,144 @@
+"""
+Micro-benchmark: pooled context_store connections vs. the old open-per-call path.
+
+Usage:
+    python scripts/bench_context_store.py [--ops 2000] [--threads 4] [--modules 30]
+
+Runs against a throwaway database in a temp directory, never the real
+state/context_store.sqlite.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.getcwd())
+
+from state import context_store
+from state.models import Module, StudyPlan
+
+
+# ---------------------------------------------------
+# Legacy behaviour: new connection + PRAGMA + DDL on every call
+# ---------------------------------------------------
+def _legacy_connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA foreign_keys=ON;")
+    for statement in context_store._SCHEMA[:3]:
+        conn.execute(statement)
+    conn.commit()
+    return conn
+
+
+def legacy_save(path: Path, plan: StudyPlan) -> None:
+    conn = _legacy_connect(path)
+    try:
+        with conn:
+            conn.execute(context_store._SQL_UPSERT_VALUE,
+                         (context_store.PLAN_KEY, json.dumps(plan.model_dump(), ensure_ascii=False)))
+    finally:
+        conn.close()
+
+
+def legacy_load(path: Path) -> StudyPlan:
+    conn = _legacy_connect(path)
+    try:
+        row = conn.execute(context_store._SQL_GET_VALUE, (context_store.PLAN_KEY,)).fetchone()
+        return StudyPlan.model_validate(json.loads(row[0]))
+    finally:
+        conn.close()
+
+
+def legacy_add_note(path: Path, module_id: int) -> None:
+    conn = _legacy_connect(path)
+    try:
+        with conn:
+            conn.execute(context_store._SQL_ADD_NOTE, (module_id, "teacher", "note body"))
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------
+# Harness
+# ---------------------------------------------------
+def _sample_plan(modules: int) -> StudyPlan:
+    return StudyPlan(
+        subject="Python",
+        level="beginner",
+        duration_weeks=max(1, modules // 7),
+        modules=[
+            Module(
+                id=i,
+                title=f"Day {i}: Topic {i}",
+                learning_objectives=[f"Objective {i}.{j}" for j in range(3)],
+                daily_tasks=[f"Task {i}.{j}" for j in range(3)],
+                resources=[f"https://example.com/{i}/{j}" for j in range(3)],
+            )
+            for i in range(1, modules + 1)
+        ],
+    )
+
+
+def _run(label: str, ops: int, threads: int, fn) -> float:
+    per_thread = max(1, ops // threads)
+
+    def worker():
+        for i in range(per_thread):
+            fn(i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    rate = per_thread * threads / elapsed
+    print(f"{label:<32} {rate:>12,.0f} ops/sec  ({per_thread * threads} ops, {elapsed:.3f}s)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--modules", type=int, default=30)
+    args = parser.parse_args()
+
+    plan = _sample_plan(args.modules)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "legacy.sqlite"
+        context_store.DB_PATH = Path(tmp) / "pooled.sqlite"
+        legacy_save(legacy_path, plan)
+        context_store.save_study_plan(plan)
+
+        print(f"ops={args.ops} threads={args.threads} plan_modules={args.modules}")
+        results = {}
+        for name, legacy_fn, pooled_fn in (
+            ("load_study_plan", lambda i: legacy_load(legacy_path),
+             lambda i: context_store.load_study_plan()),
+            ("get_study_plan", lambda i: legacy_load(legacy_path),
+             lambda i: context_store.get_study_plan()),
+            ("save_study_plan", lambda i: legacy_save(legacy_path, plan),
+             lambda i: context_store.save_study_plan(plan)),
+            ("add_module_note", lambda i: legacy_add_note(legacy_path, i % 30),
+             lambda i: context_store.add_module_note(i % 30, "teacher", "note body")),
+        ):
+            before = _run(f"{name} [open-per-call]", args.ops, args.threads, legacy_fn)
+            after = _run(f"{name} [pooled]", args.ops, args.threads, pooled_fn)
+            results[name] = round(after / before, 2)
+        context_store.close_connections()
+
+    print("\nspeedup (pooled / open-per-call):")
+    for name, ratio in results.items():
+        print(f"  {name:<20} x{ratio}")
+
+
+if __name__ == "__main__":
+    main()
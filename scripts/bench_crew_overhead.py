@@ -0,0 +1,96 @@
+"""
+Benchmark: per-request crew overhead, fresh objects vs the pooled crews.
+
+Usage:
+    python scripts/bench_crew_overhead.py [--requests 200]
+
+The Groq LLM is swapped for a zero-latency StubLLM, so the timings are pure
+framework overhead: "fresh" rebuilds the Agent, its search tools, the Task and
+the Crew for every request (the old _build_quiz_crew path); "pooled" borrows a
+pre-built crew from quiz_crews and passes only the prompt. Each variant is also
+timed with construction alone (no kickoff). Every reply is checked to come from
+the request's own prompt, so a reused crew that kept a stale task would fail.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from crewai import Crew, Task
+
+from agents import crewai_agent
+from agents.stub_llm import StubLLM
+from state.models import Quiz
+
+
+def _responder(messages) -> str:
+    # The module id travels in the prompt; echo it back so stale prompts are caught
+    prompt = " ".join(m["content"] for m in messages if isinstance(m.get("content"), str))
+    ids = re.findall(r"module (\d+)", prompt)
+    if not ids:
+        return "OK"  # warm-up ping
+    module_id = int(ids[-1])
+    question = {"question": "Q?", "options": ["A", "B", "C", "D"], "answer": "A", "explanation": "Because."}
+    return json.dumps({"module_id": module_id, "module_title": f"Module {module_id}", "questions": [question]})
+
+
+def _prompt(i: int) -> str:
+    return f"Create a one-question quiz for module {i}."
+
+
+def _fresh(i: int):
+    agent = crewai_agent._get_study_plan_agent()
+    task = Task(description=_prompt(i), expected_output=crewai_agent.QUIZ_EXPECTED_OUTPUT, agent=agent, output_json=Quiz)
+    return Crew(agents=[agent], tasks=[task], verbose=False)
+
+
+def _timed(fn, n):
+    samples = []
+    for i in range(n):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    return statistics.mean(samples) * 1000, statistics.quantiles(samples, n=100)[98] * 1000
+
+
+def _checkout(i):
+    with crewai_agent.quiz_crews.acquire():
+        pass
+
+
+def _check(output, i):
+    quiz = crewai_agent._parse_output(output, Quiz)
+    assert quiz.module_id == i, f"request {i} got module {quiz.module_id}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    crewai_agent.groq_llm = StubLLM(model="stub", responder=_responder)
+    n = args.requests
+
+    started = time.perf_counter()
+    print("warm_up:", crewai_agent.warm_up(), f"({time.perf_counter() - started:.2f}s)")
+
+    rows = [
+        ("fresh, construct only", lambda i: _fresh(i)),
+        ("fresh, construct + kickoff", lambda i: _check(_fresh(i).kickoff(), i)),
+        ("pooled, checkout + return", _checkout),
+        ("pooled, kickoff", lambda i: _check(crewai_agent.quiz_crews.kickoff(
+            _prompt(i), crewai_agent.QUIZ_EXPECTED_OUTPUT), i)),
+    ]
+    for label, fn in rows:
+        mean, p99 = _timed(fn, n)
+        print(f"{label:<28} mean {mean:7.2f} ms   p99 {p99:7.2f} ms")
+    print("quiz pool:", crewai_agent.quiz_crews.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: tolerant JSON parsing of crew replies vs the old strip-and-loads.
+
+Usage:
+    python scripts/bench_json_repair.py [--days 14] [--repeat 200]
+
+Builds a valid plan and quiz reply, then damages them the way models do
+(chatter and code fences, the word "json" in the content, trailing commas,
+smart quotes, Python-repr single quotes with \\' escapes, Python literals,
+output cut off part-way). For each reply it reports whether the old parser
+(strip backticks, drop "json", json.loads) would have accepted it ("REGENERATE": a full regeneration was needed;
+"corrupted": accepted with every "json" in the text deleted), and what _plan_from_output / _quiz_from_output now do: the outcome,
+how many (partial) LLM calls the re-asks made, and the mean parse time.
+Re-asks are answered by a zero-latency StubLLM.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+sys.path.insert(0, os.getcwd())
+
+from agents import crewai_agent
+from agents.json_repair import parse_stats
+from agents.stub_llm import StubLLM, tutor_responder
+from state.models import Quiz, StudyPlan
+
+calls = 0
+
+
+def _counting_responder(messages):
+    global calls
+    calls += 1
+    return tutor_responder(messages)
+
+
+def _old_parse(raw, model_cls, truth):
+    try:
+        parsed = model_cls.model_validate(json.loads(raw.strip().strip("`").replace("json", "")))
+    except ValueError:
+        return "REGENERATE"
+    return "ok" if parsed == model_cls.model_validate(truth) else "corrupted"
+
+
+def _damaged(valid: str):
+    cut = valid[: int(len(valid) * 0.6)]
+    return [
+        ("clean", valid),
+        ("fenced + chatter", f"Here is the result:\n```json\n{valid}\n```\nLet me know if you need changes."),
+        ("trailing commas", valid.replace("]", ", ]").replace("}", ", }")),
+        ("smart quotes", valid.replace('"', "“", 1).replace('"', "”", 1)),
+        ("python repr quotes", valid.replace('"', "'").replace(": '", ": 'it\\'s ", 1)),
+        ("python literals", valid.replace('"duration_days": 1', '"duration_days": 1, "optional": True')
+                                 .replace('"explanation"', '"flag": None, "explanation"')),
+        ("truncated at 60%", cut),
+        ("no JSON at all", "I am sorry, I cannot help with that."),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    global calls
+    crewai_agent.groq_llm = StubLLM(model="stub", responder=_counting_responder)
+    subject = "json Schema"  # the old parser deleted every "json" in the reply
+    plan_reply = tutor_responder(f"Design an intensive {args.days}-day learning journey for Ada to master {subject} at a beginner level")
+    quiz_reply = tutor_responder("Act as a Technical Examiner. ... for the module: 'Day 1: Parsing json'.")
+    parse = {
+        "plan": lambda out: crewai_agent._plan_from_output(out, subject, "beginner", args.days),
+        "quiz": lambda out: crewai_agent._quiz_from_output(out, 1),
+    }
+
+    outcomes, reask_calls = Counter(), 0
+    print(f"{'reply':<26} {'old parser':<12} {'now':<10} {'LLM calls':>9} {'parse us':>10}")
+    for kind, valid, model_cls in (("plan", plan_reply, StudyPlan), ("quiz", quiz_reply, Quiz)):
+        for label, raw in _damaged(valid):
+            output = SimpleNamespace(raw=raw, json_dict=None, pydantic=None)
+            old = _old_parse(raw, model_cls, json.loads(valid))
+            before = dict(parse_stats.stats()["by_kind"].get(model_cls.__name__, {}))
+            calls = 0
+            try:
+                result = parse[kind](output)
+                size = len(result.modules if kind == "plan" else result.questions)
+            except ValueError:
+                size = None
+            used = calls
+            after = parse_stats.stats()["by_kind"][model_cls.__name__]
+            outcome = next(o for o in after if after[o] != before.get(o, 0))
+            outcomes[outcome] += 1
+            reask_calls += used
+            started = time.perf_counter()
+            for _ in range(args.repeat if not used else 1):
+                try:
+                    parse[kind](output)
+                except ValueError:
+                    pass
+            mean_us = (time.perf_counter() - started) / (args.repeat if not used else 1) * 1e6
+            print(f"{kind + ': ' + label:<26} {old:<12} {outcome:<10} {used:>9} {mean_us:>10.1f}"
+                  + ("" if size is None else f"   ({size} {'days' if kind == 'plan' else 'questions'})"))
+
+    saved = outcomes["repaired"] + outcomes["reasked"]
+    print(f"{sum(outcomes.values())} replies: {dict(outcomes)}; full regenerations saved: {saved}, "
+          f"paid for with {reask_calls} partial re-ask calls")
+
+
+if __name__ == "__main__":
+    main()
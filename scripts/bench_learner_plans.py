@@ -0,0 +1,115 @@
+"""
+Benchmark: thousands of concurrent learners reading and writing their own plans.
+
+Usage:
+    python scripts/bench_learner_plans.py [--learners 5000] [--threads 32] [--ops 40000] [--write-ratio 0.05]
+
+Every learner gets a plan under its own session_id, then worker threads run a
+random mix of get_study_plan / save_study_plan calls for random learners.
+The same workload is replayed against the old single global plan key
+(session_id=None) to show what that shared row did to correctness: a
+"foreign read" is a learner receiving somebody else's plan. Runs against a
+throwaway database in a temp directory.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.getcwd())
+
+from state import context_store
+from state.models import Module, StudyPlan
+
+
+def _plan_for(learner: int, modules: int = 14) -> StudyPlan:
+    return StudyPlan(
+        subject=f"Subject {learner % 50}",
+        level="beginner",
+        duration_weeks=2,
+        learner_name=f"learner-{learner}",
+        modules=[
+            Module(id=i, title=f"Day {i}: Topic {i}", duration_days=1,
+                   learning_objectives=[f"Objective {i}.{j}" for j in range(3)])
+            for i in range(1, modules + 1)
+        ],
+    )
+
+
+def _run(label: str, args, plans, scoped: bool) -> None:
+    sessions = [f"s-{i}" for i in range(args.learners)]
+    reads, writes = [], []
+    foreign = [0]
+    lock = threading.Lock()
+    per_thread = args.ops // args.threads
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        local_reads, local_writes, local_foreign = [], [], 0
+        for _ in range(per_thread):
+            learner = rng.randrange(args.learners)
+            session = sessions[learner] if scoped else None
+            started = time.perf_counter()
+            if rng.random() < args.write_ratio:
+                context_store.save_study_plan(plans[learner], session)
+                local_writes.append(time.perf_counter() - started)
+            else:
+                plan = context_store.get_study_plan(session)
+                local_reads.append(time.perf_counter() - started)
+                if plan is None or plan.learner_name != plans[learner].learner_name:
+                    local_foreign += 1
+        with lock:
+            reads.extend(local_reads)
+            writes.extend(local_writes)
+            foreign[0] += local_foreign
+
+    # Every learner saves a plan first (with one shared key, the last one wins)
+    for learner in range(args.learners):
+        context_store.save_study_plan(plans[learner], sessions[learner] if scoped else None)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    def ms(samples, q):
+        samples.sort()
+        return samples[min(len(samples) - 1, int(len(samples) * q))] * 1000 if samples else 0.0
+
+    print(f"{label:<22} {len(reads) + len(writes):>7} ops {elapsed:>6.2f}s "
+          f"{(len(reads) + len(writes)) / elapsed:>9,.0f} ops/s | "
+          f"read p50 {ms(reads, 0.5):.3f}ms p95 {ms(reads, 0.95):.3f}ms | "
+          f"write p50 {ms(writes, 0.5):.3f}ms p95 {ms(writes, 0.95):.3f}ms | "
+          f"foreign reads {foreign[0]} ({foreign[0] / max(1, len(reads)):.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--learners", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=40_000)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    plans = [_plan_for(i) for i in range(args.learners)]
+    print(f"learners={args.learners} threads={args.threads} ops={args.ops} write_ratio={args.write_ratio} "
+          f"plan_cache={context_store.PLAN_CACHE_ENTRIES}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, scoped in (("global key (before)", False), ("per-learner (after)", True)):
+            context_store.close_connections()
+            context_store._plan_cache.clear()
+            context_store.DB_PATH = Path(tmp) / f"{'scoped' if scoped else 'global'}.sqlite"
+            _run(label, args, plans, scoped)
+        context_store.close_connections()
+
+
+if __name__ == "__main__":
+    main()
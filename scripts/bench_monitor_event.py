@@ -0,0 +1,104 @@
+"""
+Benchmark: caller-side cost of monitor_event, inline logging vs the queue pipeline.
+
+Usage:
+    python scripts/bench_monitor_event.py [--events 8000] [--threads 8] [--payload 2000]
+
+"inline" replays the old behaviour (str() of the payload, FileHandler write and
+print on the calling thread); "queued" calls the real monitor_event. Stdout is
+sent to /dev/null for both so the terminal does not skew the numbers. A last
+run with a tiny queue shows events being dropped and counted instead of
+blocking. Runs inside a throwaway working directory.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from agents import monitoring
+from agents.shared_tools import monitor_event
+
+
+def _inline_logger() -> logging.Logger:
+    os.makedirs("logs", exist_ok=True)
+    log = logging.getLogger("bench_inline")
+    log.setLevel(logging.INFO)
+    handler = logging.FileHandler(os.path.join("logs", "inline.log"), encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    log.addHandler(handler)
+    return log
+
+
+def _run(label: str, emit, events: int, threads: int, payload: dict) -> float:
+    per_thread = events // threads
+    latencies = []
+    lock = threading.Lock()
+
+    def worker():
+        local = []
+        for i in range(per_thread):
+            started = time.perf_counter()
+            emit("Bench", "complete", payload)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(f"{label:<10} {len(latencies) / elapsed:>10,.0f} events/s  caller p50 {p50:>7.1f}us  p99 {p99:>8.1f}us",
+          file=sys.__stderr__)
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--events", type=int, default=8000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--payload", type=int, default=2000, help="characters of text in each event")
+    args = parser.parse_args()
+
+    payload = {"function": "teacher_explain", "topic": "Decorators", "text": "x" * args.payload}
+    inline_log = _inline_logger()
+
+    def inline(source, event, data=None):
+        msg = f"[MONITOR] [{source}] {event} | DATA: {data}"
+        inline_log.info(msg)
+        print(msg)
+
+    sys.stdout = open(os.devnull, "w")
+    before = _run("inline", inline, args.events, args.threads, payload)
+    after = _run("queued", monitor_event, args.events, args.threads, payload)
+    monitoring.event_pipeline.flush(30)
+    stats = monitoring.event_pipeline.stats()
+    with open(monitoring.event_pipeline.path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    print(f"caller speedup x{before / after:.1f}; enqueued={stats['enqueued']} dropped={stats['dropped']} "
+          f"written={stats['written']} in {stats['batches']} batches, "
+          f"longest line {max(len(json.dumps(r)) for r in lines)} chars", file=sys.__stderr__)
+
+    tiny = monitoring.EventPipeline(path="logs/tiny.jsonl", maxsize=64, echo=False)
+    _run("tiny-queue", tiny.emit, args.events, args.threads, payload)
+    tiny.flush(30)
+    stats = tiny.stats()
+    print(f"tiny queue: enqueued={stats['enqueued']} dropped={stats['dropped']} written={stats['written']}",
+          file=sys.__stderr__)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep logs out of the repo
+        main()
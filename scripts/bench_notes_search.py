@@ -0,0 +1,110 @@
+"""
+Benchmark: FTS5 note search vs the old LIKE scan.
+
+Usage:
+    python scripts/bench_notes_search.py [--sizes 10000 100000 1000000] [--queries 50]
+
+Fills a throwaway notes.db with synthetic teacher notes spread over 30 modules
+(inserted through the real triggers, so the FTS index is built the way it is
+in production), then times module-scoped queries: the old
+`content LIKE '%q%'` scan against search_notes_ranked() for a single term, a
+prefix term and a two-word phrase.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from agents import shared_tools
+
+MODULES = 30
+VOCAB = [
+    "variable", "function", "decorator", "closure", "generator", "iterator", "class", "object",
+    "inheritance", "recursion", "list", "dictionary", "tuple", "set", "comprehension", "lambda",
+    "exception", "context", "manager", "module", "package", "import", "async", "await", "thread",
+    "process", "queue", "memory", "reference", "scope", "binding", "argument", "parameter",
+    "return", "yield", "loop", "condition", "string", "format", "slice", "index", "sort", "key",
+    "value", "hash", "equality", "identity", "mutable", "immutable", "pattern", "typing",
+] + [f"term{i}" for i in range(2000)]
+
+
+def _note(rng: random.Random) -> str:
+    return " ".join(rng.choice(VOCAB) for _ in range(rng.randint(40, 120)))
+
+
+def _fill(n: int) -> None:
+    rng = random.Random(n)
+    conn = shared_tools.create_connection()
+    conn.execute("PRAGMA synchronous=OFF")
+    batch = 20_000
+    for start in range(0, n, batch):
+        conn.executemany(
+            "INSERT INTO notes (module_id, content, created_at) VALUES (?, ?, datetime('now'))",
+            [(i % MODULES, _note(rng)) for i in range(start, min(start + batch, n))],
+        )
+        conn.commit()
+    conn.execute("INSERT INTO notes_fts(notes_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+
+
+def _legacy_search(module_id: int, query: str):
+    conn = sqlite3.connect(shared_tools.DB_NAME)
+    rows = conn.execute(
+        "SELECT content FROM notes WHERE module_id=? AND content LIKE ?", (module_id, f"%{query}%")
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def _time(fn, queries):
+    samples = []
+    for module_id, q in queries:
+        started = time.perf_counter()
+        fn(module_id, q)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    shapes = {
+        "term": lambda: rng.choice(VOCAB[:50]),
+        "prefix": lambda: rng.choice(VOCAB[:50])[:4] + "*",
+        "phrase": lambda: f'"{rng.choice(VOCAB[:50])} {rng.choice(VOCAB[:50])}"',
+    }
+    print(f"{'notes':>9} {'query':>7} {'LIKE p50':>9} {'LIKE p95':>9} {'FTS p50':>8} {'FTS p95':>8} {'speedup':>8}")
+    for size in args.sizes:
+        shared_tools.DB_NAME = f"notes_{size}.db"
+        shared_tools._DB_INITIALIZED = False
+        started = time.perf_counter()
+        _fill(size)
+        print(f"  built {size:,} notes + index in {time.perf_counter() - started:.1f}s")
+        for shape, make in shapes.items():
+            queries = [(rng.randrange(MODULES), make()) for _ in range(args.queries)]
+            # LIKE has no notion of prefix/phrase syntax; give it the bare text it would have matched
+            like_queries = [(m, q.strip('"').rstrip("*")) for m, q in queries]
+            like_p50, like_p95 = _time(_legacy_search, like_queries)
+            fts_p50, fts_p95 = _time(
+                lambda m, q: shared_tools.search_notes_ranked(q, module_id=m, limit=20), queries
+            )
+            print(f"{size:>9,} {shape:>7} {like_p50:>8.2f}ms {like_p95:>8.2f}ms "
+                  f"{fts_p50:>7.2f}ms {fts_p95:>7.2f}ms {like_p50 / fts_p50:>7.1f}x")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep the generated databases and logs out of the repo
+        main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: paginated mcp_parse_file vs loading the whole file.
+
+Usage:
+    python scripts/bench_parse_file.py [--rows 1000000] [--page 100]
+
+Writes a throwaway course dataset as CSV (with quoted multi-line fields) and
+as JSONL, then reports time and peak Python memory (tracemalloc) for:
+  - the old full load (csv.DictReader into a list / json.loads per line),
+  - file_info (builds the offset index on first use),
+  - pages at the start, middle and end of the file, following cursors.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.getcwd())
+
+from agents import file_pages
+from agents.mcp_tools import mcp_file_info, mcp_parse_file
+
+
+def measure(fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def write_dataset(directory, rows):
+    csv_path = os.path.join(directory, "course.csv")
+    jsonl_path = os.path.join(directory, "course.jsonl")
+    with open(csv_path, "w", newline="", encoding="utf-8") as c, open(jsonl_path, "w", encoding="utf-8") as j:
+        writer = csv.writer(c)
+        writer.writerow(["id", "module", "question", "answer"])
+        for i in range(rows):
+            # Every 50th answer spans two lines, so the CSV index must be quote-aware
+            answer = f"Answer {i}, see module {i % 30}" + ("\nwith a second line" if i % 50 == 0 else "")
+            record = [i, i % 30, f"What does concept {i} mean for day {i % 90}?", answer]
+            writer.writerow(record)
+            j.write(json.dumps(dict(zip(["id", "module", "question", "answer"], record))) + "\n")
+    return csv_path, jsonl_path
+
+
+def report(label, elapsed, peak):
+    print(f"  {label:<34} {elapsed * 1000:9.1f} ms  peak {peak / 1e6:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        paths = write_dataset(tmp, args.rows)
+        print(f"wrote {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+        for path in paths:
+            size = os.path.getsize(path)
+            print(f"{os.path.basename(path)} ({size / 1e6:.0f} MB)")
+            if path.endswith(".csv"):
+                def full_load():
+                    with open(path, newline="", encoding="utf-8") as f:
+                        return len(list(csv.DictReader(f)))
+            else:
+                def full_load():
+                    with open(path, encoding="utf-8") as f:
+                        return len([json.loads(line) for line in f])
+            count, elapsed, peak = measure(full_load)
+            report(f"full load ({count} rows)", elapsed, peak)
+
+            file_pages.index_cache.clear()
+            info, elapsed, peak = measure(lambda: mcp_file_info(path))
+            assert info["row_count"] == args.rows, info
+            report("file_info, cold (builds index)", elapsed, peak)
+            _, elapsed, peak = measure(lambda: mcp_file_info(path))
+            report("file_info, warm", elapsed, peak)
+
+            for label, offset in (("first page", 0), ("middle page", args.rows // 2),
+                                  ("last page", args.rows - args.page)):
+                page, elapsed, peak = measure(lambda: mcp_parse_file(path, offset=offset, limit=args.page))
+                assert page["success"] and len(page["data"]) == args.page and page["data"][0]["id"] in (offset, str(offset))
+                report(f"{label} (row {offset})", elapsed, peak)
+
+            page = mcp_parse_file(path, offset=args.rows // 2, limit=args.page)
+            _, elapsed, peak = measure(lambda: [mcp_parse_file(path, cursor=page["next_cursor"], limit=args.page)
+                                                for _ in range(10)])
+            report("cursor page (mean of 10)", elapsed / 10, peak)
+        print("index cache:", file_pages.index_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
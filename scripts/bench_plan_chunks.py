@@ -0,0 +1,98 @@
+"""
+Benchmark: single-shot vs chunked study-plan generation.
+
+Usage:
+    python scripts/bench_plan_chunks.py [--days 7 30 60 90] [--per-day 0.05] [--fail-rate 0.2]
+
+The Groq LLM is swapped for a StubLLM whose latency grows with the number of
+days it has to write (a fixed time to first token plus `--per-day` seconds per
+day of output), which is how completion time scales on a real model.
+"single-shot" is one call that writes the whole plan; "chunked" is the real
+create_study_plan path (outline + parallel week chunks). `--fail-rate` makes
+that share of chunk replies malformed to show that only those chunks retry.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+from agents import crewai_agent
+from agents.stub_llm import StubLLM
+from state.models import StudyPlan
+
+_calls = {"outline": 0, "chunk": 0, "malformed": 0}
+
+
+def _module(day: int) -> dict:
+    return {
+        "id": day,
+        "title": f"Day {day}: Topic {day}",
+        "duration_days": 1,
+        "learning_objectives": ["Understand it", "Apply it", "Explain it"],
+        "daily_tasks": ["Read", "Practice", "Review"],
+        "resources": ["https://docs.python.org/3/tutorial/"],
+    }
+
+
+def _make_responder(base: float, per_day: float, fail_rate: float):
+    def responder(messages) -> str:
+        prompt = messages[-1]["content"]
+        if "Outline an intensive" in prompt:
+            days = int(re.search(r"(\d+)-day", prompt).group(1))
+            _calls["outline"] += 1
+            # Outline lines are short; charge them a fifth of a full day
+            time.sleep(base + per_day * days / 5)
+            return json.dumps({"days": [f"Topic {d}" for d in range(1, days + 1)]})
+        first, last = map(int, re.search(r"Expand days (\d+)-(\d+)", prompt).groups())
+        _calls["chunk"] += 1
+        time.sleep(base + per_day * (last - first + 1))
+        if random.random() < fail_rate:
+            _calls["malformed"] += 1
+            return '{"modules": [{"id": ' + str(first) + ', "title": "Day'
+        return "```json\n" + json.dumps({"modules": [_module(d) for d in range(first, last + 1)]}) + "\n```"
+    return responder
+
+
+def _single_shot(days: int, base: float, per_day: float) -> float:
+    started = time.perf_counter()
+    time.sleep(base + per_day * days)
+    raw = json.dumps({"subject": "Python", "level": "beginner", "duration_weeks": max(1, days // 7),
+                      "modules": [_module(d) for d in range(1, days + 1)]})
+    StudyPlan.model_validate_json(raw)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 60, 90])
+    parser.add_argument("--base", type=float, default=0.3, help="time to first token per call")
+    parser.add_argument("--per-day", type=float, default=0.05, help="seconds of output per plan day")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    random.seed(7)
+    crewai_agent.groq_llm = StubLLM(model="stub", responder=_make_responder(args.base, args.per_day, args.fail_rate))
+    crewai_agent.PLAN_CHUNKED_MIN_DAYS = 1  # force the chunked path at every size
+
+    print(f"{'days':>5} {'single-shot':>12} {'chunked':>9} {'speedup':>8} {'chunks':>7} {'retries':>8}")
+    for days in args.days:
+        single = _single_shot(days, args.base, args.per_day)
+        started = time.perf_counter()
+        plan = crewai_agent.create_study_plan("Python", "beginner", days, "Bench")
+        chunked = time.perf_counter() - started
+        assert [m.id for m in plan.modules] == list(range(1, days + 1))
+        print(f"{days:>5} {single:>11.2f}s {chunked:>8.2f}s {single / chunked:>7.1f}x "
+              f"{plan.metadata['chunks']:>7} {plan.metadata['chunk_retries']:>8}")
+    print("calls:", _calls)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep the saved plans out of the repo
+        main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: quiz retakes served from the question bank vs generated per click.
+
+Usage:
+    python scripts/bench_quiz_bank.py [--latency 1.0] [--retakes 10] [--days 10]
+
+Creates a --days plan through the coordinator with a StubLLM answering every
+call after --latency seconds, waits for the background prefill, then times
+--retakes /generate-quiz calls per module:
+  - a prefilled module (served from the bank);
+  - a module past QUIZ_BANK_PREFILL_MODULES (first click generates, the
+    following ones come from the bank once the refill has run);
+  - the same clicks with the bank disabled (every click generates).
+Also checks that banked questions are unique, that each retake draws a
+random sample of num_questions from the bank, and that a quiz larger than the
+bank is topped up with generated questions and grows the bank to its size.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("APP_WARMUP", "off")
+
+from fastapi.testclient import TestClient
+
+from agents import adk_agent, crewai_agent
+from agents.quiz_bank import quiz_bank
+from agents.stub_llm import StubLLM, tutor_responder
+from coordinator.main import app
+from state.context_store import count_bank_questions, normalize_question, recent_bank_questions
+
+calls = 0
+
+
+def _counting_responder(messages):
+    global calls
+    calls += 1
+    return tutor_responder(messages)
+
+
+def _clicks(client, module_id, retakes, num_questions, session_id):
+    seconds, sources, samples = [], [], []
+    for _ in range(retakes):
+        started = time.perf_counter()
+        response = client.post("/generate-quiz", json={"module_id": module_id, "num_questions": num_questions,
+                                                       "session_id": session_id})
+        seconds.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.text[:300]
+        body = response.json()
+        sources.append(body["source"])
+        samples.append(tuple(q["question"] for q in body["quiz"]["questions"]))
+        quiz_bank.drain()  # a learner takes minutes per quiz; let a triggered refill land first
+    return seconds, sources, samples
+
+
+def _report(label, seconds, sources, llm_calls):
+    print(f"{label:<34} p50 {statistics.median(seconds) * 1000:8.1f} ms   max {max(seconds) * 1000:8.1f} ms   "
+          f"bank {sources.count('bank'):>3}/{len(sources)}   LLM calls on the request path {llm_calls:>3}")
+
+
+def main():
+    global calls
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--latency", type=float, default=1.0, help="stub latency per LLM call")
+    parser.add_argument("--retakes", type=int, default=10)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--num-questions", type=int, default=5)
+    args = parser.parse_args()
+
+    stub = StubLLM(model="stub", latency=args.latency, responder=_counting_responder)
+    crewai_agent.groq_llm = stub
+    adk_agent.groq_llm = stub
+    late_module = min(args.days, quiz_bank.prefill_modules + 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep the context store and notes out of the repo
+        with TestClient(app) as client:
+            session = "bank-bench"
+            response = client.post("/start-learning?wait=true", json={
+                "subject": "Python", "level": "beginner", "total_days": args.days, "session_id": session})
+            assert response.status_code == 200, response.text[:300]
+            started = time.perf_counter()
+            assert quiz_bank.drain(timeout=600), "prefill did not finish"
+            sizes = [count_bank_questions(m, session) for m in range(1, args.days + 1)]
+            print(f"prefill: {time.perf_counter() - started:.1f}s in the background, bank sizes per module {sizes}")
+
+            results = {}
+            for label, module_id in (("prefilled module", 1), (f"module {late_module} (not prefilled)", late_module)):
+                calls = 0
+                refills_before = quiz_bank.stats()["refill_rounds"]
+                seconds, sources, samples = _clicks(client, module_id, args.retakes, args.num_questions, session)
+                # Refill rounds run in the background; subtract them from the calls made
+                request_calls = calls - (quiz_bank.stats()["refill_rounds"] - refills_before)
+                _report(label, seconds, sources, request_calls)
+                results[label] = (seconds, samples)
+
+            bank = recent_bank_questions(1, 1000, session)
+            assert len({normalize_question(q) for q in bank}) == len(bank), "duplicate questions in the bank"
+            samples = results["prefilled module"][1]
+            assert all(len(s) == args.num_questions for s in samples), "wrong number of questions"
+            print(f"module 1 bank: {len(bank)} unique questions, {len(set(samples))} distinct quizzes "
+                  f"in {len(samples)} retakes")
+
+            # More questions than the bank holds: the shortfall is generated, then banked
+            big = count_bank_questions(1, session) + args.num_questions
+            sources = []
+            for _ in range(2):
+                body = client.post("/generate-quiz", json={"module_id": 1, "num_questions": big,
+                                                           "session_id": session}).json()
+                assert len(body["quiz"]["questions"]) == big, len(body["quiz"]["questions"])
+                sources.append(body["source"])
+                quiz_bank.drain()
+            assert sources == ["bank+generated", "bank"], sources
+            print(f"{big}-question quiz from a {big - args.num_questions}-question bank: {sources[0]}, "
+                  f"then {sources[1]} (bank now {count_bank_questions(1, session)})")
+
+            quiz_bank.enabled = False
+            calls = 0
+            seconds, sources, _ = _clicks(client, 2, args.retakes, args.num_questions, session)
+            _report("bank disabled (generate per click)", seconds, sources, calls)
+            quiz_bank.enabled = True
+            speedup = statistics.median(seconds) / statistics.median(results["prefilled module"][0])
+            print(f"retake p50 speed-up from the bank: {speedup:.0f}x")
+            print("quiz_bank stats:", quiz_bank.stats())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: per-day sequential searches vs one batch_web_search fan-out.
+
+Usage:
+    python scripts/bench_search_fanout.py [--queries 30] [--latency 0.3] [--concurrency 8]
+
+Runs against the local fake search server (scripts/fake_search_server.py) with
+`latency` seconds injected per request, so no network or API key is needed.
+The search cache is cleared before each run so every query goes upstream. A
+last run sets a deadline shorter than the full fan-out to show that the batch
+returns partial results on time instead of waiting for stragglers.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_search_server import FakeSearchServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with FakeSearchServer(latency=args.latency) as server:
+        os.environ["SERPAPI_KEY"] = "fake"
+        os.environ["SEARCH_API_URL"] = server.url
+        from agents import mcp_tools
+
+        queries = [f"python day {i} topic tutorial" for i in range(1, args.queries + 1)]
+
+        mcp_tools.search_cache.clear()
+        started = time.perf_counter()
+        for q in queries:
+            mcp_tools.mcp_web_search(q, 3)
+        sequential = time.perf_counter() - started
+        print(f"sequential      {args.queries} queries: {sequential:6.2f}s")
+
+        for concurrency in sorted({args.concurrency // 2 or 1, args.concurrency, args.concurrency * 2}):
+            mcp_tools.search_cache.clear()
+            batch = mcp_tools.mcp_batch_web_search(queries, 3, concurrency=concurrency)
+            s = batch["summary"]
+            print(f"batch c={concurrency:<3}    {args.queries} queries: {s['seconds']:6.2f}s "
+                  f"({sequential / s['seconds']:4.1f}x)  completed={s['completed']} "
+                  f"unique={s['unique_results']} duplicates_removed={s['duplicates_removed']}")
+
+        # Deadline worth about half the waves: the rest are abandoned, not awaited
+        deadline = args.latency * (args.queries / args.concurrency) / 2
+        mcp_tools.search_cache.clear()
+        batch = mcp_tools.mcp_batch_web_search(queries, 3, concurrency=args.concurrency, deadline_seconds=deadline)
+        s = batch["summary"]
+        print(f"batch deadline={deadline:.2f}s: returned in {s['seconds']:.2f}s, "
+              f"completed={s['completed']} timed_out={s['timed_out']}")
+        print(f"server: requests={server.requests} connections={server.connections}")
+
+
+if __name__ == "__main__":
+    main()
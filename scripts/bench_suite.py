@@ -0,0 +1,282 @@
+"""
+Offline benchmark suite: every coordinator route against a stub LLM.
+
+Usage:
+    python scripts/bench_suite.py [--requests 50] [--concurrency 10] [--latency 0.5]
+                                  [--latency-dist lognormal] [--routes explain ask-doubt ...]
+                                  [--out bench_results/run.json]
+    python scripts/bench_suite.py --baseline bench_results/before.json [--threshold 0.2]
+
+Both Groq LLMs are swapped for agents.stub_llm.StubLLM (fixed or sampled
+latency, canned plan/quiz JSON from tutor_responder), and coordinator.main is
+served by uvicorn on a local port inside a throwaway working directory. Each
+route gets `--requests` requests from `--concurrency` concurrent clients;
+LLM routes use a fresh topic/session per request so they measure the model
+path, and "-cached" variants repeat one request to measure the cache path.
+
+Each route is run twice: once with the configured stub latency (throughput and
+p50/p95/p99 latency) and once with a zero-latency stub at concurrency 1, whose
+latencies are the app's own overhead. Results are written as JSON.
+
+With --baseline, every route's p95 latency and p50 overhead are compared with a
+previous results file; a route that got slower by more than --threshold (and by
+more than --min-delta-ms, to ignore scheduler noise on fast routes) fails the run with
+exit code 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from itertools import count
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+os.environ.setdefault("APP_WARMUP", "off")  # the suite warms up explicitly, below
+
+import httpx
+import uvicorn
+
+from agents import adk_agent, crewai_agent
+from agents.quiz_bank import quiz_bank
+from agents.stub_llm import StubLLM, tutor_responder
+from coordinator.main import app
+
+_ids = count()
+
+
+def _uid() -> int:
+    return next(_ids)
+
+
+# ---------------------------------------------------
+# Routes
+# ---------------------------------------------------
+# name -> (method, path, body factory). Factories get the seeded session id.
+SEED_SESSION = "bench-seed"
+
+
+def _routes():
+    return {
+        "home": ("GET", "/", None),
+        "start-learning": ("POST", "/start-learning?wait=true", lambda s: {
+            "subject": f"Python {_uid()}", "level": "beginner", "total_days": 5, "session_id": f"bench-{_uid()}"}),
+        "start-learning-chunked": ("POST", "/start-learning?wait=true", lambda s: {
+            "subject": f"Rust {_uid()}", "level": "beginner", "total_days": 30, "session_id": f"bench-{_uid()}"}),
+        "explain": ("POST", "/explain-topic", lambda s: {"topic": f"Closures {_uid()}", "session_id": s}),
+        "explain-cached": ("POST", "/explain-topic", lambda s: {"topic": "Closures", "session_id": s}),
+        "explain-stream": ("POST", "/explain-topic/stream", lambda s: {"topic": f"Generators {_uid()}", "session_id": s}),
+        "brief": ("POST", "/get-topic-brief", lambda s: {"topic": f"Decorators {_uid()}"}),
+        "brief-cached": ("POST", "/get-topic-brief", lambda s: {"topic": "Decorators"}),
+        "brief-stream": ("POST", "/get-topic-brief/stream", lambda s: {"topic": f"Iterators {_uid()}"}),
+        "ask-doubt": ("POST", "/ask-doubt", lambda s: {
+            "question": f"Why does variant {_uid()} of my loop never end?", "module_id": 1, "session_id": s}),
+        "generate-quiz": ("POST", "/generate-quiz", lambda s: {"module_id": 1 + _uid() % 5, "session_id": s}),
+        "generate-quizzes": ("POST", "/generate-quizzes", lambda s: {"module_ids": [1, 2, 3], "session_id": s}),
+        "get-quiz": ("GET", f"/quiz/1?session_id={SEED_SESSION}", None),
+        "cache-stats": ("GET", "/cache-stats", None),
+        "metrics": ("GET", "/metrics", None),
+        "monitor-stats": ("GET", "/monitor-stats", None),
+        "cache-invalidate": ("POST", "/cache/invalidate", lambda s: {"kind": "brief", "topic": f"Nothing {_uid()}"}),
+    }
+
+
+# ---------------------------------------------------
+# Load Generation
+# ---------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def _drive(client, route, n, concurrency):
+    method, path, body = route
+    latencies, errors = [], 0
+    todo = iter(range(n))
+
+    async def worker():
+        nonlocal errors
+        for _ in todo:
+            started = time.perf_counter()
+            try:
+                if path.endswith("/stream"):
+                    async with client.stream(method, path, json=body(SEED_SESSION)) as response:
+                        async for _ in response.aiter_bytes():
+                            pass
+                else:
+                    response = await client.request(method, path, json=body(SEED_SESSION) if body else None)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, n))])
+    wall = time.perf_counter() - started
+    return latencies, errors, wall
+
+
+def _set_llm(latency, dist, spread):
+    # Streaming routes wait the same latency before their first token
+    llm = StubLLM(model="stub", latency=latency, latency_dist=dist, latency_spread=spread,
+                  first_token_latency=latency, responder=tutor_responder)
+    crewai_agent.groq_llm = llm
+    adk_agent.groq_llm = llm
+    for name in ("teacher_agent", "doubt_agent"):
+        getattr(adk_agent, name).llm = llm
+    # Pooled crews hold the LLM they were built with
+    crewai_agent.plan_crews.reset()
+    crewai_agent.quiz_crews.reset()
+    crewai_agent.plan_crews.warm()
+    crewai_agent.quiz_crews.warm()
+
+
+async def _run(args, base):
+    routes = _routes()
+    selected = args.routes or list(routes)
+    results = {}
+    async with httpx.AsyncClient(base_url=base, timeout=args.timeout,
+                                 limits=httpx.Limits(max_connections=args.concurrency + 5)) as client:
+        # Seed one learner with a plan and a saved quiz for the session-scoped routes
+        _set_llm(0.0, "fixed", 0.0)
+        await client.post("/start-learning?wait=true", json={"subject": "Python", "level": "beginner",
+                                                             "total_days": 5, "session_id": SEED_SESSION})
+        await client.post("/generate-quiz", json={"module_id": 1, "session_id": SEED_SESSION})
+        await client.post("/explain-topic", json={"topic": "Closures", "session_id": SEED_SESSION})
+        await client.post("/get-topic-brief", json={"topic": "Decorators"})
+
+        for name in selected:
+            route = routes[name]
+            # Background quiz-bank refills would compete with the route and hold crews across the LLM swap
+            await asyncio.to_thread(quiz_bank.drain)
+            _set_llm(0.0, "fixed", 0.0)
+            overhead, overhead_errors, _ = await _drive(client, route, args.overhead_requests, 1)
+            _set_llm(args.latency, args.latency_dist, args.latency_spread)
+            latencies, errors, wall = await _drive(client, route, args.requests, args.concurrency)
+            ms = [x * 1000 for x in latencies]
+            results[name] = {
+                "method": route[0],
+                "path": route[1].split("?")[0],
+                "requests": len(latencies),
+                "concurrency": args.concurrency,
+                "errors": errors + overhead_errors,
+                "throughput_rps": round(len(latencies) / wall, 2),
+                "p50_ms": round(_percentile(ms, 0.50), 2),
+                "p95_ms": round(_percentile(ms, 0.95), 2),
+                "p99_ms": round(_percentile(ms, 0.99), 2),
+                "mean_ms": round(statistics.mean(ms), 2),
+                "overhead_p50_ms": round(_percentile([x * 1000 for x in overhead], 0.50), 2),
+                "overhead_p95_ms": round(_percentile([x * 1000 for x in overhead], 0.95), 2),
+            }
+            r = results[name]
+            print(f"{name:<24} {r['throughput_rps']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+                  f"{r['p99_ms']:>9.1f} {r['overhead_p50_ms']:>11.2f} {r['errors']:>6}", flush=True)
+    return results
+
+
+# ---------------------------------------------------
+# Results and Regression Check
+# ---------------------------------------------------
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold, min_delta_ms):
+    """Returns human-readable regressions of p95 latency and p50 overhead per route."""
+    regressions = []
+    for name, now in current["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None:
+            continue
+        for metric in ("p95_ms", "overhead_p50_ms"):
+            old, new = before[metric], now[metric]
+            if new - old > min_delta_ms and new > old * (1 + threshold):
+                regressions.append(f"{name}: {metric} {old:.2f} -> {new:.2f} ms (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+        if now["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--overhead-requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub LLM latency per call (seconds)")
+    parser.add_argument("--latency-dist", default="fixed", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--latency-spread", type=float, default=0.5)
+    parser.add_argument("--routes", nargs="*", choices=list(_routes()))
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--out", default=os.path.join(REPO, "bench_results", time.strftime("run-%Y%m%d-%H%M%S.json")))
+    parser.add_argument("--baseline", help="results JSON to compare against (regression mode)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep caches, notes and logs out of the repo
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        print(f"stub latency={args.latency}s ({args.latency_dist}), requests={args.requests}, "
+              f"concurrency={args.concurrency}")
+        print(f"{'route':<24} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'overhead ms':>11} {'errors':>6}")
+        try:
+            routes = asyncio.run(_run(args, f"http://127.0.0.1:{port}"))
+        finally:
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            **{k: getattr(args, k) for k in ("requests", "concurrency", "overhead_requests", "latency",
+                                             "latency_dist", "latency_spread")},
+        },
+        "routes": routes,
+    }
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results: {out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if not regressions:
+            print(f"OK: no regressions against {args.baseline}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
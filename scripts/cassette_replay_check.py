@@ -0,0 +1,116 @@
+"""
+Record/replay check for the LLM cassette.
+
+Usage:
+    python scripts/cassette_replay_check.py [--latency 0.3]
+
+Runs one workload (5-day and 30-day plans, quizzes, lessons, streamed
+lessons, briefs and doubts) through the coordinator three times, with both
+LLMs behind a CassetteLLM:
+  - record: the inner LLM is a StubLLM with --latency per call, and every
+    reply is written to a throwaway cassette;
+  - replay, latency scale 0: replies come from the cassette, no waiting;
+  - replay, latency scale 1: replies come after their recorded latency.
+The response caches are emptied between passes, so every pass reaches the
+LLM layer. Each replay must return the same bodies as the recording, and a
+prompt that was never recorded must fail instead of reaching a model.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("APP_WARMUP", "off")
+# Background bank refills would add LLM calls between passes and make them differ
+os.environ.setdefault("QUIZ_BANK_ENABLED", "false")
+
+from fastapi.testclient import TestClient
+
+from agents import adk_agent, crewai_agent
+from agents.cassette_store import CassetteStore
+from agents.llm_cassette import CassetteLLM
+from agents.response_cache import response_cache
+from agents.similarity_cache import doubt_cache
+from agents.stub_llm import StubLLM, tutor_responder
+from coordinator.main import app
+
+WORKLOAD = [
+    ("/start-learning?wait=true", {"subject": "Python", "level": "beginner", "total_days": 5, "session_id": "cassette"}),
+    ("/generate-quiz", {"module_id": 1, "session_id": "cassette"}),
+    ("/generate-quizzes", {"module_ids": [2, 3, 4], "session_id": "cassette"}),
+    ("/explain-topic", {"topic": "Closures", "session_id": "cassette"}),
+    ("/explain-topic/stream", {"topic": "Generators", "session_id": "cassette"}),
+    ("/get-topic-brief", {"topic": "Decorators"}),
+    ("/ask-doubt", {"question": "Why does my loop never end?", "module_id": 1, "session_id": "cassette"}),
+    ("/start-learning?wait=true", {"subject": "Rust", "level": "beginner", "total_days": 30, "session_id": "cassette-30"}),
+]
+
+
+def _use(llm):
+    crewai_agent.groq_llm = llm
+    adk_agent.groq_llm = llm
+    for name in ("teacher_agent", "doubt_agent"):
+        getattr(adk_agent, name).llm = llm
+    # Pooled crews hold the LLM they were built with
+    crewai_agent.plan_crews.reset()
+    crewai_agent.quiz_crews.reset()
+    response_cache.invalidate()
+    doubt_cache.clear()
+
+
+def _strip_timings(value):
+    if isinstance(value, dict):
+        return {k: _strip_timings(v) for k, v in value.items() if k != "seconds"}
+    if isinstance(value, list):
+        return [_strip_timings(v) for v in value]
+    return value
+
+
+def _run(client):
+    bodies = []
+    started = time.perf_counter()
+    for path, body in WORKLOAD:
+        response = client.post(path, json=body)
+        assert response.status_code == 200, (path, response.status_code, response.text[:300])
+        bodies.append(response.text if path.endswith("/stream") else _strip_timings(response.json()))
+    return bodies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency per call while recording")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep caches, notes and the cassette out of the repo
+        store = CassetteStore(os.path.join(tmp, "cassette.sqlite"))
+        stub = StubLLM(model="groq/llama-3.3-70b-versatile", latency=args.latency,
+                       first_token_latency=args.latency, chunk_delay=args.latency / 20, responder=tutor_responder)
+
+        with TestClient(app) as client:
+            _use(CassetteLLM(model=stub.model, inner=stub, mode="record", store=store))
+            recorded, record_seconds = _run(client)
+            print(f"record              {record_seconds:6.2f}s  {store.stats()['recorded']} calls recorded")
+
+            for scale in (0.0, 1.0):
+                _use(CassetteLLM(model=stub.model, mode="replay", latency_scale=scale, store=store))
+                replayed, seconds = _run(client)
+                for (path, _), want, got in zip(WORKLOAD, recorded, replayed):
+                    assert want == got, f"{path}: replay differs from the recording"
+                print(f"replay (scale {scale:.0f})   {seconds:6.2f}s  identical to the recording")
+
+            response = client.post("/get-topic-brief", json={"topic": "Never recorded"})
+            assert response.status_code == 500 and "No recorded reply" in response.text, response.text
+            print("unrecorded prompt   rejected:", response.json()["detail"][:60])
+
+        stats = store.stats()
+        print(f"cassette: {stats['entries']} entries, {stats['bytes'] / 1024:.1f} KB compressed, "
+              f"hit rate {stats['hit_rate']:.2%}, replayed {stats['replayed_llm_seconds']:.1f}s of LLM time")
+        store.close()
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
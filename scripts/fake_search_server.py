@@ -0,0 +1,102 @@
+"""
+Local stand-in for the SerpAPI search endpoint, for offline tests and benchmarks.
+
+Usage:
+    python scripts/fake_search_server.py [--port 8765] [--latency 0.2]
+
+Then point the tools at it:
+    SEARCH_API_URL=http://127.0.0.1:8765/search.json SERPAPI_KEY=fake
+
+Speaks HTTP/1.1 keep-alive, answers /search.json?q=...&num=... with
+deterministic organic_results, sleeps `latency` seconds per request, returns
+HTTP 503 for any query containing "fail", and counts requests and distinct TCP
+connections so callers can check pooling and caching.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeSearchServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self.queries = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                query = params.get("q", [""])[0]
+                num = int(params.get("num", ["5"])[0])
+                with server._lock:
+                    server.requests += 1
+                    server.queries.append(query)
+                if server.latency:
+                    time.sleep(server.latency)
+                if "fail" in query:
+                    body, status = b'{"error": "upstream unavailable"}', 503
+                else:
+                    slug = "-".join(query.lower().split())
+                    results = [
+                        {
+                            "title": f"{query} - resource {i}",
+                            # Every query shares resource 0, so fan-out callers have duplicates to drop
+                            "link": "https://docs.example.com/shared" if i == 0 else f"https://example.com/{slug}/{i}",
+                            "snippet": f"About {query} ({i})",
+                        }
+                        for i in range(num)
+                    ]
+                    body, status = json.dumps({"organic_results": results}).encode(), 200
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}/search.json"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    with FakeSearchServer(port=args.port, latency=args.latency) as server:
+        print(f"fake search on {server.url} (latency {args.latency}s), Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Import-time profile and boot-time regression check for the coordinator.
+
+Usage:
+    python scripts/import_profile.py [--module coordinator.main] [--runs 5] [--top 20]
+                                     [--target 2.0] [--forbid crewai litellm]
+
+Every run is a fresh interpreter, so the numbers are cold-start numbers:
+  - boot: wall time of `import <module>` measured inside the child (median of
+    --runs), compared against --target (BOOT_TIME_TARGET_SECONDS);
+  - per-module self and cumulative import time from `python -X importtime`,
+    plus a roll-up by top-level package;
+  - a check that the --forbid packages (the heavy agent frameworks, which
+    must load lazily on first use or in the startup warm-up) were not imported.
+Exits 1 when the target is missed or a forbidden package was imported, so it
+can run in CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _child_env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("APP_WARMUP", "off")
+    return env
+
+
+def measure_boot(module: str):
+    out = subprocess.run([sys.executable, "-c", _CHILD.format(module=module)], cwd=ROOT, env=_child_env(),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def profile_imports(module: str):
+    """{module: (self_us, cumulative_us)} parsed from -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                         env=_child_env(), capture_output=True, text=True, check=True)
+    timings = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--module", default="coordinator.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--target", type=float, default=float(os.getenv("BOOT_TIME_TARGET_SECONDS", "2.0")))
+    parser.add_argument("--forbid", nargs="*", default=["crewai", "litellm"])
+    args = parser.parse_args()
+
+    runs = [measure_boot(args.module) for _ in range(args.runs)]
+    boot = statistics.median(r["seconds"] for r in runs)
+    loaded = {name.split(".")[0] for name in runs[-1]["modules"]}
+
+    timings = profile_imports(args.module)
+    print(f"slowest imports of {args.module} (cumulative, ms):")
+    print(f"  {'module':<52} {'self':>8} {'cumul.':>8}")
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda kv: -kv[1][1])[:args.top]:
+        print(f"  {name:<52} {self_us / 1000:8.1f} {cumulative_us / 1000:8.1f}")
+
+    by_package = defaultdict(int)
+    for name, (self_us, _) in timings.items():
+        by_package[name.split(".")[0]] += self_us
+    print("by top-level package (self time summed, ms):")
+    for package, total in sorted(by_package.items(), key=lambda kv: -kv[1])[:10]:
+        print(f"  {package:<30} {total / 1000:8.1f}")
+
+    failures = []
+    if boot > args.target:
+        failures.append(f"boot {boot:.3f}s exceeds target {args.target:.2f}s")
+    leaked = sorted(set(args.forbid) & loaded)
+    if leaked:
+        failures.append(f"heavy packages imported at boot: {', '.join(leaked)}")
+
+    print(f"boot: median {boot:.3f}s over {args.runs} runs "
+          f"(min {min(r['seconds'] for r in runs):.3f}s), target {args.target:.2f}s, "
+          f"{len(runs[-1]['modules'])} modules loaded")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
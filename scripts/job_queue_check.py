@@ -0,0 +1,198 @@
+"""
+End-to-end check for the /start-learning background job queue.
+
+Usage:
+    python scripts/job_queue_check.py [--latency 0.3]
+
+Serves coordinator.main with uvicorn on a local port, with both LLMs swapped
+for a StubLLM answering after --latency seconds, and checks that:
+  - /start-learning answers 202 with a job id long before the plan exists;
+  - /jobs/{id}/events streams the stages of a chunked plan (outline,
+    resources, modules, saved) and ends with "done", and /jobs/{id} then
+    holds the same response body ?wait=true returns;
+  - a repeated Idempotency-Key (or an identical request while the first is
+    still queued) returns the existing job, and reusing a key for another
+    request is rejected;
+  - a job whose first attempt fails is retried and succeeds, while a job
+    that times out fails without a retry (its crew threads are still busy);
+  - a shutdown puts its running job back in the queue, and after a restart
+    both a job left "running" by a dead process and a job queued while the
+    server was down finish.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("APP_WARMUP", "off")
+os.environ.setdefault("QUIZ_BANK_ENABLED", "false")
+os.environ.setdefault("JOB_RETRY_BACKOFF_SECONDS", "0.2")
+os.environ.setdefault("JOB_POLL_SECONDS", "0.2")
+
+import httpx
+import uvicorn
+
+from agents import adk_agent, crewai_agent
+from agents.job_queue import job_queue
+from agents.stub_llm import StubLLM, tutor_responder
+from coordinator.main import app
+
+failures_left = 0
+_save_study_plan = crewai_agent.save_study_plan
+
+
+def _flaky_save(plan, session_id=None):
+    # Fails the next `failures_left` plan saves, then saves normally
+    global failures_left
+    if failures_left:
+        failures_left -= 1
+        raise RuntimeError("database is locked")
+    _save_study_plan(plan, session_id)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve():
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=_free_port(), log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{server.config.port}"
+
+
+def _stop(server, thread):
+    server.should_exit = True
+    thread.join()
+
+
+def _plan(subject, days, session):
+    return {"subject": subject, "level": "beginner", "total_days": days, "session_id": session}
+
+
+def _events(base, job_id):
+    events, name = [], None
+    with httpx.stream("GET", f"{base}/jobs/{job_id}/events", timeout=60) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((name, json.loads(line[len("data: "):])))
+    return events
+
+
+def _wait(client, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()["job"]
+        if job["state"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def main():
+    global failures_left
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--latency", type=float, default=0.3, help="stub latency per LLM call")
+    args = parser.parse_args()
+
+    stub = StubLLM(model="stub", latency=args.latency, responder=tutor_responder)
+    crewai_agent.groq_llm = stub
+    crewai_agent.save_study_plan = _flaky_save
+    adk_agent.groq_llm = stub
+
+    server, thread, base = _serve()
+    with httpx.Client(base_url=base, timeout=60) as client:
+        # Submit returns at once; the stages arrive on the event stream
+        started = time.perf_counter()
+        response = client.post("/start-learning", json=_plan("Rust", 30, "jobs-30"))
+        submit_ms = (time.perf_counter() - started) * 1000
+        assert response.status_code == 202, response.text[:300]
+        job_id = response.json()["job_id"]
+        events = _events(base, job_id)
+        names = [name for name, _ in events]
+        stages = list(dict.fromkeys(data["stage"] for name, data in events if name == "progress"))
+        assert stages == ["outline", "resources", "modules", "saved"], stages
+        assert names[-1] == "done", names
+        job = client.get(f"/jobs/{job_id}").json()["job"]
+        assert job["state"] == "succeeded" and len(job["result"]["study_plan"]["modules"]) == 30, job["state"]
+        print(f"submit              202 in {submit_ms:.1f} ms; plan done after "
+              f"{job['finished_at'] - job['created_at']:.2f}s; stages {stages}, "
+              f"{names.count('progress')} progress events")
+
+        waited = client.post("/start-learning?wait=true", json=_plan("Go", 5, "jobs-wait"))
+        assert waited.status_code == 200 and waited.json()["summary"]["total_modules"] == 5, waited.text[:300]
+        print("wait=true           200 with the plan body")
+
+        # Idempotent resubmits
+        headers = {"Idempotency-Key": "learner-42-go"}
+        first = client.post("/start-learning", json=_plan("Go", 7, "jobs-idem"), headers=headers).json()
+        again = client.post("/start-learning", json=_plan("Go", 7, "jobs-idem"), headers=headers).json()
+        twin = client.post("/start-learning", json=_plan("Go", 7, "jobs-idem")).json()
+        assert again["job_id"] == first["job_id"] and again["deduplicated"], again
+        assert twin["job_id"] == first["job_id"], "identical queued request was not coalesced"
+        other = client.post("/start-learning", json=_plan("Zig", 7, "jobs-idem"), headers=headers)
+        assert other.status_code == 422, other.text
+        done = _wait(client, first["job_id"])
+        repeat = client.post("/start-learning", json=_plan("Go", 7, "jobs-idem"), headers=headers).json()
+        assert repeat["job_id"] == first["job_id"] and repeat["state"] == "succeeded", repeat
+        print(f"idempotency         key and twin request reuse job {first['job_id'][:8]}; "
+              f"finished job returned as {done['state']}; key reuse for another plan -> 422")
+
+        # A failing first attempt is retried
+        failures_left = 1
+        flaky = client.post("/start-learning", json=_plan("Elixir", 5, "jobs-retry")).json()
+        job = _wait(client, flaky["job_id"])
+        assert job["state"] == "succeeded" and job["attempts"] == 2, (job["state"], job["attempts"], job["error"])
+        print(f"retry               failed attempt 1, succeeded on attempt {job['attempts']}")
+
+        # A timed-out attempt is not retried: its crew threads keep running
+        job_queue.timeout, timeout = args.latency, job_queue.timeout
+        slow_job = client.post("/start-learning", json=_plan("Lisp", 5, "jobs-timeout")).json()
+        job = _wait(client, slow_job["job_id"])
+        job_queue.timeout = timeout
+        assert job["state"] == "failed" and job["attempts"] == 1, (job["state"], job["attempts"])
+        print(f"timeout             failed after attempt {job['attempts']} without a retry: {job['error']}")
+
+        # Interrupted by a shutdown: the job goes back to the queue
+        slow = client.post("/start-learning", json=_plan("Haskell", 30, "jobs-restart")).json()
+        while client.get(f"/jobs/{slow['job_id']}").json()["job"]["state"] != "running":
+            time.sleep(0.05)
+    _stop(server, thread)
+    interrupted = job_queue.store.get(slow["job_id"])
+    assert interrupted["state"] == "queued" and interrupted["attempts"] == 0, interrupted["state"]
+    print("shutdown            running job released back to the queue without using an attempt")
+
+    # While the server is down: another process picks the job up and dies
+    # mid-run (same host, earlier boot), and a new job is queued
+    orphan = job_queue.store.claim(f"{socket.gethostname()}:{os.getpid()}:crashed", ["study_plan"])
+    assert orphan["id"] == slow["job_id"] and orphan["state"] == "running", orphan["state"]
+    queued, _ = job_queue.store.submit("study_plan", _plan("OCaml", 5, "jobs-queued"))
+
+    server, thread, base = _serve()
+    with httpx.Client(base_url=base, timeout=60) as client:
+        for label, job_id in (("orphaned", orphan["id"]), ("queued", queued["id"])):
+            job = _wait(client, job_id)
+            assert job["state"] == "succeeded", (label, job["state"], job["error"])
+            print(f"restart             {label:<11} job finished (attempts {job['attempts']})")
+        stats = client.get("/cache-stats").json()["jobs"]
+    _stop(server, thread)
+    print("jobs:", stats)
+    print("OK")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep the job table, plans and logs out of the repo
+        main()
@@ -0,0 +1,109 @@
+"""
+Load test: concurrent in-flight explanations on one worker, sync vs async path.
+
+Usage:
+    python scripts/load_test_async.py [--latency 2.0] [--concurrency 10 40 100 200]
+
+The Groq LLM is swapped for agents.stub_llm.StubLLM, so no API key or network
+is needed. "before" replays the old request shape (sync `def` route ->
+asyncio.run -> kickoff_async -> blocking LLM call in a thread); "after" drives
+the real /explain-topic route of coordinator.main. Everything runs in-process
+through httpx's ASGI transport, inside a throwaway working directory.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import httpx
+from fastapi import FastAPI
+
+from agents import adk_agent
+from agents.stub_llm import StubLLM
+from coordinator.main import app
+
+_in_flight = 0
+_peak = 0
+
+
+class CountingStubLLM(StubLLM):
+    """StubLLM that records how many calls are waiting on the 'LLM' at once."""
+
+    def call(self, messages, *args, **kwargs):
+        global _in_flight, _peak
+        _in_flight += 1
+        _peak = max(_peak, _in_flight)
+        try:
+            return super().call(messages, *args, **kwargs)
+        finally:
+            _in_flight -= 1
+
+    async def acall(self, messages, *args, **kwargs):
+        global _in_flight, _peak
+        _in_flight += 1
+        _peak = max(_peak, _in_flight)
+        try:
+            return await super().acall(messages, *args, **kwargs)
+        finally:
+            _in_flight -= 1
+
+
+def _legacy_app(llm: StubLLM) -> FastAPI:
+    """The pre-async request shape, reduced to its threading structure."""
+    legacy = FastAPI()
+
+    async def _invoke_agent_async(message: str) -> str:
+        # crew.kickoff_async() == asyncio.to_thread(crew.kickoff)
+        return await asyncio.to_thread(llm.call, message)
+
+    @legacy.post("/explain-topic")
+    def explain_topic(req: dict):
+        return {"explanation": asyncio.run(_invoke_agent_async(req["topic"]))}
+
+    return legacy
+
+
+async def _fire(target: FastAPI, concurrency: int, tag: str):
+    global _peak
+    _peak = 0
+    transport = httpx.ASGITransport(app=target)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None, limits=limits) as client:
+        started = time.perf_counter()
+        # Topics are unique per round so the response cache never short-circuits the LLM
+        responses = await asyncio.gather(*[
+            client.post("/explain-topic", json={"topic": f"{tag} {concurrency} topic {i}", "module_id": 0})
+            for i in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+    failed = sum(1 for r in responses if r.status_code != 200)
+    return elapsed, _peak, failed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--latency", type=float, default=2.0, help="stub LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 40, 100, 200])
+    args = parser.parse_args()
+
+    llm = CountingStubLLM(model="stub", latency=args.latency)
+    adk_agent.teacher_agent.llm = llm
+    legacy = _legacy_app(llm)
+
+    print(f"stub latency={args.latency}s")
+    print(f"{'concurrency':>11} | {'before: peak in-flight':>22} {'wall':>7} | {'after: peak in-flight':>21} {'wall':>7}")
+    for n in args.concurrency:
+        b_wall, b_peak, b_fail = await _fire(legacy, n, "before")
+        a_wall, a_peak, a_fail = await _fire(app, n, "after")
+        note = f"  (failures: before={b_fail} after={a_fail})" if b_fail or a_fail else ""
+        print(f"{n:>11} | {b_peak:>22} {b_wall:>6.2f}s | {a_peak:>21} {a_wall:>6.2f}s{note}")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep caches, notes and logs out of the repo
+        asyncio.run(main())
@@ -0,0 +1,69 @@
+"""
+Offline check of mcp_web_search pooling and caching against the fake search server.
+
+Usage:
+    python scripts/search_stub_test.py [--latency 0.05]
+
+Verifies that sequential searches reuse one keep-alive connection, that a
+repeated (query, num_results) is served from the cache, that a failing query is
+negatively cached (one upstream hit, then cached errors until the short TTL
+expires), and that concurrent identical searches share one upstream request.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_search_server import FakeSearchServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with FakeSearchServer(latency=args.latency) as server:
+        os.environ["SERPAPI_KEY"] = "fake"
+        os.environ["SEARCH_API_URL"] = server.url
+        os.environ["SEARCH_NEGATIVE_TTL_SECONDS"] = "0.5"
+        from agents import mcp_tools
+
+        checks = {}
+        started = time.perf_counter()
+        for i in range(10):
+            mcp_tools.mcp_web_search(f"python topic {i}")
+        cold = time.perf_counter() - started
+        checks["10 searches over 1 connection"] = server.connections == 1 and server.requests == 10
+
+        started = time.perf_counter()
+        results = [mcp_tools.mcp_web_search(f"  Python   TOPIC {i} ") for i in range(10)]
+        warm = time.perf_counter() - started
+        checks["repeats served from cache"] = server.requests == 10 and len(results[0]) == 5
+        results[0][0]["title"] = "edited by caller"
+        checks["cached results are copies"] = mcp_tools.mcp_web_search("python topic 0")[0]["title"] != "edited by caller"
+
+        for _ in range(5):
+            failed = mcp_tools.mcp_web_search("this will fail")
+        checks["failure negatively cached"] = server.requests == 11 and failed[0]["title"].startswith("Search Error")
+        time.sleep(0.6)
+        mcp_tools.mcp_web_search("this will fail")
+        checks["negative entry expires"] = server.requests == 12
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            list(pool.map(lambda _: mcp_tools.mcp_web_search("concurrent query"), range(20)))
+        checks["20 concurrent identical -> 1 request"] = server.requests == 13
+
+        print(f"cold: {cold * 1000:.0f}ms for 10, cached: {warm * 1000:.2f}ms for 10")
+        print("search cache:", mcp_tools.search_cache.stats())
+        print(f"server: requests={server.requests} connections={server.connections}")
+        for name, ok in checks.items():
+            print(f"  {'ok ' if ok else 'FAIL'} {name}")
+        sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
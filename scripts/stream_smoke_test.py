@@ -0,0 +1,103 @@
+"""
+Offline smoke test for the SSE streaming routes.
+
+Usage:
+    python scripts/stream_smoke_test.py [--first-token 0.2] [--chunk-delay 0.05]
+
+Swaps the teacher LLM for a chunk-yielding StubLLM, serves coordinator.main
+with uvicorn on a local port, and reports time-to-first-byte / first token and
+total time for /explain-topic/stream and /get-topic-brief/stream. It also
+checks that the assembled text reached the response cache.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.getcwd())
+
+import httpx
+import uvicorn
+
+from agents import adk_agent
+from agents.response_cache import response_cache
+from agents.stub_llm import StubLLM
+from coordinator.main import app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _stream(url: str, payload: dict):
+    started = time.perf_counter()
+    ttfb = first_token = None
+    text, events = [], []
+    with httpx.stream("POST", url, json=payload, timeout=30) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                events.append(event)
+                if event == "token":
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    text.append(data["text"])
+    return ttfb, first_token, time.perf_counter() - started, "".join(text), events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--first-token", type=float, default=0.2)
+    parser.add_argument("--chunk-delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    llm = StubLLM(model="stub", first_token_latency=args.first_token, chunk_delay=args.chunk_delay)
+    adk_agent.teacher_agent.llm = llm
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+    ok = True
+    for route, payload in (
+        ("/explain-topic/stream", {"topic": "List comprehensions", "module_id": 0}),
+        ("/get-topic-brief/stream", {"topic": "Decorators"}),
+    ):
+        ttfb, first_token, total, text, events = _stream(base + route, payload)
+        complete = text == llm.response and events[-1] == "done"
+        ok &= complete
+        print(f"{route:<26} ttfb={ttfb * 1000:.0f}ms first_token={first_token * 1000:.0f}ms "
+              f"total={total * 1000:.0f}ms chunks={events.count('token')} complete={complete}")
+
+        # A repeat is served from the cache in a single chunk
+        _, _, cached_total, cached_text, cached_events = _stream(base + route, payload)
+        ok &= cached_text == llm.response and cached_events.count("token") == 1
+        print(f"{'  (cached repeat)':<26} total={cached_total * 1000:.0f}ms chunks={cached_events.count('token')}")
+
+    print("response cache:", {k: v for k, v in response_cache.stats().items() if k in ("hits", "misses", "writes")})
+    server.should_exit = True
+    thread.join()
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # keep caches, notes and logs out of the repo
+        main()
@@ -1,98 +1,235 @@
 # state/context_store.py
 from __future__ import annotations
 import json
+import os
+import re
 import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from state.models import StudyPlan
+from state.models import Quiz, QuizQuestion, StudyPlan
 DB_PATH = Path("state") / "context_store.sqlite"
 
 
-def _connect() -> sqlite3.Connection:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    # enable WAL for better concurrency
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA foreign_keys=ON;")
-    # create tables
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS context (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
+# ----- connection management -----
+# Tunable pragmas (see https://www.sqlite.org/pragma.html)
+SQLITE_SYNCHRONOUS = os.getenv("CONTEXT_STORE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.getenv("CONTEXT_STORE_CACHE_SIZE", "-8000"))  # negative = KiB
+SQLITE_MMAP_SIZE = int(os.getenv("CONTEXT_STORE_MMAP_SIZE", str(64 * 1024 * 1024)))
+PLAN_CACHE_ENTRIES = int(os.getenv("CONTEXT_STORE_PLAN_CACHE_ENTRIES", "8192"))
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS context (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 0
     )
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS module_notes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            module_id INTEGER,
-            role TEXT,
-            content TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS module_notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        module_id INTEGER,
+        role TEXT,
+        content TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS resources (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            module_id INTEGER,
-            title TEXT,
-            url TEXT,
-            snippet TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS resources (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        module_id INTEGER,
+        title TEXT,
+        url TEXT,
+        snippet TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
-    conn.commit()
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS quiz_bank (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scope TEXT NOT NULL,
+        module_id INTEGER NOT NULL,
+        norm TEXT NOT NULL,
+        question TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(scope, module_id, norm)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_module_notes_module ON module_notes(module_id)",
+    "CREATE INDEX IF NOT EXISTS idx_resources_module ON resources(module_id)",
+)
+
+# SQL text is kept constant so sqlite3's per-connection statement cache
+# compiles each statement once and reuses it for the connection's lifetime.
+# `version` goes up by one on every write of a row and is the plan cache's
+# change token: unlike a timestamp it cannot repeat for two different values
+_SQL_UPSERT_VALUE = """
+    INSERT INTO context (key, value, updated_at)
+    VALUES (?, ?, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT(key)
+    DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at, version=context.version + 1
+"""
+_SQL_GET_VALUE = "SELECT value FROM context WHERE key=?"
+_SQL_GET_VALUE_WITH_TOKEN = "SELECT value, version FROM context WHERE key=?"
+_SQL_GET_TOKEN = "SELECT version FROM context WHERE key=?"
+_SQL_ADD_NOTE = "INSERT INTO module_notes (module_id, role, content) VALUES (?, ?, ?)"
+_SQL_FETCH_NOTES = "SELECT role, content, created_at FROM module_notes WHERE module_id=? ORDER BY id DESC"
+_SQL_ADD_RESOURCE = "INSERT INTO resources (module_id, title, url, snippet) VALUES (?, ?, ?, ?)"
+_SQL_LIST_RESOURCES = "SELECT title, url, snippet FROM resources WHERE module_id=? ORDER BY id DESC"
+_SQL_BANK_ADD = "INSERT OR IGNORE INTO quiz_bank (scope, module_id, norm, question) VALUES (?, ?, ?, ?)"
+_SQL_BANK_COUNT = "SELECT COUNT(*) FROM quiz_bank WHERE scope=? AND module_id=?"
+_SQL_BANK_SAMPLE = "SELECT question FROM quiz_bank WHERE scope=? AND module_id=? ORDER BY RANDOM() LIMIT ?"
+_SQL_BANK_RECENT = "SELECT question FROM quiz_bank WHERE scope=? AND module_id=? ORDER BY id DESC LIMIT ?"
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_schema_ready: set = set()
+_generation = 0  # bumped by close_connections() so other threads drop stale handles
+
+
+def _close_quietly(conn: sqlite3.Connection) -> None:
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+class _ThreadConnections:
+    """
+    One thread's connections by path. Only the thread-local refers to it, so
+    when the thread exits (anyio replaces idle worker threads) the holder is
+    collected and its finalizers close the connections.
+    """
+
+    __slots__ = ("conns", "finalizers", "pid", "generation", "__weakref__")
+
+    def __init__(self):
+        self.conns: Dict[Path, sqlite3.Connection] = {}
+        self.finalizers: List[weakref.finalize] = []
+        self.pid = os.getpid()
+        self.generation = _generation
+
+    def add(self, path: Path, conn: sqlite3.Connection) -> None:
+        self.conns[path] = conn
+        self.finalizers.append(weakref.finalize(self, _close_quietly, conn))
+
+    def close(self) -> None:
+        for finalizer in self.finalizers:
+            finalizer()
+
+
+# Live holders only; close_connections() reaches other threads' handles through it
+_holders: "weakref.WeakSet[_ThreadConnections]" = weakref.WeakSet()
+
+
+def _open(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, cached_statements=64)
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS};")
+    conn.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE};")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE};")
+    conn.execute("PRAGMA foreign_keys=ON;")
+    key = (os.getpid(), str(path))
+    with _registry_lock:
+        if key not in _schema_ready:
+            # WAL is persistent in the file header, so it only needs setting with the schema
+            conn.execute("PRAGMA journal_mode=WAL;")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            # Databases created before the version column get it with every row at 0
+            if "version" not in {row[1] for row in conn.execute("PRAGMA table_info(context)")}:
+                conn.execute("ALTER TABLE context ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            conn.commit()
+            _schema_ready.add(key)
     return conn
 
 
+def _connect() -> sqlite3.Connection:
+    """
+    Return this thread's long-lived connection to DB_PATH, opening it on first use.
+    Connections are keyed by pid as well so forked workers never share a handle,
+    and are closed once their thread has exited (see _ThreadConnections).
+    """
+    holder = getattr(_local, "holder", None)
+    if holder is None or holder.pid != os.getpid() or holder.generation != _generation:
+        holder = _local.holder = _ThreadConnections()
+        _local.seen_version = None
+        _local.fresh = set()
+        with _registry_lock:
+            _holders.add(holder)
+    path = Path(DB_PATH)
+    conn = holder.conns.get(path)
+    if conn is None:
+        conn = _open(path)
+        holder.add(path, conn)
+    return conn
+
+
+def close_connections() -> None:
+    """Close every pooled connection (app shutdown, tests, benchmarks)."""
+    global _generation
+    with _registry_lock:
+        _generation += 1
+        holders = list(_holders)
+        _holders.clear()
+        _schema_ready.clear()
+    for holder in holders:
+        holder.close()
+
+
 def _set_value(key: str, value: Dict[str, Any]) -> None:
     conn = _connect()
-    try:
-        with conn:
-            conn.execute(
-                """
-                INSERT INTO context (key, value, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-                ON CONFLICT(key)
-                DO UPDATE SET value=excluded.value, updated_at=excluded.updated_at
-                """,
-                (key, json.dumps(value, ensure_ascii=False)),
-            )
-    finally:
-        conn.close()
+    with conn:
+        conn.execute(_SQL_UPSERT_VALUE, (key, json.dumps(value, ensure_ascii=False)))
 
 
 def _get_value(key: str) -> Optional[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        cur = conn.execute("SELECT value FROM context WHERE key=?", (key,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        return json.loads(row[0])
-    finally:
-        conn.close()
+    row = _connect().execute(_SQL_GET_VALUE, (key,)).fetchone()
+    if not row:
+        return None
+    return json.loads(row[0])
 
 
 # ----- Study Plan helpers -----
+# Each learner session owns one plan row, keyed "study_plan:<session_id>" on the
+# context table's primary key. Calls without a session use the original global
+# key, so single-user setups and existing databases keep working.
 PLAN_KEY = "study_plan"
+MAX_SESSION_ID_LENGTH = 128
 
 
-def save_study_plan(plan: StudyPlan) -> None:
+def _scoped_key(prefix: str, session_id: Optional[str]) -> str:
+    if not session_id:
+        return prefix
+    if len(session_id) > MAX_SESSION_ID_LENGTH:
+        raise ValueError(f"session_id longer than {MAX_SESSION_ID_LENGTH} characters")
+    return f"{prefix}:{session_id}"
+
+
+def save_study_plan(plan: StudyPlan, session_id: Optional[str] = None) -> None:
     # Use model_dump() for Pydantic v2, dict() for v1
     plan_dict = plan.model_dump() if hasattr(plan, 'model_dump') else plan.dict()
-    _set_value(PLAN_KEY, plan_dict)
+    key = _scoped_key(PLAN_KEY, session_id)
+    conn = _connect()
+    with conn:
+        conn.execute(_SQL_UPSERT_VALUE, (key, json.dumps(plan_dict, ensure_ascii=False)))
+        token = conn.execute(_SQL_GET_TOKEN, (key,)).fetchone()
+    # Write-through: the learner's next read is served without re-parsing.
+    # The copy keeps the cached plan safe from later edits to `plan` by the caller.
+    cache_key = (str(DB_PATH), key)
+    copy = plan.model_copy(deep=True) if hasattr(plan, 'model_copy') else plan.copy(deep=True)
+    _remember_plan(cache_key, tuple(token), copy)
+    # Our own connection's data_version does not move on its own writes,
+    # so this thread re-checks the token once rather than trusting `fresh`.
+    _local.fresh.discard(cache_key)
 
 
-def load_study_plan() -> Optional[StudyPlan]:
-    data = _get_value(PLAN_KEY)
+def _parse_plan(data: Optional[Dict[str, Any]]) -> Optional[StudyPlan]:
     if not data:
         return None
     try:
@@ -108,56 +245,172 @@ def load_study_plan() -> Optional[StudyPlan]:
         return None
 
 
+def load_study_plan(session_id: Optional[str] = None) -> Optional[StudyPlan]:
+    """Read and validate a fresh, caller-owned copy of the plan."""
+    return _parse_plan(_get_value(_scoped_key(PLAN_KEY, session_id)))
+
+
+# ----- memoized plan accessor -----
+# (db path, key) -> (change token, validated plan), least recently used first
+_plan_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+
+def _remember_plan(cache_key: tuple, token: tuple, plan: StudyPlan) -> None:
+    with _plan_cache_lock:
+        _plan_cache[cache_key] = (token, plan)
+        _plan_cache.move_to_end(cache_key)
+        while len(_plan_cache) > PLAN_CACHE_ENTRIES:
+            _plan_cache.popitem(last=False)
+
+
+def get_study_plan(session_id: Optional[str] = None) -> Optional[StudyPlan]:
+    """
+    Return the already-validated plan, re-reading it only when it changed.
+
+    PRAGMA data_version moves whenever another connection (another thread or
+    another uvicorn worker) commits to the database. Until it moves, plans this
+    thread has already checked are returned straight from the cache; once it
+    moves, the version of the plan row decides whether the plan itself needs
+    re-parsing.
+    The returned object is shared: treat it as read-only and use
+    load_study_plan() when a mutable copy is needed.
+    """
+    conn = _connect()
+    key = _scoped_key(PLAN_KEY, session_id)
+    cache_key = (str(DB_PATH), key)
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if _local.seen_version != version:
+        # Someone else committed: every plan this thread vouched for needs re-checking
+        _local.seen_version = version
+        _local.fresh.clear()
+    with _plan_cache_lock:
+        entry = _plan_cache.get(cache_key)
+        if entry is not None:
+            _plan_cache.move_to_end(cache_key)
+    if entry is not None and cache_key in _local.fresh:
+        return entry[1]
+
+    token_row = conn.execute(_SQL_GET_TOKEN, (key,)).fetchone()
+    if token_row is None:
+        with _plan_cache_lock:
+            _plan_cache.pop(cache_key, None)
+        plan = None
+    elif entry is not None and entry[0] == tuple(token_row):
+        plan = entry[1]
+    else:
+        row = conn.execute(_SQL_GET_VALUE_WITH_TOKEN, (key,)).fetchone()
+        plan = _parse_plan(json.loads(row[0])) if row else None
+        if plan is not None:
+            _remember_plan(cache_key, (row[1],), plan)
+        else:
+            with _plan_cache_lock:
+                _plan_cache.pop(cache_key, None)
+    _local.fresh.add(cache_key)
+    return plan
+
+
+# ----- quizzes -----
+QUIZ_KEY_PREFIX = "quiz"
+
+
+def _quiz_key(module_id: int, session_id: Optional[str]) -> str:
+    # Module ids are per plan, so saved quizzes are per session as well
+    return f"{_scoped_key(QUIZ_KEY_PREFIX, session_id)}:{module_id}"
+
+
+def save_quiz(quiz: Quiz, session_id: Optional[str] = None) -> None:
+    quiz_dict = quiz.model_dump() if hasattr(quiz, 'model_dump') else quiz.dict()
+    _set_value(_quiz_key(quiz.module_id, session_id), quiz_dict)
+
+
+def load_quiz(module_id: int, session_id: Optional[str] = None) -> Optional[Quiz]:
+    data = _get_value(_quiz_key(module_id, session_id))
+    if not data:
+        return None
+    return Quiz.model_validate(data) if hasattr(Quiz, 'model_validate') else Quiz.parse_obj(data)
+
+
+# ----- quiz bank -----
+# Questions collected per (session, module) so retakes are sampled from the
+# bank instead of generated. `norm` is the question text lowercased with
+# punctuation and repeated whitespace removed; the UNIQUE constraint on it
+# drops rephrasings that differ only in case or punctuation.
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    return _SPACES_RE.sub(" ", _NON_WORD_RE.sub(" ", (text or "").lower())).strip()
+
+
+def _bank_scope(session_id: Optional[str]) -> str:
+    return _scoped_key("quiz_bank", session_id)
+
+
+def add_bank_questions(module_id: int, questions: List[QuizQuestion], session_id: Optional[str] = None) -> int:
+    """Adds questions to the module's bank, skipping duplicates. Returns how many were new."""
+    scope = _bank_scope(session_id)
+    rows = [
+        (scope, module_id, normalize_question(q.question), json.dumps(q.model_dump(), ensure_ascii=False))
+        for q in questions
+        if normalize_question(q.question)
+    ]
+    conn = _connect()
+    with conn:
+        before = conn.total_changes
+        conn.executemany(_SQL_BANK_ADD, rows)
+        return conn.total_changes - before
+
+
+def count_bank_questions(module_id: int, session_id: Optional[str] = None) -> int:
+    return _connect().execute(_SQL_BANK_COUNT, (_bank_scope(session_id), module_id)).fetchone()[0]
+
+
+def sample_bank_questions(module_id: int, n: int, session_id: Optional[str] = None) -> List[QuizQuestion]:
+    """Up to `n` distinct questions drawn at random from the module's bank."""
+    rows = _connect().execute(_SQL_BANK_SAMPLE, (_bank_scope(session_id), module_id, n)).fetchall()
+    return [QuizQuestion.model_validate(json.loads(row[0])) for row in rows]
+
+
+def recent_bank_questions(module_id: int, n: int, session_id: Optional[str] = None) -> List[str]:
+    """Text of the `n` newest questions in the module's bank, newest first."""
+    rows = _connect().execute(_SQL_BANK_RECENT, (_bank_scope(session_id), module_id, n)).fetchall()
+    return [json.loads(row[0])["question"] for row in rows]
+
+
+def clear_quiz_bank(session_id: Optional[str] = None, module_id: Optional[int] = None) -> int:
+    """Drops the session's banked questions (all modules, or just `module_id`). Returns rows deleted."""
+    conn = _connect()
+    with conn:
+        if module_id is None:
+            return conn.execute("DELETE FROM quiz_bank WHERE scope=?", (_bank_scope(session_id),)).rowcount
+        return conn.execute("DELETE FROM quiz_bank WHERE scope=? AND module_id=?",
+                            (_bank_scope(session_id), module_id)).rowcount
+
+
 # ----- module notes -----
 def add_module_note(module_id: int, role: str, content: str) -> None:
     conn = _connect()
-    try:
-        with conn:
-            conn.execute(
-                "INSERT INTO module_notes (module_id, role, content) VALUES (?, ?, ?)",
-                (module_id, role, content),
-            )
-    finally:
-        conn.close()
+    with conn:
+        conn.execute(_SQL_ADD_NOTE, (module_id, role, content))
 
 
 def fetch_module_notes(module_id: int) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        cur = conn.execute(
-            "SELECT role, content, created_at FROM module_notes WHERE module_id=? ORDER BY id DESC",
-            (module_id,),
-        )
-        rows = [
-            {"role": role, "content": content, "created_at": created_at}
-            for role, content, created_at in cur.fetchall()
-        ]
-        return rows
-    finally:
-        conn.close()
+    cur = _connect().execute(_SQL_FETCH_NOTES, (module_id,))
+    return [
+        {"role": role, "content": content, "created_at": created_at}
+        for role, content, created_at in cur.fetchall()
+    ]
 
 
 # ----- resources -----
 def add_resource(module_id: int, title: str, url: str, snippet: str) -> None:
     conn = _connect()
-    try:
-        with conn:
-            conn.execute(
-                "INSERT INTO resources (module_id, title, url, snippet) VALUES (?, ?, ?, ?)",
-                (module_id, title, url, snippet),
-            )
-    finally:
-        conn.close()
+    with conn:
+        conn.execute(_SQL_ADD_RESOURCE, (module_id, title, url, snippet))
 
 
 def list_resources(module_id: int) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        cur = conn.execute(
-            "SELECT title, url, snippet FROM resources WHERE module_id=? ORDER BY id DESC",
-            (module_id,),
-        )
-        rows = [{"title": title, "url": url, "snippet": snippet} for title, url, snippet in cur.fetchall()]
-        return rows
-    finally:
-        conn.close()
+    cur = _connect().execute(_SQL_LIST_RESOURCES, (module_id,))
+    return [{"title": title, "url": url, "snippet": snippet} for title, url, snippet in cur.fetchall()]